@@ -3,7 +3,7 @@
 
 a = Analysis(
     ['iusweb/app.py'],
-    pathex=[],
+    pathex=['.'],
     binaries=[],
     datas=[],
     hiddenimports=[],
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+ANCHOR_FILTER.PY - Filtro de Bloom persistente de hashes ya anclados
+====================================================================
+
+Responde en memoria, sin tocar disco ni la red, a la pregunta "¿este hash
+ya se ancló?":
+
+- "no" es definitivo: el hash nunca se añadió al filtro
+- "quizá" debe confirmarse contra la fuente de verdad (almacén de recibos,
+  JSON de resultados); sólo ocurre con duplicados reales o con la tasa de
+  falsos positivos configurada
+
+Dimensionado para decenas de millones de hashes: con 0,1 % de falsos
+positivos son ~1,8 bytes por hash (20 M hashes ≈ 36 MB). Los índices se
+derivan del propio SHA-256 (doble hashing sobre sus primeros 16 bytes),
+así que consultar no recalcula ningún hash.
+
+Con ``path`` el arreglo de bits vive en un archivo mapeado en memoria: los
+cambios persisten sin reescribirlo y al reiniciar se reutiliza.
+
+Autor: Consultoría de Sistemas Legales Automatizados
+Fecha: 2025-11-05
+Versión: 1.0.0
+"""
+
+import math
+import mmap
+import struct
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, Path]
+
+DEFAULT_CAPACITY = 20_000_000
+DEFAULT_ERROR_RATE = 0.001
+
+# Cabecera del archivo: magia, bits, funciones hash, elementos, capacidad, tasa objetivo
+_MAGIC = b"ANCBLM01"
+_HEADER = struct.Struct("<8sQIQQd")
+
+
+def optimal_parameters(capacity: int, error_rate: float):
+    """Bits (m) y funciones hash (k) óptimos para n elementos y tasa p"""
+    if capacity < 1:
+        raise ValueError("La capacidad debe ser positiva")
+    if not 0 < error_rate < 1:
+        raise ValueError("La tasa de falsos positivos debe estar entre 0 y 1")
+    bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+def _digest(key: Union[str, bytes]) -> bytes:
+    """Hash de 32 bytes de la clave; los SHA-256 hexadecimales se usan tal cual"""
+    if isinstance(key, (bytes, bytearray)):
+        return bytes(key) if len(key) == 32 else hashlib.sha256(key).digest()
+    text = key[2:] if key.startswith("0x") else key
+    if len(text) == 64:
+        try:
+            return bytes.fromhex(text)
+        except ValueError:
+            pass
+    return hashlib.sha256(key.encode("utf-8")).digest()
+
+
+class AnchoredHashFilter:
+    """Filtro de Bloom de hashes de documentos anclados"""
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        error_rate: float = DEFAULT_ERROR_RATE,
+        path: Optional[PathLike] = None
+    ):
+        """
+        Args:
+            capacity: Hashes esperados (por encima la tasa real empeora)
+            error_rate: Tasa objetivo de falsos positivos a plena capacidad
+            path: Archivo donde persistir el filtro; si ya existe se
+                reutiliza con sus propios parámetros
+        """
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+
+        if self.path is not None and self.path.exists():
+            self._open_existing()
+            return
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits, self.num_hashes = optimal_parameters(capacity, error_rate)
+        self.count = 0
+        nbytes = (self.num_bits + 7) // 8
+        if self.path is None:
+            self._bits = bytearray(nbytes)
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "wb") as f:
+            f.write(self._header())
+            f.truncate(_HEADER.size + nbytes)  # Archivo disperso: sin escribir ceros
+        self._map_file()
+
+    def _header(self) -> bytes:
+        return _HEADER.pack(_MAGIC, self.num_bits, self.num_hashes, self.count,
+                            self.capacity, self.error_rate)
+
+    def _open_existing(self) -> None:
+        with open(self.path, "rb") as f:
+            magic, bits, hashes, count, capacity, error_rate = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"{self.path} no es un filtro de hashes anclados")
+        self.num_bits, self.num_hashes, self.count = bits, hashes, count
+        self.capacity, self.error_rate = capacity, error_rate
+        self._map_file()
+        logger.info(f"Filtro de anclajes cargado: {self.path} ({count} hashes)")
+
+    def _map_file(self) -> None:
+        self._file = open(self.path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._bits = memoryview(self._map)[_HEADER.size:]
+
+    def _positions(self, digest: bytes):
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, key: Union[str, bytes]) -> bool:
+        """Añadir un hash; True si no estaba (ningún bit previo lo cubría)"""
+        bits = self._bits
+        added = False
+        with self._lock:
+            for pos in self._positions(_digest(key)):
+                byte, mask = pos >> 3, 1 << (pos & 7)
+                if not bits[byte] & mask:
+                    bits[byte] |= mask
+                    added = True
+            if added:
+                self.count += 1
+        return added
+
+    def update(self, keys: Iterable[Union[str, bytes]]) -> int:
+        """Añadir muchos hashes; devuelve cuántos eran nuevos"""
+        return sum(1 for key in keys if key and self.add(key))
+
+    def might_contain(self, key: Union[str, bytes]) -> bool:
+        """False: seguro que no se añadió. True: probablemente sí (confirmar)"""
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(_digest(key)))
+
+    __contains__ = might_contain
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def memory_bytes(self) -> int:
+        """Tamaño del arreglo de bits"""
+        return (self.num_bits + 7) // 8
+
+    def estimated_fp_rate(self) -> float:
+        """Tasa de falsos positivos esperada con los elementos actuales"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "capacity": self.capacity,
+            "bits": self.num_bits,
+            "hashes": self.num_hashes,
+            "memory_bytes": self.memory_bytes,
+            "target_fp_rate": self.error_rate,
+            "estimated_fp_rate": self.estimated_fp_rate(),
+            "persistent": self.path is not None,
+        }
+
+    def flush(self) -> None:
+        """Escribir la cabecera y los bits pendientes al archivo"""
+        if self._map is None:
+            return
+        with self._lock:
+            self._map[:_HEADER.size] = self._header()
+            self._map.flush()
+
+    def close(self) -> None:
+        if self._map is None:
+            return
+        self.flush()
+        self._bits.release()
+        self._map.close()
+        self._file.close()
+        self._map = None
+
+    def __enter__(self) -> "AnchoredHashFilter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+"""
+ANCHOR_QUEUE.PY - Cola persistente de anclaje desacoplada de las peticiones
+===========================================================================
+
+``BlockchainAnchor.anchor_classification`` valida, ancla (con reintentos
+bloqueantes) y guarda en línea. Esta cola permite que una petición HTTP
+sólo encole la clasificación y reciba un id de trabajo de inmediato; un
+pool de workers drena la cola en lotes acotados por tamaño o por tiempo.
+
+- Tabla SQLite de trabajos con leases: si un worker cae, su lease expira
+  y otro worker retoma el trabajo. Los workers renuevan sus leases mientras
+  trabajan y sólo el dueño vigente puede cerrar un trabajo
+- Idempotencia por hash de documento: encolar dos veces la misma
+  clasificación devuelve el mismo trabajo, y un trabajo ya enviado a la
+  red se reanuda desde su tx_hash en lugar de volver a anclarse. Un
+  trabajo FAILED se puede volver a encolar
+- Los trabajos pasan por los mismos pasos que ``anchor_classification``:
+  rechazo de duplicados, registro local, almacén de recibos y tracker
+
+Autor: Consultoría de Sistemas Legales Automatizados
+Fecha: 2025-11-05
+Versión: 1.0.0
+"""
+
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from anchor_v2 import (
+    BLOCKCHAIN_DIR,
+    BlockchainAnchor,
+    BlockchainRecord,
+    DuplicateAnchorError,
+    TransactionStatus,
+    compute_document_hash,
+    validate_classification,
+)
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------------------------
+# ESTADOS Y TRABAJOS
+# ----------------------------------------------------------------------------
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class AnchorJob:
+    """Trabajo de anclaje tomado de la cola"""
+    id: int
+    document_hash: str
+    payload: Dict[str, Any]
+    status: str
+    attempts: int
+    tx_hash: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    lease_owner: Optional[str] = None
+
+# ----------------------------------------------------------------------------
+# COLA
+# ----------------------------------------------------------------------------
+
+class AnchorQueue:
+    """Cola de trabajos de anclaje respaldada por SQLite"""
+
+    def __init__(self, db_path: Optional[Path] = None, lease_seconds: float = 120.0, max_attempts: int = 5):
+        self.db_path = Path(db_path or BLOCKCHAIN_DIR / "anchor_queue.db")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                document_hash TEXT NOT NULL UNIQUE,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                -- leased: vencimiento del lease; queued: no antes de (reintentos)
+                lease_expires REAL,
+                tx_hash TEXT,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, lease_expires);
+        """)
+
+    def enqueue(self, classification_data: Dict) -> int:
+        """
+        Encolar una clasificación para anclaje
+
+        Valida los datos y vuelve de inmediato. Si la misma clasificación
+        (mismo hash de documento) ya estaba encolada o anclada, devuelve el
+        id existente; si su trabajo había fallado, vuelve a la cola con los
+        intentos a cero.
+
+        Returns:
+            Id del trabajo
+        """
+        validate_classification(classification_data)
+        doc_hash = compute_document_hash(classification_data)
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO jobs (document_hash, payload, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(document_hash) DO UPDATE SET
+                    payload = excluded.payload, status = excluded.status, attempts = 0,
+                    lease_owner = NULL, lease_expires = NULL, error = NULL,
+                    updated_at = excluded.updated_at
+                WHERE jobs.status = ?
+                """,
+                (doc_hash, json.dumps(classification_data, ensure_ascii=False), QUEUED, now, now, FAILED)
+            )
+            row = self._conn.execute("SELECT id FROM jobs WHERE document_hash = ?", (doc_hash,)).fetchone()
+
+        return row[0]
+
+    def lease(self, owner: str, limit: int) -> List[AnchorJob]:
+        """Reservar hasta ``limit`` trabajos pendientes o con lease vencido"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    """
+                    SELECT id FROM jobs
+                    WHERE (status = ? AND (lease_expires IS NULL OR lease_expires <= ?))
+                       OR (status = ? AND lease_expires < ?)
+                    ORDER BY id LIMIT ?
+                    """,
+                    (QUEUED, now, LEASED, now, limit)
+                ).fetchall()
+                ids = [row[0] for row in rows]
+                if ids:
+                    marks = ",".join("?" * len(ids))
+                    self._conn.execute(
+                        f"""
+                        UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?,
+                            attempts = attempts + 1, updated_at = ?
+                        WHERE id IN ({marks})
+                        """,
+                        (LEASED, owner, now + self.lease_seconds, now, *ids)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        return [self.get(job_id) for job_id in ids]
+
+    def renew(self, owner: str, job_ids: List[int]) -> List[int]:
+        """
+        Prolongar los leases de ``owner`` otros ``lease_seconds``
+
+        Returns:
+            Ids que siguen siendo de ``owner``; los demás vencieron y los
+            reservó otro worker
+        """
+        if not job_ids:
+            return []
+        now = time.time()
+        marks = ",".join("?" * len(job_ids))
+        with self._lock:
+            self._conn.execute(
+                f"""
+                UPDATE jobs SET lease_expires = ?, updated_at = ?
+                WHERE id IN ({marks}) AND status = ? AND lease_owner = ?
+                """,
+                (now + self.lease_seconds, now, *job_ids, LEASED, owner)
+            )
+            rows = self._conn.execute(
+                f"SELECT id FROM jobs WHERE id IN ({marks}) AND status = ? AND lease_owner = ?",
+                (*job_ids, LEASED, owner)
+            ).fetchall()
+        held = {row[0] for row in rows}
+        return [job_id for job_id in job_ids if job_id in held]
+
+    def mark_submitted(self, job_id: int, tx_hash: str, owner: Optional[str] = None) -> bool:
+        """Guardar el tx_hash antes de esperar confirmación (para reanudar sin reenviar)"""
+        return self._update(job_id, owner, tx_hash=tx_hash)
+
+    def complete(self, job_id: int, result: Dict[str, Any], owner: Optional[str] = None) -> bool:
+        """
+        Marcar un trabajo como anclado
+
+        Con ``owner`` sólo se aplica si ese worker conserva el lease.
+
+        Returns:
+            False si el lease ya no era de ``owner``
+        """
+        return self._update(job_id, owner, status=DONE, result=json.dumps(result, ensure_ascii=False),
+                            error=None, lease_owner=None, lease_expires=None)
+
+    def fail(
+        self,
+        job_id: int,
+        error: str,
+        retry_delay: float = 1.0,
+        owner: Optional[str] = None,
+        resubmit: bool = False
+    ) -> bool:
+        """
+        Registrar un fallo
+
+        El trabajo vuelve a la cola con espera exponencial
+        (``retry_delay * 2**(intentos-1)``) hasta agotar ``max_attempts``.
+        Con ``owner`` sólo se aplica si ese worker conserva el lease; con
+        ``resubmit`` se olvida el tx_hash (transacción revertida) para que
+        el reintento envíe una nueva.
+        """
+        job = self.get(job_id)
+        attempts = job.attempts if job else self.max_attempts
+        fields = {"error": error, "lease_owner": None}
+        if resubmit:
+            fields["tx_hash"] = None
+        if attempts >= self.max_attempts:
+            return self._update(job_id, owner, status=FAILED, lease_expires=None, **fields)
+        not_before = time.time() + retry_delay * (2 ** max(0, attempts - 1))
+        return self._update(job_id, owner, status=QUEUED, lease_expires=not_before, **fields)
+
+    def release(self, job_id: int, delay: float = 0.0, owner: Optional[str] = None) -> bool:
+        """Devolver un trabajo a la cola, sin contarlo como intento, tras ``delay`` segundos"""
+        where, params = self._owned(owner)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"""
+                UPDATE jobs SET status = ?, lease_owner = NULL, lease_expires = ?,
+                    attempts = MAX(attempts - 1, 0), updated_at = ?
+                WHERE id = ?{where}
+                """,
+                (QUEUED, time.time() + delay, time.time(), job_id, *params)
+            )
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def _owned(owner: Optional[str]):
+        """Condición extra para que sólo el dueño del lease modifique el trabajo"""
+        if owner is None:
+            return "", ()
+        return " AND status = ? AND lease_owner = ?", (LEASED, owner)
+
+    def _update(self, job_id: int, owner: Optional[str] = None, **fields) -> bool:
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        where, params = self._owned(owner)
+        with self._lock:
+            cursor = self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?{where}",
+                                        (*fields.values(), job_id, *params))
+        return cursor.rowcount > 0
+
+    def get(self, job_id: int) -> Optional[AnchorJob]:
+        """Estado actual de un trabajo"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, document_hash, payload, status, attempts, tx_hash, result, error, lease_owner"
+                " FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return AnchorJob(
+            id=row[0],
+            document_hash=row[1],
+            payload=json.loads(row[2]),
+            status=row[3],
+            attempts=row[4],
+            tx_hash=row[5],
+            result=json.loads(row[6]) if row[6] else None,
+            error=row[7],
+            lease_owner=row[8]
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """Número de trabajos por estado"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+# ----------------------------------------------------------------------------
+# WORKERS
+# ----------------------------------------------------------------------------
+
+class AnchorWorkerPool:
+    """
+    Pool de workers que drena la cola en lotes.
+
+    Cada worker reserva hasta ``batch_size`` trabajos y, si hay menos,
+    espera como máximo ``batch_interval`` segundos a completar el lote antes
+    de procesarlo. Con backends que admiten envío en pipeline
+    (``EthereumBackend.submit``) el tx_hash se guarda en la cola antes de
+    esperar el recibo.
+
+    Los workers esperan su turno para el backend antes de procesar y
+    renuevan los leases del lote al obtenerlo y mientras esperan recibos;
+    un trabajo cuyo lease se perdió entre tanto se descarta sin anclarlo.
+    """
+
+    def __init__(
+        self,
+        anchor: BlockchainAnchor,
+        queue: AnchorQueue,
+        workers: int = 2,
+        batch_size: int = 20,
+        batch_interval: float = 1.0,
+        poll_interval: float = 0.2
+    ):
+        self.anchor = anchor
+        self.queue = queue
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        # El backend no es seguro entre hilos: un lote a la vez
+        self._backend_lock = threading.Lock()
+
+    def start(self) -> None:
+        """Arrancar los workers en segundo plano"""
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"anchor-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Detener los workers tras el lote en curso"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self) -> None:
+        owner = f"{threading.current_thread().name}-{uuid.uuid4().hex[:8]}"
+        while not self._stop.is_set():
+            jobs = self._collect_batch(owner)
+            if jobs:
+                self.process(jobs)
+            else:
+                self._stop.wait(self.poll_interval)
+
+    def _collect_batch(self, owner: str) -> List[AnchorJob]:
+        """Reservar un lote acotado por tamaño o por tiempo"""
+        jobs = self.queue.lease(owner, self.batch_size)
+        if not jobs:
+            return jobs
+
+        deadline = time.monotonic() + self.batch_interval
+        while len(jobs) < self.batch_size and time.monotonic() < deadline and not self._stop.is_set():
+            self._stop.wait(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+            jobs.extend(self.queue.lease(owner, self.batch_size - len(jobs)))
+        return jobs
+
+    def drain(self) -> int:
+        """Procesar en el hilo actual todo lo pendiente (CLI y tests)"""
+        owner = f"drain-{uuid.uuid4().hex[:8]}"
+        processed = 0
+        while True:
+            jobs = self.queue.lease(owner, self.batch_size)
+            if not jobs:
+                return processed
+            self.process(jobs)
+            processed += len(jobs)
+
+    def _renew(self, jobs: List[AnchorJob]) -> List[AnchorJob]:
+        """Renovar los leases del lote; descarta los que ya reservó otro worker"""
+        held = []
+        for owner in {job.lease_owner for job in jobs}:
+            held.extend(self.queue.renew(owner, [job.id for job in jobs if job.lease_owner == owner]))
+        lost = [job.id for job in jobs if job.id not in held]
+        if lost:
+            logger.warning(f"Leases vencidos antes de anclar; trabajos descartados: {lost}")
+        return [job for job in jobs if job.id in held]
+
+    def _complete(self, job: AnchorJob, result: Dict[str, Any]) -> None:
+        if not self.queue.complete(job.id, result, owner=job.lease_owner):
+            logger.warning(f"Trabajo {job.id} resuelto sin lease vigente (lo retomó otro worker)")
+
+    def _fail(self, job: AnchorJob, error: Any, resubmit: bool = False) -> None:
+        logger.warning(f"Trabajo {job.id} fallido (intento {job.attempts}): {error}")
+        self.queue.fail(job.id, str(error), retry_delay=self.anchor.config.retry_delay,
+                        owner=job.lease_owner, resubmit=resubmit)
+
+    def _already_anchored(self, job: AnchorJob) -> bool:
+        """Cerrar sin anclar un trabajo cuyo documento ya consta en el almacén de recibos"""
+        try:
+            self.anchor._reject_duplicate(job.payload)
+        except DuplicateAnchorError as e:
+            if job.tx_hash and e.tx_hash == job.tx_hash:
+                # Es su propia transacción, perdida por la red: se reenvía
+                return False
+            logger.info(f"Trabajo {job.id} ya anclado en {e.tx_hash}")
+            self._complete(job, {
+                "document_hash": job.document_hash,
+                "transaction_hash": e.tx_hash,
+                "duplicate": True
+            })
+            return True
+        return False
+
+    def _finish(self, job: AnchorJob, record: BlockchainRecord) -> None:
+        """Cerrar un trabajo anclado con los pasos de ``anchor_classification``"""
+        if record.metadata.get("status", 1) != 1:
+            # Minada pero revertida: no ancla nada, se reintenta con otra TX
+            self._fail(job, f"TX revertida: {record.transaction_hash}", resubmit=True)
+            return
+        self.anchor._save_record(record)
+        self.anchor._remember(record)
+        self._complete(job, record.to_dict())
+        if self.anchor.tracker:
+            self.anchor.tracker.track(record.transaction_hash, record.document_hash)
+
+    def process(self, jobs: List[AnchorJob]) -> None:
+        """Anclar un lote de trabajos reservados"""
+        breaker = self.anchor.caller.breaker
+        if not breaker.allow():
+            # Backend caído: devolver el lote sin gastar intentos
+            for job in jobs:
+                self.queue.release(job.id, delay=breaker.reset_timeout, owner=job.lease_owner)
+            return
+
+        try:
+            with self._backend_lock:
+                # El lote pudo esperar al backend más que el lease
+                jobs = self._renew(jobs)
+                backend = self.anchor.backend
+                if hasattr(backend, "submit"):
+                    self._process_pipelined(backend, jobs)
+                else:
+                    for job in jobs:
+                        self._process_one(job)
+        finally:
+            # Un lote que sólo reanudó o descartó trabajos no informa al
+            # breaker: sin esto la prueba de half_open quedaría tomada
+            breaker.release_probe()
+
+    def _process_one(self, job: AnchorJob) -> None:
+        if not self._renew([job]) or self._already_anchored(job):
+            return
+        try:
+            record = self.anchor.backend.anchor(job.payload)
+        except Exception as e:
+            self.anchor.caller.breaker.record_failure()
+            self._fail(job, e)
+            return
+        self.anchor.caller.breaker.record_success()
+        self._finish(job, record)
+
+    def _process_pipelined(self, backend, jobs: List[AnchorJob]) -> None:
+        by_tx: Dict[str, AnchorJob] = {}
+        for job in jobs:
+            if job.tx_hash and self._resume(backend, job):
+                continue
+            if self._already_anchored(job):
+                continue
+            try:
+                pending = backend.submit(job.payload)
+            except Exception as e:
+                self.anchor.caller.breaker.record_failure()
+                self._fail(job, e)
+                continue
+            self.anchor.caller.breaker.record_success()
+            self.queue.mark_submitted(job.id, pending.tx_hash, owner=job.lease_owner)
+            by_tx[pending.tx_hash] = job
+
+        while by_tx:
+            # Esperar recibos puede durar más que el lease
+            self._renew(list(by_tx.values()))
+            try:
+                records = backend.collect_receipts(wait=True)
+            except Exception as e:
+                # Sin recibo a tiempo: el tx_hash ya está guardado, se reanuda
+                logger.warning(f"Recibos pendientes tras timeout: {e}")
+                for pending in backend.pending_transactions():
+                    backend.forget(pending.tx_hash)
+                break
+            # Los recibos que submit recogió al esperar hueco llegan aquí,
+            # aunque ya no quede nada en vuelo
+            if not records and not backend.pending_transactions():
+                break
+            for record in records:
+                job = by_tx.pop(record.transaction_hash, None)
+                if job:
+                    self._finish(job, record)
+
+        # Sin recibo (timeout o TX descartada por la red): ``_resume`` decide
+        for job in by_tx.values():
+            self.queue.release(job.id, delay=self.batch_interval, owner=job.lease_owner)
+
+    def _resume(self, backend, job: AnchorJob) -> bool:
+        """
+        Reanudar un trabajo enviado antes de una caída
+
+        Returns:
+            True si el trabajo quedó resuelto o sigue pendiente en la red;
+            False si la transacción se perdió y hay que reenviarla
+        """
+        receipt = backend.get_receipt(job.tx_hash)
+        if receipt is not None:
+            block_number, success = receipt
+            self._finish(job, BlockchainRecord(
+                document_hash=job.document_hash,
+                classification_data=job.payload,
+                timestamp=datetime.now().isoformat(),
+                block_number=block_number,
+                transaction_hash=job.tx_hash,
+                network=self.anchor.config.network.value,
+                metadata={"status": 1 if success else 0, "recovered": True}
+            ))
+            return True
+
+        if backend.get_transaction_status(job.tx_hash) == TransactionStatus.PENDING:
+            self.queue.release(job.id, delay=self.batch_interval, owner=job.lease_owner)
+            return True
+
+        logger.warning(f"TX {job.tx_hash} del trabajo {job.id} no encontrada; se reenvía")
+        return False
@@ -22,15 +22,25 @@ Versión: 2.0.0
 import os
 import sys
 import json
+import random
+import asyncio
 import logging
 import hashlib
 import time
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union, Any
-from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple, Union, Any
+from datetime import datetime, timedelta
 from dataclasses import dataclass, asdict, field
 from enum import Enum
 import secrets
+import sqlite3
+import threading
+import zlib
+import urllib.request
+from array import array
+from collections import Counter, OrderedDict
+from collections.abc import Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # Configuración de logging
 logging.basicConfig(
@@ -60,6 +70,55 @@ CONFIG_DIR = PROJECT_ROOT / "config"
 for directory in [DATA_DIR, BLOCKCHAIN_DIR, CONFIG_DIR]:
     directory.mkdir(parents=True, exist_ok=True)
 
+# ABI de ius-digitalis/blockchain_registry/contracts/ExpedienteRegistry.sol
+EXPEDIENTE_REGISTRY_ABI = [
+    {
+        "type": "function", "name": "registrar", "stateMutability": "nonpayable",
+        "inputs": [
+            {"name": "expedienteId", "type": "string"},
+            {"name": "documentoHash", "type": "bytes32"}
+        ],
+        "outputs": []
+    },
+    {
+        "type": "function", "name": "registrarLote", "stateMutability": "nonpayable",
+        "inputs": [
+            {"name": "raiz", "type": "bytes32"},
+            {"name": "cantidad", "type": "uint256"}
+        ],
+        "outputs": []
+    },
+    {
+        "type": "function", "name": "verificar", "stateMutability": "view",
+        "inputs": [
+            {"name": "expedienteId", "type": "string"},
+            {"name": "documentoHash", "type": "bytes32"}
+        ],
+        "outputs": [{"name": "", "type": "bool"}]
+    },
+    {
+        "type": "function", "name": "consultarLote", "stateMutability": "view",
+        "inputs": [{"name": "raiz", "type": "bytes32"}],
+        "outputs": [{"name": "", "type": "uint256"}]
+    },
+    {
+        "type": "event", "name": "ExpedienteRegistrado", "anonymous": False,
+        "inputs": [
+            {"name": "expedienteId", "type": "string", "indexed": False},
+            {"name": "documentoHash", "type": "bytes32", "indexed": False},
+            {"name": "timestamp", "type": "uint256", "indexed": False}
+        ]
+    },
+    {
+        "type": "event", "name": "LoteRegistrado", "anonymous": False,
+        "inputs": [
+            {"name": "raiz", "type": "bytes32", "indexed": True},
+            {"name": "cantidad", "type": "uint256", "indexed": False},
+            {"name": "timestamp", "type": "uint256", "indexed": False}
+        ]
+    }
+]
+
 # ----------------------------------------------------------------------------
 # ENUMS Y TIPOS
 # ----------------------------------------------------------------------------
@@ -109,6 +168,20 @@ class BlockchainRecord:
         data_str = json.dumps(self.classification_data, sort_keys=True)
         calculated_hash = hashlib.sha256(data_str.encode()).hexdigest()
         return calculated_hash == self.document_hash
+    
+    def anchored_hash(self) -> Optional[str]:
+        """
+        Hash que debe aparecer en la transacción de anclaje
+        
+        Para registros anclados en lote es la raíz Merkle (si la prueba del
+        documento es válida); en otro caso, el propio hash del documento.
+        """
+        proof = self.metadata.get("merkle_proof")
+        if proof is None:
+            return self.document_hash
+        if verify_merkle_proof(self.document_hash, proof, self.merkle_root):
+            return self.merkle_root
+        return None
 
 
 @dataclass
@@ -116,12 +189,320 @@ class AnchorConfig:
     """Configuración para anclaje blockchain"""
     network: BlockchainNetwork = BlockchainNetwork.SIMULATION
     rpc_url: Optional[str] = None
+    rpc_urls: List[str] = field(default_factory=list)  # Varios endpoints: pool con enrutado (rpc_pool.py)
     private_key: Optional[str] = None
     contract_address: Optional[str] = None
     gas_limit: int = 300000
     max_retries: int = 3
     retry_delay: int = 2
     timeout: int = 30
+    max_in_flight: int = 8  # Transacciones simultáneas en modo pipeline
+    gas_price_bump: float = 1.125  # Factor de reemplazo ante "underpriced"
+    poll_interval: float = 1.0  # Segundos entre sondeos de recibos
+    fee_cache_ttl: float = 15.0  # Segundos de validez del gasPrice cacheado
+    verify_batch_size: int = 100  # Consultas por petición JSON-RPC batch
+    verify_max_workers: int = 4  # Peticiones batch concurrentes
+    confirmations: int = 1  # Confirmaciones para dar una TX por firme
+    tracker_max_interval: float = 30.0  # Backoff máximo del seguimiento de bloques
+    ledger_payload_db: Optional[str] = None  # SQLite de payloads del ledger simulado (None: en memoria)
+    retry_max_delay: float = 30.0  # Espera máxima entre reintentos (jitter decorrelado)
+    retry_deadline: float = 20.0  # Presupuesto total de un anclaje con reintentos (s)
+    breaker_failure_threshold: int = 5  # Fallos seguidos que abren el circuito
+    breaker_reset_timeout: float = 30.0  # Segundos en abierto antes de probar de nuevo
+
+
+@dataclass
+class PendingTransaction:
+    """Transacción enviada cuya confirmación aún no se ha recogido"""
+    tx_hash: str
+    nonce: int
+    document_hash: str
+    classification_data: Dict[str, Any]
+    gas_price: int
+    submitted_at: float = field(default_factory=time.time)
+    rpc_calls: Dict[str, int] = field(default_factory=dict)
+
+@dataclass
+class VerificationReport:
+    """Resultado de una verificación masiva (hashes de transacción por estado)"""
+    valid: List[str] = field(default_factory=list)
+    missing: List[str] = field(default_factory=list)
+    mismatched: List[str] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+    
+    @property
+    def total(self) -> int:
+        return len(self.valid) + len(self.missing) + len(self.mismatched) + len(self.errors)
+    
+    @property
+    def all_valid(self) -> bool:
+        return self.total == len(self.valid)
+    
+    def merge(self, other: 'VerificationReport') -> None:
+        """Acumular otro reporte parcial en éste"""
+        self.valid.extend(other.valid)
+        self.missing.extend(other.missing)
+        self.mismatched.extend(other.mismatched)
+        self.errors.update(other.errors)
+    
+    def to_dict(self) -> Dict:
+        """Convertir a diccionario con resumen de conteos"""
+        data = asdict(self)
+        data["summary"] = {
+            "total": self.total,
+            "valid": len(self.valid),
+            "missing": len(self.missing),
+            "mismatched": len(self.mismatched),
+            "errors": len(self.errors)
+        }
+        return data
+
+# ----------------------------------------------------------------------------
+# ÁRBOLES MERKLE
+# ----------------------------------------------------------------------------
+
+def _merkle_parent(left: str, right: str) -> str:
+    """Nodo padre: SHA-256 de la concatenación hexadecimal de los hijos"""
+    return hashlib.sha256((left + right).encode()).hexdigest()
+
+
+def merkle_root(hashes: List[str]) -> str:
+    """Calcular Merkle root de una lista de hashes (duplica el último si es impar)"""
+    if not hashes:
+        return hashlib.sha256(b'').hexdigest()
+    
+    level = list(hashes)
+    while len(level) > 1:
+        if len(level) % 2 != 0:
+            level.append(level[-1])
+        level = [_merkle_parent(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+    
+    return level[0]
+
+
+def merkle_proof(hashes: List[str], index: int) -> List[List[str]]:
+    """
+    Ruta Merkle del elemento ``index``
+    
+    Returns:
+        Lista de pares [hash_hermano, "left" | "right"] desde la hoja a la raíz
+    """
+    proof = []
+    level = list(hashes)
+    while len(level) > 1:
+        if len(level) % 2 != 0:
+            level.append(level[-1])
+        sibling = index ^ 1
+        proof.append([level[sibling], "left" if sibling < index else "right"])
+        level = [_merkle_parent(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+        index //= 2
+    
+    return proof
+
+
+def verify_merkle_proof(leaf: str, proof: List[List[str]], root: Optional[str]) -> bool:
+    """Comprobar que ``leaf`` pertenece al árbol con raíz ``root``"""
+    current = leaf
+    for sibling, side in proof:
+        current = _merkle_parent(sibling, current) if side == "left" else _merkle_parent(current, sibling)
+    return current == root
+
+# ----------------------------------------------------------------------------
+# MERKLE MOUNTAIN RANGE
+# ----------------------------------------------------------------------------
+
+def mmr_leaf_hash(block_number: int, transaction_hash: str, document_hash: str) -> str:
+    """Hoja del MMR: compromete bloque, transacción y hash del documento"""
+    payload = f"{block_number}:{transaction_hash}:{document_hash}".encode()
+    return hashlib.sha256(b"\x00" + payload).hexdigest()
+
+
+def _mmr_node(left: bytes, right: bytes) -> bytes:
+    """Nodo interno (prefijo 0x01 para no confundirlo con una hoja)"""
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def _mmr_peak_positions(size: int) -> List[Tuple[int, int]]:
+    """Picos (altura, índice en su nivel) de un MMR con ``size`` hojas, de izquierda a derecha"""
+    peaks = []
+    offset = 0
+    for height in range(size.bit_length() - 1, -1, -1):
+        if size & (1 << height):
+            peaks.append((height, offset >> height))
+            offset += 1 << height
+    return peaks
+
+
+def _mmr_bag(size: int, peaks: List[bytes]) -> str:
+    """Raíz compacta: picos plegados de derecha a izquierda, ligada al tamaño"""
+    if not peaks:
+        return hashlib.sha256(b"mmr:0").hexdigest()
+    bagged = peaks[-1]
+    for peak in reversed(peaks[:-1]):
+        bagged = _mmr_node(peak, bagged)
+    return hashlib.sha256(f"mmr:{size}:".encode() + bagged).hexdigest()
+
+
+def _mmr_climb(node: bytes, height: int, index: int, target_height: int, siblings: List[str]) -> Optional[bytes]:
+    """Subir desde (altura, índice) hasta ``target_height`` con los hermanos dados"""
+    if len(siblings) != target_height - height:
+        return None
+    for sibling_hex in siblings:
+        sibling = bytes.fromhex(sibling_hex)
+        node = _mmr_node(sibling, node) if index & 1 else _mmr_node(node, sibling)
+        index >>= 1
+    return node
+
+
+def _mmr_target_peak(height: int, index: int, peaks: List[Tuple[int, int]]) -> int:
+    """Posición del pico de ``peaks`` que contiene el subárbol (altura, índice)"""
+    first_leaf = index << height
+    for position, (peak_height, peak_index) in enumerate(peaks):
+        if peak_height >= height and (peak_index << peak_height) <= first_leaf < ((peak_index + 1) << peak_height):
+            return position
+    raise ValueError("Subárbol fuera del rango del MMR")
+
+
+class MerkleMountainRange:
+    """
+    Acumulador append-only sobre todo el historial del ledger
+    
+    Se guardan los subárboles perfectos por nivel: el nodo ``i`` de la
+    altura ``h`` cubre las hojas ``[i * 2**h, (i + 1) * 2**h)`` y ocupa los
+    bytes ``[32 * i, 32 * (i + 1))`` de ``levels[h]`` (digests contiguos,
+    sin un objeto Python por nodo). Añadir una hoja cuesta O(log n) y la
+    raíz de cualquier tamaño anterior sigue siendo calculable, porque los
+    nodos nunca cambian.
+    """
+    
+    def __init__(self):
+        self.levels: List[bytearray] = [bytearray()]
+        self._lock = threading.Lock()
+    
+    @property
+    def size(self) -> int:
+        return len(self.levels[0]) // 32
+    
+    def node_count(self) -> int:
+        return sum(len(level) // 32 for level in self.levels)
+    
+    def _node(self, height: int, index: int) -> bytes:
+        return bytes(self.levels[height][32 * index:32 * (index + 1)])
+    
+    def append(self, leaf_hash: str) -> int:
+        """Añadir una hoja (hex) y devolver su índice"""
+        with self._lock:
+            index = self.size
+            self.levels[0] += bytes.fromhex(leaf_hash)
+            height = 0
+            while (len(self.levels[height]) // 32) % 2 == 0:
+                if height + 1 == len(self.levels):
+                    self.levels.append(bytearray())
+                level = self.levels[height]
+                self.levels[height + 1] += _mmr_node(bytes(level[-64:-32]), bytes(level[-32:]))
+                height += 1
+            return index
+    
+    def _peaks(self, size: int) -> List[bytes]:
+        return [self._node(h, i) for h, i in _mmr_peak_positions(size)]
+    
+    def root(self, size: Optional[int] = None) -> str:
+        """Raíz del MMR con las primeras ``size`` hojas (por defecto, todas)"""
+        size = self.size if size is None else size
+        if not 0 <= size <= self.size:
+            raise ValueError(f"Tamaño {size} fuera de rango (0-{self.size})")
+        with self._lock:
+            return _mmr_bag(size, self._peaks(size))
+    
+    def _path(self, height: int, index: int, target_height: int) -> List[str]:
+        path = []
+        for level in range(height, target_height):
+            path.append(self._node(level, index ^ 1).hex())
+            index >>= 1
+        return path
+    
+    def inclusion_proof(self, leaf_index: int, size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Prueba de que la hoja ``leaf_index`` está en el MMR de tamaño ``size``
+        
+        Returns:
+            {"path": hermanos hasta su pico, "peaks": picos del MMR}
+        """
+        size = self.size if size is None else size
+        if not 0 <= leaf_index < size <= self.size:
+            raise ValueError("Índice o tamaño fuera de rango")
+        with self._lock:
+            positions = _mmr_peak_positions(size)
+            peak_height = positions[_mmr_target_peak(0, leaf_index, positions)][0]
+            return {
+                "path": self._path(0, leaf_index, peak_height),
+                "peaks": [p.hex() for p in self._peaks(size)]
+            }
+    
+    def consistency_proof(self, old_size: int, new_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Prueba de que el MMR de ``new_size`` hojas extiende al de ``old_size``
+        
+        Cada pico antiguo se sube hasta el pico nuevo que lo contiene; si
+        todos llegan, el ledger sólo creció (no se reescribió historia).
+        """
+        new_size = self.size if new_size is None else new_size
+        if not 0 <= old_size <= new_size <= self.size:
+            raise ValueError("Tamaños fuera de rango")
+        with self._lock:
+            new_positions = _mmr_peak_positions(new_size)
+            paths = []
+            for height, index in _mmr_peak_positions(old_size):
+                target_height = new_positions[_mmr_target_peak(height, index, new_positions)][0]
+                paths.append(self._path(height, index, target_height))
+            return {
+                "old_peaks": [p.hex() for p in self._peaks(old_size)],
+                "new_peaks": [p.hex() for p in self._peaks(new_size)],
+                "paths": paths
+            }
+
+
+def verify_mmr_inclusion(leaf_hash: str, leaf_index: int, size: int, proof: Dict, root: str) -> bool:
+    """Comprobar una prueba de inclusión sin acceso al ledger"""
+    try:
+        positions = _mmr_peak_positions(size)
+        peaks = [bytes.fromhex(p) for p in proof["peaks"]]
+        if len(peaks) != len(positions) or _mmr_bag(size, peaks) != root:
+            return False
+        target = _mmr_target_peak(0, leaf_index, positions)
+        node = _mmr_climb(bytes.fromhex(leaf_hash), 0, leaf_index, positions[target][0], proof["path"])
+        return node == peaks[target]
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def verify_mmr_consistency(old_size: int, old_root: str, new_size: int, new_root: str, proof: Dict) -> bool:
+    """
+    Comprobar que el ledger de ``new_size`` registros extiende al de ``old_size``
+    
+    Sólo necesita las dos raíces publicadas y la prueba (O(log² n) hashes).
+    """
+    try:
+        if not 0 <= old_size <= new_size:
+            return False
+        old_positions = _mmr_peak_positions(old_size)
+        new_positions = _mmr_peak_positions(new_size)
+        old_peaks = [bytes.fromhex(p) for p in proof["old_peaks"]]
+        new_peaks = [bytes.fromhex(p) for p in proof["new_peaks"]]
+        if len(old_peaks) != len(old_positions) or len(new_peaks) != len(new_positions):
+            return False
+        if _mmr_bag(old_size, old_peaks) != old_root or _mmr_bag(new_size, new_peaks) != new_root:
+            return False
+        if len(proof["paths"]) != len(old_peaks):
+            return False
+        
+        for (height, index), peak, path in zip(old_positions, old_peaks, proof["paths"]):
+            target = _mmr_target_peak(height, index, new_positions)
+            if _mmr_climb(peak, height, index, new_positions[target][0], path) != new_peaks[target]:
+                return False
+        return True
+    except (KeyError, TypeError, ValueError):
+        return False
 
 # ----------------------------------------------------------------------------
 # EXCEPCIONES PERSONALIZADAS
@@ -141,7 +522,291 @@ class ValidationError(BlockchainError):
 
 class TransactionError(BlockchainError):
     """Error en transacción blockchain"""
-    pass
+    
+    def __init__(self, message: str, nonce: Optional[int] = None):
+        super().__init__(message)
+        # Nonce que llegó a usar un envío fallido (puede diferir del asignado tras resincronizar)
+        self.nonce = nonce
+
+class CircuitOpenError(BlockchainError):
+    """Circuito abierto: el backend se considera caído y no se intenta la llamada"""
+    
+    def __init__(self, message: str, job_id: Optional[int] = None):
+        super().__init__(message)
+        # Trabajo creado en la cola persistente si el anclaje se difirió
+        self.job_id = job_id
+
+class DuplicateAnchorError(ValidationError):
+    """El documento ya fue anclado (confirmado contra el almacén de recibos)"""
+    
+    def __init__(self, message: str, tx_hash: Optional[str] = None):
+        super().__init__(message)
+        self.tx_hash = tx_hash
+
+# ----------------------------------------------------------------------------
+# LEDGER COMPACTO
+# ----------------------------------------------------------------------------
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _hex_digest(value: Optional[str]) -> Optional[Tuple[str, bytes]]:
+    """Separar '<prefijo><64 hex>' en (prefijo, 32 bytes); None si no encaja"""
+    if not value or len(value) < 64:
+        return None
+    try:
+        return value[:-64], bytes.fromhex(value[-64:])
+    except ValueError:
+        return None
+
+
+class PayloadStore:
+    """
+    Almacén direccionado por contenido de los datos de clasificación
+    
+    La clave es el SHA-256 del JSON canónico (el mismo ``document_hash``),
+    así que los payloads repetidos se guardan una vez. Con ``db_path`` se
+    guardan comprimidos en SQLite y sólo se cargan al pedirlos; sin él se
+    guardan comprimidos en memoria. Las lecturas recientes se cachean (LRU).
+    """
+    
+    def __init__(self, db_path: Optional[Path] = None, cache_size: int = 256, commit_every: int = 1000):
+        self.cache_size = cache_size
+        self.commit_every = commit_every
+        self._cache: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory: Optional[Dict[bytes, bytes]] = None
+        self._conn = None
+        self._uncommitted = 0
+        if db_path is None:
+            self._memory = {}
+        else:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS payloads (digest BLOB PRIMARY KEY, data BLOB NOT NULL)")
+            self._conn.commit()
+    
+    def put(self, data: Dict) -> str:
+        """Guardar un payload y devolver su clave (hex)"""
+        canonical = json.dumps(data, sort_keys=True)
+        key = hashlib.sha256(canonical.encode()).hexdigest()
+        blob = zlib.compress(canonical.encode())
+        with self._lock:
+            if self._memory is not None:
+                self._memory.setdefault(bytes.fromhex(key), blob)
+            else:
+                self._conn.execute("INSERT OR IGNORE INTO payloads (digest, data) VALUES (?, ?)",
+                                   (bytes.fromhex(key), blob))
+                self._uncommitted += 1
+                # Lotes de escrituras: en simulación basta con confirmar cada N
+                if self._uncommitted >= self.commit_every:
+                    self._conn.commit()
+                    self._uncommitted = 0
+        return key
+    
+    def get(self, key: str) -> Dict:
+        """Cargar un payload por su clave"""
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return json.loads(json.dumps(self._cache[key]))
+            if self._memory is not None:
+                blob = self._memory.get(bytes.fromhex(key))
+            else:
+                row = self._conn.execute("SELECT data FROM payloads WHERE digest = ?",
+                                         (bytes.fromhex(key),)).fetchone()
+                blob = row[0] if row else None
+            if blob is None:
+                raise KeyError(key)
+            data = json.loads(zlib.decompress(blob))
+            if self.cache_size:
+                self._cache[key] = data
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return json.loads(json.dumps(data))
+    
+    def __len__(self) -> int:
+        with self._lock:
+            if self._memory is not None:
+                return len(self._memory)
+            return self._conn.execute("SELECT COUNT(*) FROM payloads").fetchone()[0]
+    
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+
+class CompactLedger(Sequence):
+    """
+    Ledger en columnas: secuencia de BlockchainRecord materializados bajo demanda
+    
+    Por registro sólo se guardan los digests de documento y transacción
+    (32 bytes cada uno, contiguos en un ``bytearray``), el bloque, el
+    instante en microsegundos y dos índices pequeños (red y prefijo del
+    tx_hash). Los datos de clasificación van al PayloadStore; la metadata
+    derivable se reconstruye con ``metadata_factory(índice)``. Lo que no
+    encaja en las columnas (metadata extra, merkle_root distinto del hash,
+    timestamps con zona horaria...) se guarda aparte, sólo para ese registro.
+    
+    Los registros devueltos son copias: modificarlos no altera el ledger.
+    """
+    
+    def __init__(self, payloads: Optional[PayloadStore] = None, metadata_factory=None):
+        self.payloads = payloads if payloads is not None else PayloadStore()
+        self.metadata_factory = metadata_factory
+        self._doc = bytearray()
+        self._tx = bytearray()
+        self._blocks = array('q')
+        self._micros = array('q')
+        self._network_ids = array('B')
+        self._prefix_ids = array('B')
+        self._networks: List[str] = []
+        self._prefixes: List[str] = []
+        # Excepciones dispersas por índice
+        self._extra: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+    
+    @staticmethod
+    def _intern(table: List[str], value: str) -> int:
+        if value not in table:
+            if len(table) >= 255:
+                raise ValueError("Demasiados valores distintos para una columna compacta")
+            table.append(value)
+        return table.index(value)
+    
+    def append(self, record: BlockchainRecord, payload_key: Optional[str] = None) -> int:
+        """
+        Añadir un registro y devolver su índice
+        
+        Args:
+            record: Registro a añadir
+            payload_key: Clave del payload si ya se guardó en ``payloads``
+        """
+        # Codificación y compresión fuera del lock; dentro sólo se añaden columnas
+        extra: Dict[str, Any] = {}
+        
+        key = payload_key or self.payloads.put(record.classification_data)
+        if key != record.document_hash:
+            extra["payload_key"] = key
+        doc = _hex_digest(record.document_hash)
+        if doc is None or doc[0]:
+            extra["document_hash"] = record.document_hash
+        tx = _hex_digest(record.transaction_hash)
+        if tx is None:
+            extra["transaction_hash"] = record.transaction_hash
+        if record.merkle_root != record.document_hash:
+            extra["merkle_root"] = record.merkle_root
+        if record.block_number is None:
+            extra["block_number"] = None
+        
+        micros = 0
+        try:
+            moment = datetime.fromisoformat(record.timestamp)
+            if moment.tzinfo is not None or moment.isoformat() != record.timestamp:
+                raise ValueError
+            micros = (moment - _EPOCH) // timedelta(microseconds=1)
+        except (TypeError, ValueError):
+            extra["timestamp"] = record.timestamp
+        
+        with self._lock:
+            index = len(self._blocks)
+            derived = self.metadata_factory(index) if self.metadata_factory else {}
+            if record.metadata != derived:
+                extra["metadata"] = record.metadata
+            
+            self._doc += doc[1] if doc else bytes(32)
+            self._tx += tx[1] if tx else bytes(32)
+            self._prefix_ids.append(self._intern(self._prefixes, tx[0]) if tx else 0)
+            self._blocks.append(record.block_number or 0)
+            self._micros.append(micros)
+            self._network_ids.append(self._intern(self._networks, record.network))
+            if extra:
+                self._extra[index] = extra
+            return index
+    
+    def __len__(self) -> int:
+        return len(self._blocks)
+    
+    def _position(self, index: int) -> int:
+        size = len(self._blocks)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("Índice fuera del ledger")
+        return index
+    
+    def document_hash(self, index: int) -> str:
+        """Hash del documento sin materializar el registro"""
+        index = self._position(index)
+        extra = self._extra.get(index, {})
+        if "document_hash" in extra:
+            return extra["document_hash"]
+        return self._doc[32 * index:32 * (index + 1)].hex()
+    
+    def transaction_hash(self, index: int) -> Optional[str]:
+        """Hash de la transacción sin materializar el registro"""
+        index = self._position(index)
+        extra = self._extra.get(index, {})
+        if "transaction_hash" in extra:
+            return extra["transaction_hash"]
+        return self._prefixes[self._prefix_ids[index]] + self._tx[32 * index:32 * (index + 1)].hex()
+    
+    def block_number(self, index: int) -> Optional[int]:
+        index = self._position(index)
+        return self._extra.get(index, {}).get("block_number", self._blocks[index])
+    
+    def find(self, tx_hash: Optional[str]) -> Optional[int]:
+        """Índice del registro con ``tx_hash`` (búsqueda en C sobre la columna de digests)"""
+        parsed = _hex_digest(tx_hash)
+        if parsed is not None:
+            with self._lock:
+                position = self._tx.find(parsed[1])
+                while position != -1:
+                    index = position // 32
+                    if position % 32 == 0 and self.transaction_hash(index) == tx_hash:
+                        return index
+                    position = self._tx.find(parsed[1], position + 1)
+        for index, extra in self._extra.items():
+            if extra.get("transaction_hash", False) == tx_hash:
+                return index
+        return None
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        with self._lock:
+            index = self._position(index)
+            extra = self._extra.get(index, {})
+            document_hash = self.document_hash(index)
+            
+            if "timestamp" in extra:
+                timestamp = extra["timestamp"]
+            else:
+                timestamp = (_EPOCH + timedelta(microseconds=self._micros[index])).isoformat()
+            if "metadata" in extra:
+                metadata = json.loads(json.dumps(extra["metadata"]))
+            else:
+                metadata = self.metadata_factory(index) if self.metadata_factory else {}
+            
+            return BlockchainRecord(
+                document_hash=document_hash,
+                classification_data=self.payloads.get(extra.get("payload_key", document_hash)),
+                timestamp=timestamp,
+                block_number=self.block_number(index),
+                transaction_hash=self.transaction_hash(index),
+                network=self._networks[self._network_ids[index]],
+                merkle_root=extra.get("merkle_root", document_hash),
+                metadata=metadata
+            )
+    
+    def memory_usage(self) -> int:
+        """Bytes aproximados de las columnas residentes (sin payloads)"""
+        columns = (self._doc, self._tx, self._blocks, self._micros, self._network_ids, self._prefix_ids)
+        return sum(sys.getsizeof(column) for column in columns) + sys.getsizeof(self._extra)
 
 # ----------------------------------------------------------------------------
 # BACKENDS DE BLOCKCHAIN
@@ -189,6 +854,71 @@ class BaseBlockchainBackend:
             TransactionStatus
         """
         raise NotImplementedError("Subclases deben implementar get_transaction_status()")
+    
+    def get_block_number(self) -> int:
+        """Número del último bloque de la red"""
+        raise NotImplementedError("Subclases deben implementar get_block_number()")
+    
+    def get_block_receipts(self, block_number: int, tx_hashes: set) -> Dict[str, bool]:
+        """
+        Buscar en un bloque las transacciones de ``tx_hashes``
+        
+        Args:
+            block_number: Bloque a inspeccionar
+            tx_hashes: Hashes de transacción de interés
+            
+        Returns:
+            Diccionario tx_hash -> éxito (status == 1) de las encontradas
+        """
+        raise NotImplementedError("Subclases deben implementar get_block_receipts()")
+    
+    def get_receipt(self, tx_hash: str) -> Optional[Tuple[int, bool]]:
+        """
+        Recibo de una transacción concreta
+        
+        Returns:
+            Tupla (block_number, éxito) o None si aún no está minada
+        """
+        raise NotImplementedError("Subclases deben implementar get_receipt()")
+    
+    def verify_many(
+        self,
+        records: List[BlockchainRecord],
+        batch_size: int = 100,
+        max_workers: int = 4
+    ) -> VerificationReport:
+        """
+        Verificar muchos registros a la vez
+        
+        La implementación base llama a verify() por registro en un pool de
+        hilos; los backends que pueden agrupar consultas la sobrescriben.
+        
+        Args:
+            records: Registros a verificar
+            batch_size: Registros por lote
+            max_workers: Lotes procesados en paralelo
+            
+        Returns:
+            VerificationReport con registros válidos, ausentes y alterados
+        """
+        report = VerificationReport()
+        
+        def check(record: BlockchainRecord) -> Tuple[BlockchainRecord, Optional[bool], Optional[str]]:
+            try:
+                return record, self.verify(record), None
+            except Exception as e:
+                return record, None, str(e)
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            for record, ok, error in pool.map(check, records):
+                if error is not None:
+                    report.errors[record.transaction_hash] = error
+                elif ok:
+                    report.valid.append(record.transaction_hash)
+                else:
+                    report.mismatched.append(record.transaction_hash)
+        
+        return report
 
 
 class SimulationBackend(BaseBlockchainBackend):
@@ -196,12 +926,17 @@ class SimulationBackend(BaseBlockchainBackend):
     
     def __init__(self, config: AnchorConfig):
         super().__init__(config)
-        self.chain: List[BlockchainRecord] = []
+        payload_db = Path(config.ledger_payload_db) if config.ledger_payload_db else None
+        self.chain = CompactLedger(PayloadStore(payload_db), metadata_factory=self._chain_metadata)
         self.block_number = 0
+        # Compromiso sobre todo el historial (una hoja por registro)
+        self.mmr = MerkleMountainRange()
+        # Sección crítica del anclaje: asignar bloque + MMR + ledger
+        self._commit_lock = threading.Lock()
         logger.info("Modo simulación activado - Sin costos de gas")
     
     def anchor(self, data: Dict) -> BlockchainRecord:
-        """Anclar en simulación (blockchain local en memoria)"""
+        """Anclar en simulación (blockchain local en memoria); seguro entre hilos"""
         # Generar hash del documento
         data_str = json.dumps(data, sort_keys=True)
         document_hash = hashlib.sha256(data_str.encode()).hexdigest()
@@ -209,34 +944,50 @@ class SimulationBackend(BaseBlockchainBackend):
         # Generar transaction hash simulado
         tx_hash = "0xsim_" + secrets.token_hex(32)
         
-        # Incrementar número de bloque
-        self.block_number += 1
-        
         # Calcular Merkle root (simulado)
         merkle_root = self._calculate_merkle_root([document_hash])
         
-        # Crear registro
-        record = BlockchainRecord(
-            document_hash=document_hash,
-            classification_data=data,
-            timestamp=datetime.now().isoformat(),
-            block_number=self.block_number,
-            transaction_hash=tx_hash,
-            network=self.config.network.value,
-            merkle_root=merkle_root,
-            metadata={
-                "simulation": True,
-                "chain_length": len(self.chain) + 1
-            }
-        )
+        # Payload comprimido al almacén lateral antes de entrar en la sección crítica
+        payload_key = self.chain.payloads.put(data)
+        timestamp = datetime.now().isoformat()
         
-        # Agregar a la cadena
-        self.chain.append(record)
+        with self._commit_lock:
+            # El bloque se asigna en la misma sección que el append, de modo
+            # que bloque N == hoja N-1 del MMR == posición N-1 del ledger
+            block_number = self.block_number + 1
+            
+            # Acumular en el MMR: raíz compacta del ledger tras este bloque
+            self.mmr.append(mmr_leaf_hash(block_number, tx_hash, document_hash))
+            
+            # Crear registro
+            record = BlockchainRecord(
+                document_hash=document_hash,
+                classification_data=data,
+                timestamp=timestamp,
+                block_number=block_number,
+                transaction_hash=tx_hash,
+                network=self.config.network.value,
+                merkle_root=merkle_root,
+                metadata=self._chain_metadata(block_number - 1)
+            )
+            
+            # Agregar a la cadena
+            self.chain.append(record, payload_key=payload_key)
+            self.block_number = block_number
         
-        logger.info(f"Anclaje simulado exitoso - Bloque: {self.block_number}, TX: {tx_hash}")
+        logger.info(f"Anclaje simulado exitoso - Bloque: {block_number}, TX: {tx_hash}")
         
         return record
     
+    def _chain_metadata(self, index: int) -> Dict[str, Any]:
+        """Metadata del registro ``index`` (derivable: no se guarda por registro)"""
+        return {
+            "simulation": True,
+            "chain_length": index + 1,
+            "mmr_size": index + 1,
+            "mmr_root": self.mmr.root(index + 1)
+        }
+    
     def verify(self, record: BlockchainRecord) -> bool:
         """Verificar registro en simulación"""
         # Verificar hash
@@ -245,42 +996,118 @@ class SimulationBackend(BaseBlockchainBackend):
             return False
         
         # Buscar en la cadena
-        for chain_record in self.chain:
-            if chain_record.transaction_hash == record.transaction_hash:
-                logger.info(f"Registro verificado en bloque {chain_record.block_number}")
-                return True
+        index = self.chain.find(record.transaction_hash)
+        if index is not None:
+            logger.info(f"Registro verificado en bloque {self.chain.block_number(index)}")
+            return True
         
         logger.warning("Registro no encontrado en la cadena simulada")
         return False
     
     def get_transaction_status(self, tx_hash: str) -> TransactionStatus:
         """Obtener estado de transacción simulada"""
-        for record in self.chain:
-            if record.transaction_hash == tx_hash:
-                return TransactionStatus.CONFIRMED
+        if self.chain.find(tx_hash) is not None:
+            return TransactionStatus.CONFIRMED
         
         return TransactionStatus.UNKNOWN
     
-    def _calculate_merkle_root(self, hashes: List[str]) -> str:
-        """Calcular Merkle root de una lista de hashes"""
-        if not hashes:
-            return hashlib.sha256(b'').hexdigest()
+    def get_block_number(self) -> int:
+        """Último bloque simulado"""
+        return self.block_number
+    
+    def get_block_receipts(self, block_number: int, tx_hashes: set) -> Dict[str, bool]:
+        """En simulación cada bloque contiene un único registro"""
+        if not 1 <= block_number <= len(self.chain):
+            return {}
+        tx_hash = self.chain.transaction_hash(block_number - 1)
+        return {tx_hash: True} if tx_hash in tx_hashes else {}
+    
+    def get_receipt(self, tx_hash: str) -> Optional[Tuple[int, bool]]:
+        """Recibo simulado: toda TX en la cadena está minada con éxito"""
+        index = self.chain.find(tx_hash)
+        if index is None:
+            return None
+        return self.chain.block_number(index), True
+    
+    def verify_many(
+        self,
+        records: List[BlockchainRecord],
+        batch_size: int = 100,
+        max_workers: int = 4
+    ) -> VerificationReport:
+        """
+        Verificar muchos registros contra las columnas del ledger
+        
+        Un registro de lote (con ``merkle_proof``) apunta al documento raíz
+        anclado por ``multi_anchor``: es válido si su prueba lleva a
+        ``merkle_root`` y la cadena guarda el hash de ese documento raíz.
+        """
+        report = VerificationReport()
         
-        if len(hashes) == 1:
-            return hashes[0]
+        for record in records:
+            index = self.chain.find(record.transaction_hash)
+            if index is None:
+                report.missing.append(record.transaction_hash)
+            elif self.chain.document_hash(index) != self._anchored_document(record) or not record.verify_hash():
+                report.mismatched.append(record.transaction_hash)
+            else:
+                report.valid.append(record.transaction_hash)
         
-        # Asegurar número par de hashes
-        if len(hashes) % 2 != 0:
-            hashes.append(hashes[-1])
+        return report
+    
+    @staticmethod
+    def _anchored_document(record: BlockchainRecord) -> Optional[str]:
+        """Hash que la cadena simulada debe tener para ``record`` (None si la prueba no vale)"""
+        proof = record.metadata.get("merkle_proof")
+        if proof is None:
+            return record.anchored_hash()
+        if not verify_merkle_proof(record.document_hash, proof, record.merkle_root):
+            return None
+        return record.metadata.get("root_document_hash", record.merkle_root)
+    
+    def _calculate_merkle_root(self, hashes: List[str]) -> str:
+        """Calcular Merkle root de una lista de hashes"""
+        return merkle_root(hashes)
+    
+    def block_root(self, block_number: int) -> str:
+        """Raíz MMR del ledger completo tal como quedó tras ``block_number``"""
+        return self.mmr.root(block_number)
+    
+    def inclusion_proof(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Prueba de inclusión de una transacción frente a la raíz MMR actual
         
-        # Calcular nivel superior
-        next_level = []
-        for i in range(0, len(hashes), 2):
-            combined = hashes[i] + hashes[i + 1]
-            next_hash = hashlib.sha256(combined.encode()).hexdigest()
-            next_level.append(next_hash)
+        Returns:
+            Diccionario autocontenido para ``verify_mmr_inclusion`` (o None
+            si la transacción no está en la cadena)
+        """
+        index = self.chain.find(tx_hash)
+        if index is None:
+            return None
+        size = self.mmr.size
+        return {
+            "leaf_hash": mmr_leaf_hash(self.chain.block_number(index), tx_hash, self.chain.document_hash(index)),
+            "leaf_index": index,
+            "size": size,
+            "root": self.mmr.root(size),
+            "proof": self.mmr.inclusion_proof(index, size)
+        }
+    
+    def consistency_proof(self, old_size: int, new_size: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Prueba de que la cadena de ``new_size`` bloques extiende a la de ``old_size``
         
-        return self._calculate_merkle_root(next_level)
+        Un auditor que guardó ``block_root(old_size)`` la comprueba con
+        ``verify_mmr_consistency`` sin descargar el ledger.
+        """
+        new_size = self.mmr.size if new_size is None else new_size
+        return {
+            "old_size": old_size,
+            "old_root": self.mmr.root(old_size),
+            "new_size": new_size,
+            "new_root": self.mmr.root(new_size),
+            "proof": self.mmr.consistency_proof(old_size, new_size)
+        }
     
     def export_chain(self, output_path: Optional[Path] = None) -> Path:
         """Exportar cadena simulada a archivo"""
@@ -300,117 +1127,798 @@ class SimulationBackend(BaseBlockchainBackend):
         return output_path
 
 
-class EthereumBackend(BaseBlockchainBackend):
-    """Backend para Ethereum y redes compatibles"""
+class JsonRpcBatchClient:
+    """Cliente JSON-RPC mínimo (stdlib) que envía varias llamadas por petición HTTP"""
     
-    def __init__(self, config: AnchorConfig):
-        super().__init__(config)
-        self.web3 = None
-        self.account = None
-        self.contract = None
-        self._initialize_web3()
+    def __init__(self, url: str, timeout: float = 30):
+        self.url = url
+        self.timeout = timeout
+        self.requests_sent = 0
     
-    def _initialize_web3(self):
-        """Inicializar conexión Web3"""
-        try:
-            from web3 import Web3
-            from eth_account import Account
-            
-            if not self.config.rpc_url:
-                raise ValueError("RPC URL requerido para conexión Ethereum")
-            
-            # Conectar a la red
-            self.web3 = Web3(Web3.HTTPProvider(
-                self.config.rpc_url,
-                request_kwargs={'timeout': self.config.timeout}
-            ))
-            
-            if not self.web3.is_connected():
-                raise NetworkError("No se pudo conectar a la red Ethereum")
-            
-            logger.info(f"Conectado a red Ethereum - Network ID: {self.web3.eth.chain_id}")
-            
-            # Configurar cuenta si hay private key
-            if self.config.private_key:
-                self.account = Account.from_key(self.config.private_key)
-                logger.info(f"Cuenta configurada: {self.account.address}")
+    def call_batch(self, calls: List[Tuple[str, list]]) -> List[Any]:
+        """
+        Ejecutar una lista de llamadas en una sola petición batch
+        
+        Args:
+            calls: Lista de tuplas (método, parámetros)
             
-        except ImportError:
-            logger.error("web3.py no disponible. Instala con: pip install web3")
-            raise BlockchainError("web3.py no instalado")
-        except Exception as e:
-            logger.error(f"Error inicializando Web3: {e}")
-            raise NetworkError(f"Error de conexión: {e}")
-    
-    def anchor(self, data: Dict) -> BlockchainRecord:
-        """Anclar en blockchain Ethereum"""
-        if not self.web3 or not self.account:
-            raise BlockchainError("Backend Ethereum no inicializado correctamente")
+        Returns:
+            Resultados en el mismo orden; las llamadas con error devuelven
+            una instancia de BlockchainError en su posición
+        """
+        if not calls:
+            return []
         
-        # Generar hash del documento
-        data_str = json.dumps(data, sort_keys=True)
-        document_hash = hashlib.sha256(data_str.encode()).hexdigest()
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+            for i, (method, params) in enumerate(calls)
+        ]
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
         
         try:
-            # Preparar datos para transacción
-            hash_bytes = bytes.fromhex(document_hash)
-            
-            # Si hay contrato, interactuar con él
-            if self.contract:
-                tx = self._send_contract_transaction(hash_bytes)
-            else:
-                # Enviar transacción simple con hash en data
-                tx = self._send_simple_transaction(hash_bytes)
-            
-            # Crear registro
-            record = BlockchainRecord(
-                document_hash=document_hash,
-                classification_data=data,
-                timestamp=datetime.now().isoformat(),
-                block_number=tx.get('blockNumber'),
-                transaction_hash=tx.get('transactionHash').hex(),
-                network=self.config.network.value,
-                metadata={
-                    "gas_used": tx.get('gasUsed'),
-                    "block_hash": tx.get('blockHash').hex()
-                }
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = json.loads(response.read().decode())
+        except Exception as e:
+            raise NetworkError(f"Error en petición JSON-RPC batch: {e}")
+        finally:
+            self.requests_sent += 1
+        
+        return parse_batch_reply(body, len(calls))
+
+
+def parse_batch_reply(body: Any, count: int) -> List[Any]:
+    """
+    Resultados de una respuesta batch a ``count`` llamadas con ids 0..count-1
+    
+    Las llamadas con error devuelven una instancia de BlockchainError en su
+    posición; un rechazo del batch entero lanza NetworkError.
+    """
+    # Algunos nodos responden a un batch con un único objeto de error
+    if isinstance(body, dict):
+        message = body.get("error", {}).get("message", body)
+        raise NetworkError(f"Batch rechazado por el nodo: {message}")
+    
+    by_id = {item.get("id"): item for item in body}
+    results = []
+    for i in range(count):
+        item = by_id.get(i)
+        if item is None:
+            results.append(BlockchainError("Respuesta ausente en el batch"))
+        elif "error" in item:
+            results.append(BlockchainError(item["error"].get("message", "error JSON-RPC")))
+        else:
+            results.append(item.get("result"))
+    
+    return results
+
+
+def verify_records_jsonrpc(
+    client: JsonRpcBatchClient,
+    records: List[BlockchainRecord],
+    batch_size: int = 100,
+    max_workers: int = 4
+) -> VerificationReport:
+    """
+    Verificar registros con ``eth_getTransactionByHash`` agrupado en batches
+    
+    Los batches se envían en paralelo con un pool acotado. Un registro es
+    válido si la transacción existe y su campo ``input`` contiene el hash
+    del documento; ausente si el nodo no la conoce; alterado si el hash
+    local o el input no coinciden. ``client`` es cualquier objeto con
+    ``call_batch`` (JsonRpcBatchClient o rpc_pool.RpcPool).
+    """
+    report = VerificationReport()
+    to_query = []
+    
+    for record in records:
+        if not record.verify_hash():
+            report.mismatched.append(record.transaction_hash)
+        else:
+            to_query.append(record)
+    
+    batch_size = max(1, batch_size)
+    batches = [to_query[i:i + batch_size] for i in range(0, len(to_query), batch_size)]
+    
+    def check_batch(batch: List[BlockchainRecord]) -> VerificationReport:
+        partial = VerificationReport()
+        try:
+            results = client.call_batch(
+                [("eth_getTransactionByHash", [r.transaction_hash]) for r in batch]
+            )
+        except BlockchainError as e:
+            for record in batch:
+                partial.errors[record.transaction_hash] = str(e)
+            return partial
+        
+        for record, tx in zip(batch, results):
+            if isinstance(tx, Exception):
+                partial.errors[record.transaction_hash] = str(tx)
+            elif not tx:
+                partial.missing.append(record.transaction_hash)
+            elif record.anchored_hash() and record.anchored_hash() in (tx.get("input") or "").lower():
+                partial.valid.append(record.transaction_hash)
+            else:
+                partial.mismatched.append(record.transaction_hash)
+        return partial
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for partial in pool.map(check_batch, batches):
+            report.merge(partial)
+    
+    logger.info(
+        f"Verificación masiva: {len(report.valid)} válidos, {len(report.missing)} ausentes, "
+        f"{len(report.mismatched)} alterados, {len(report.errors)} errores"
+    )
+    
+    return report
+
+
+class CachedRPC:
+    """
+    Fachada sobre ``web3.eth`` que elimina llamadas RPC repetidas.
+    
+    - ``chain_id`` se consulta una sola vez (no cambia nunca)
+    - ``gas_price`` se cachea durante ``fee_ttl`` segundos
+    - el nonce se lleva en un contador local que se resincroniza con la
+      red sólo cuando un envío falla por nonce
+    - cada llamada real se cuenta, en total y por anclaje; el conteo por
+      anclaje es de cada hilo, así que anclajes concurrentes no se mezclan
+    """
+    
+    def __init__(self, web3, address: Optional[str] = None, fee_ttl: float = 15.0):
+        self.web3 = web3
+        self.address = address
+        self.fee_ttl = fee_ttl
+        self._chain_id: Optional[int] = None
+        self._gas_price: Optional[int] = None
+        self._gas_price_at = 0.0
+        self._next_nonce: Optional[int] = None
+        self._nonce_lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.anchors = 0
+        self._stats_lock = threading.Lock()
+        # Contador del anclaje en curso, uno por hilo
+        self._local = threading.local()
+    
+    def _count(self, method: str) -> None:
+        """Contabilizar una llamada RPC real"""
+        with self._stats_lock:
+            self.calls[method] += 1
+        anchor_calls = getattr(self._local, "anchor_calls", None)
+        if anchor_calls is not None:
+            anchor_calls[method] += 1
+    
+    def _call(self, method: str, *args, **kwargs):
+        """Ejecutar un método RPC de ``web3.eth`` y contabilizarlo"""
+        self._count(method)
+        return getattr(self.web3.eth, method)(*args, **kwargs)
+    
+    def _get(self, prop: str):
+        """Leer una propiedad RPC de ``web3.eth`` y contabilizarla"""
+        self._count(prop)
+        return getattr(self.web3.eth, prop)
+    
+    # -- Contadores por anclaje -------------------------------------------
+    
+    def begin_anchor(self) -> None:
+        """Empezar a contar las llamadas de un anclaje (en el hilo actual)"""
+        self._local.anchor_calls = Counter()
+    
+    def end_anchor(self) -> Dict[str, int]:
+        """Terminar el conteo del anclaje actual del hilo y devolver sus llamadas"""
+        calls = dict(getattr(self._local, "anchor_calls", None) or {})
+        self._local.anchor_calls = None
+        with self._stats_lock:
+            self.anchors += 1
+        return calls
+    
+    def stats(self) -> Dict[str, Any]:
+        """Resumen de llamadas RPC realizadas"""
+        with self._stats_lock:
+            by_method, anchors = dict(self.calls), self.anchors
+        total = sum(by_method.values())
+        return {
+            "total_calls": total,
+            "anchors": anchors,
+            "calls_per_anchor": round(total / anchors, 2) if anchors else None,
+            "by_method": by_method
+        }
+    
+    # -- Datos cacheados ----------------------------------------------------
+    
+    @property
+    def chain_id(self) -> int:
+        """Chain ID (caché permanente)"""
+        if self._chain_id is None:
+            self._chain_id = self._get('chain_id')
+        return self._chain_id
+    
+    @property
+    def gas_price(self) -> int:
+        """Gas price (caché con TTL)"""
+        now = time.monotonic()
+        if self._gas_price is None or now - self._gas_price_at > self.fee_ttl:
+            self._gas_price = self._get('gas_price')
+            self._gas_price_at = now
+        return self._gas_price
+    
+    def invalidate_fees(self) -> None:
+        """Descartar el gas price cacheado (p. ej. tras un "underpriced")"""
+        self._gas_price = None
+    
+    # -- Nonce local --------------------------------------------------------
+    
+    def allocate_nonce(self) -> int:
+        """Asignar el siguiente nonce local (sincroniza con la red si hace falta)"""
+        with self._nonce_lock:
+            if self._next_nonce is None:
+                self._next_nonce = self._call('get_transaction_count', self.address, 'pending')
+            nonce = self._next_nonce
+            self._next_nonce += 1
+            return nonce
+    
+    def rollback_nonce(self, nonce: int) -> bool:
+        """Devolver un nonce si fue el último asignado; False si dejaría un hueco"""
+        with self._nonce_lock:
+            if self._next_nonce is not None and nonce == self._next_nonce - 1:
+                self._next_nonce = nonce
+                return True
+            return False
+    
+    def resync_nonce(self) -> None:
+        """Forzar la lectura del nonce desde la red en la próxima asignación"""
+        with self._nonce_lock:
+            self._next_nonce = None
+    
+    # -- Llamadas sin caché -------------------------------------------------
+    
+    def send_raw_transaction(self, raw_tx: bytes):
+        return self._call('send_raw_transaction', raw_tx)
+    
+    def get_transaction(self, tx_hash: str):
+        return self._call('get_transaction', tx_hash)
+    
+    def get_transaction_receipt(self, tx_hash: str):
+        return self._call('get_transaction_receipt', tx_hash)
+    
+    def get_block(self, block_number: int):
+        return self._call('get_block', block_number)
+    
+    @property
+    def block_number(self) -> int:
+        return self._get('block_number')
+
+
+class EthereumBackend(BaseBlockchainBackend):
+    """
+    Backend para Ethereum y redes compatibles
+    
+    ``anchor`` y ``verify`` admiten llamadas concurrentes (nonces y
+    contadores bajo lock). En modo pipeline el registro de transacciones en
+    vuelo también está protegido, pero cada recibo se entrega al hilo que
+    lo recoge: ``anchor_many`` y ``collect_receipts`` esperan un único
+    consumidor, como hace AnchorWorkerPool con su lock de backend.
+    """
+    
+    # Fragmentos de error que devuelven los nodos (geth, erigon, eth-tester)
+    _UNDERPRICED_ERRORS = ("underpriced", "replacement transaction", "fee too low")
+    _NONCE_TOO_LOW_ERRORS = ("nonce too low", "nonce has already been used", "invalid transaction nonce")
+    _ALREADY_KNOWN_ERRORS = ("already known", "known transaction")
+    
+    def __init__(self, config: AnchorConfig, web3=None):
+        """
+        Args:
+            config: Configuración de anclaje
+            web3: Instancia Web3 ya conectada (opcional, p. ej. eth-tester)
+        """
+        super().__init__(config)
+        self.web3 = web3
+        self.account = None
+        self.contract = None
+        self.rpc: Optional[CachedRPC] = None
+        # Pool multi-endpoint (rpc_pool.RpcPool) si config.rpc_urls tiene varias URLs
+        self.rpc_pool = None
+        # Transacciones del modo pipeline sin recibo
+        self._in_flight: Dict[str, PendingTransaction] = {}
+        # Recibos que submit recogió al esperar hueco, para el próximo collect_receipts
+        self._completed: List[BlockchainRecord] = []
+        self._in_flight_lock = threading.Lock()
+        if self.web3 is None:
+            self._initialize_web3()
+        else:
+            self._initialize_account()
+    
+    def _initialize_web3(self):
+        """Inicializar conexión Web3"""
+        try:
+            from web3 import Web3
+            
+            if not self.config.rpc_url and not self.config.rpc_urls:
+                raise ValueError("RPC URL requerido para conexión Ethereum")
+            
+            # Conectar a la red
+            if self.config.rpc_urls:
+                # Varios endpoints: conexiones keep-alive, enrutado por latencia y hedging
+                from rpc_pool import RpcPool, make_web3_provider
+                
+                urls = list(dict.fromkeys(filter(None, [self.config.rpc_url, *self.config.rpc_urls])))
+                self.rpc_pool = RpcPool(urls, timeout=self.config.timeout)
+                self.web3 = Web3(make_web3_provider(self.rpc_pool))
+            else:
+                self.web3 = Web3(Web3.HTTPProvider(
+                    self.config.rpc_url,
+                    request_kwargs={'timeout': self.config.timeout}
+                ))
+            
+            if not self.web3.is_connected():
+                raise NetworkError("No se pudo conectar a la red Ethereum")
+            
+            self._initialize_account()
+            
+            logger.info(f"Conectado a red Ethereum - Network ID: {self.rpc.chain_id}")
+            
+        except ImportError:
+            logger.error("web3.py no disponible. Instala con: pip install web3")
+            raise BlockchainError("web3.py no instalado")
+        except Exception as e:
+            logger.error(f"Error inicializando Web3: {e}")
+            raise NetworkError(f"Error de conexión: {e}")
+    
+    def _initialize_account(self):
+        """Configurar cuenta (si hay private key) y la caché RPC"""
+        self.rpc = CachedRPC(self.web3, fee_ttl=self.config.fee_cache_ttl)
+        
+        if not self.config.private_key:
+            return
+        
+        try:
+            from eth_account import Account
+        except ImportError:
+            logger.error("eth-account no disponible. Instala con: pip install eth-account")
+            raise BlockchainError("eth-account no instalado")
+        
+        self.account = Account.from_key(self.config.private_key)
+        self.rpc.address = self.account.address
+        logger.info(f"Cuenta configurada: {self.account.address}")
+        
+        if self.config.contract_address:
+            self.contract = self.web3.eth.contract(
+                address=self.web3.to_checksum_address(self.config.contract_address),
+                abi=EXPEDIENTE_REGISTRY_ABI
             )
+            logger.info(f"Contrato ExpedienteRegistry: {self.contract.address}")
+    
+    @staticmethod
+    def _document_hash(data: Dict) -> str:
+        """Hash SHA-256 canónico de los datos a anclar"""
+        data_str = json.dumps(data, sort_keys=True)
+        return hashlib.sha256(data_str.encode()).hexdigest()
+    
+    def _build_record(
+        self,
+        document_hash: str,
+        data: Dict,
+        receipt: Dict,
+        rpc_calls: Optional[Dict[str, int]] = None
+    ) -> BlockchainRecord:
+        """Construir BlockchainRecord a partir de un recibo de transacción"""
+        return BlockchainRecord(
+            document_hash=document_hash,
+            classification_data=data,
+            timestamp=datetime.now().isoformat(),
+            block_number=receipt.get('blockNumber'),
+            transaction_hash=receipt.get('transactionHash').hex(),
+            network=self.config.network.value,
+            metadata={
+                "gas_used": receipt.get('gasUsed'),
+                "block_hash": receipt.get('blockHash').hex(),
+                "status": receipt.get('status'),
+                "rpc_calls": rpc_calls or {}
+            }
+        )
+    
+    def anchor(self, data: Dict) -> BlockchainRecord:
+        """Anclar en blockchain Ethereum"""
+        if not self.web3 or not self.account:
+            raise BlockchainError("Backend Ethereum no inicializado correctamente")
+        
+        # Generar hash del documento
+        document_hash = self._document_hash(data)
+        
+        self.rpc.begin_anchor()
+        try:
+            # Preparar datos para transacción
+            hash_bytes = bytes.fromhex(document_hash)
+            
+            # Si hay contrato, interactuar con él
+            if self.contract:
+                expediente_id = str(data.get('expediente_id') or document_hash)
+                tx = self._send_contract_transaction('registrar', expediente_id, hash_bytes)
+            else:
+                # Enviar transacción simple con hash en data
+                tx = self._send_simple_transaction(hash_bytes)
+            
+            # Crear registro
+            record = self._build_record(document_hash, data, tx, self.rpc.end_anchor())
             
             logger.info(f"Anclaje exitoso en {self.config.network.value} - TX: {record.transaction_hash}")
             
             return record
             
         except Exception as e:
+            self.rpc.end_anchor()
             logger.error(f"Error en anclaje Ethereum: {e}")
             raise TransactionError(f"Error en transacción: {e}")
     
     def _send_simple_transaction(self, data: bytes) -> Dict:
         """Enviar transacción simple"""
-        nonce = self.web3.eth.get_transaction_count(self.account.address)
-        
-        tx = {
-            'nonce': nonce,
-            'to': self.account.address,  # Enviar a sí mismo
-            'value': 0,
-            'gas': self.config.gas_limit,
-            'gasPrice': self.web3.eth.gas_price,
-            'data': data,
-            'chainId': self.web3.eth.chain_id
-        }
+        return self._send_and_wait(data)
+    
+    def _send_and_wait(self, data: Union[bytes, str], to: Optional[str] = None) -> Dict:
+        """Enviar con el siguiente nonce local y esperar el recibo"""
+        nonce = self.rpc.allocate_nonce()
         
-        signed_tx = self.account.sign_transaction(tx)
-        tx_hash = self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        try:
+            tx_hash, nonce, _ = self._send_with_nonce(data, nonce, to=to)
+        except Exception as e:
+            self._release_nonce(nonce if getattr(e, "nonce", None) is None else e.nonce)
+            raise
         
         # Esperar confirmación
-        receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash, timeout=self.config.timeout)
+        return self._wait_for_receipt(tx_hash)
+    
+    def _wait_for_receipt(self, tx_hash: str) -> Dict:
+        """Sondear el recibo cada ``poll_interval`` hasta ``timeout``"""
+        deadline = time.monotonic() + self.config.timeout
+        while True:
+            receipt = self._fetch_receipt(tx_hash)
+            if receipt is not None:
+                return receipt
+            if time.monotonic() >= deadline:
+                raise TransactionError(f"Sin recibo tras {self.config.timeout}s: {tx_hash}")
+            time.sleep(self.config.poll_interval)
+    
+    def _send_contract_transaction(self, function_name: str, *args) -> Dict:
+        """
+        Enviar transacción a contrato inteligente
+        
+        Args:
+            function_name: Función de ExpedienteRegistry ('registrar', 'registrarLote')
+            *args: Argumentos de la función según el ABI
+            
+        Returns:
+            Recibo de la transacción
+        """
+        if not self.contract:
+            raise BlockchainError("No hay contrato configurado (BLOCKCHAIN_CONTRACT_ADDRESS)")
+        
+        call_data = self.contract.encodeABI(fn_name=function_name, args=list(args))
+        receipt = self._send_and_wait(call_data, to=self.contract.address)
+        
+        if receipt.get('status') != 1:
+            raise TransactionError(f"El contrato revirtió {function_name}: {receipt.get('transactionHash').hex()}")
         
         return receipt
     
-    def _send_contract_transaction(self, data: bytes) -> Dict:
-        """Enviar transacción a contrato inteligente"""
-        # Implementación específica de contrato
-        # Depende del ABI y funciones del contrato
-        pass
+    def anchor_batch(self, items: List[Dict]) -> List[BlockchainRecord]:
+        """
+        Anclar un lote con una sola transacción ``registrarLote(raiz, cantidad)``
+        
+        Cada registro guarda la raíz Merkle del lote y su ruta Merkle en
+        ``metadata["merkle_proof"]``, suficiente para verificar el documento
+        contra la raíz registrada en el contrato.
+        
+        Args:
+            items: Lista de datos a anclar
+            
+        Returns:
+            Registros en el mismo orden que ``items``
+        """
+        if not self.web3 or not self.account:
+            raise BlockchainError("Backend Ethereum no inicializado correctamente")
+        if not items:
+            return []
+        
+        hashes = [self._document_hash(data) for data in items]
+        root = merkle_root(hashes)
+        
+        self.rpc.begin_anchor()
+        try:
+            receipt = self._send_contract_transaction('registrarLote', bytes.fromhex(root), len(items))
+        except Exception as e:
+            self.rpc.end_anchor()
+            logger.error(f"Error en anclaje de lote: {e}")
+            raise TransactionError(f"Error en transacción: {e}")
+        rpc_calls = self.rpc.end_anchor()
+        
+        records = []
+        for index, (document_hash, data) in enumerate(zip(hashes, items)):
+            record = self._build_record(document_hash, data, receipt, rpc_calls)
+            record.merkle_root = root
+            record.metadata.update({
+                "batch_size": len(items),
+                "batch_index": index,
+                "merkle_proof": merkle_proof(hashes, index),
+                "gas_per_document": receipt.get('gasUsed', 0) / len(items)
+            })
+            records.append(record)
+        
+        logger.info(f"Lote de {len(items)} documentos anclado - Raíz: {root}")
+        
+        return records
+    
+    # ------------------------------------------------------------------
+    # Modo pipeline: nonces locales y varias transacciones en vuelo
+    # ------------------------------------------------------------------
+    
+    def _release_nonce(self, nonce: int) -> None:
+        """
+        Liberar un nonce cuyo envío falló definitivamente.
+        
+        Si es el último asignado basta con retroceder el contador; si ya hay
+        nonces posteriores en vuelo se rellena el hueco con una transacción
+        vacía para que la red no las retenga indefinidamente.
+        """
+        if self.rpc.rollback_nonce(nonce):
+            return
+        
+        logger.warning(f"Hueco de nonce {nonce}; enviando transacción de relleno")
+        try:
+            self._send_with_nonce(b'', nonce, resync=False)
+        except Exception as e:
+            logger.error(f"No se pudo rellenar el nonce {nonce}: {e}")
+            # Forzar resincronización en el próximo envío
+            self.rpc.resync_nonce()
+    
+    def _is_error(self, error: Exception, fragments: Tuple[str, ...]) -> bool:
+        """Comprobar si un error del nodo contiene alguno de los fragmentos"""
+        message = str(error).lower()
+        return any(fragment in message for fragment in fragments)
+    
+    def _send_with_nonce(
+        self,
+        data: Union[bytes, str],
+        nonce: int,
+        gas_price: Optional[int] = None,
+        to: Optional[str] = None,
+        resync: bool = True
+    ) -> Tuple[str, int, int]:
+        """
+        Firmar y enviar una transacción con un nonce concreto, sin esperar recibo.
+        
+        Reintenta subiendo el gas ante errores de reemplazo ("underpriced") y
+        resincroniza el nonce si la red indica que ya fue usado (salvo con
+        ``resync=False``: un relleno de hueco cuyo nonce ya se usó no hace falta).
+        
+        Returns:
+            Tupla (tx_hash, nonce, gas_price) efectivamente enviada
+        
+        Raises:
+            TransactionError: con ``nonce`` = el último nonce intentado, que
+                es el que hay que liberar
+        """
+        if gas_price is None:
+            gas_price = self.rpc.gas_price
+        
+        last_error = None
+        for attempt in range(self.config.max_retries):
+            tx = {
+                'nonce': nonce,
+                'to': to or self.account.address,  # Por defecto, a sí mismo
+                'value': 0,
+                'gas': self.config.gas_limit,
+                'gasPrice': gas_price,
+                'data': data,
+                'chainId': self.rpc.chain_id
+            }
+            signed_tx = self.account.sign_transaction(tx)
+            
+            try:
+                tx_hash = self.rpc.send_raw_transaction(signed_tx.rawTransaction)
+                return tx_hash.hex(), nonce, gas_price
+            except Exception as e:
+                last_error = e
+                if self._is_error(e, self._ALREADY_KNOWN_ERRORS):
+                    # El nodo ya tiene exactamente esta transacción
+                    return signed_tx.hash.hex(), nonce, gas_price
+                if self._is_error(e, self._UNDERPRICED_ERRORS):
+                    self.rpc.invalidate_fees()
+                    gas_price = int(gas_price * self.config.gas_price_bump) + 1
+                    logger.warning(f"Nonce {nonce} underpriced; subiendo gasPrice a {gas_price}")
+                    continue
+                if self._is_error(e, self._NONCE_TOO_LOW_ERRORS):
+                    if not resync:
+                        raise TransactionError(f"Nonce {nonce} ya usado: {e}", nonce=None) from e
+                    self.rpc.resync_nonce()
+                    nonce = self.rpc.allocate_nonce()
+                    logger.warning(f"Nonce desincronizado; reintentando con nonce {nonce}")
+                    continue
+                raise TransactionError(f"Envío fallido con nonce {nonce}: {e}", nonce=nonce) from e
+        
+        raise TransactionError(
+            f"Envío fallido tras {self.config.max_retries} intentos: {last_error}", nonce=nonce
+        )
+    
+    def submit(self, data: Dict) -> PendingTransaction:
+        """
+        Enviar un anclaje sin esperar su confirmación (modo pipeline).
+        
+        Mantiene como máximo ``config.max_in_flight`` transacciones sin
+        recibo; si el límite se alcanza, espera a que se confirme alguna.
+        
+        Args:
+            data: Datos a anclar
+            
+        Returns:
+            PendingTransaction con el hash y nonce asignados
+        """
+        if not self.web3 or not self.account:
+            raise BlockchainError("Backend Ethereum no inicializado correctamente")
+        
+        while len(self.pending_transactions()) >= max(1, self.config.max_in_flight):
+            records = self._poll_receipts(wait=True)
+            with self._in_flight_lock:
+                self._completed.extend(records)
+        
+        document_hash = self._document_hash(data)
+        payload, to = bytes.fromhex(document_hash), None
+        if self.contract:
+            expediente_id = str(data.get('expediente_id') or document_hash)
+            payload = self.contract.encodeABI(fn_name='registrar', args=[expediente_id, payload])
+            to = self.contract.address
+        
+        self.rpc.begin_anchor()
+        nonce = self.rpc.allocate_nonce()
+        
+        try:
+            tx_hash, nonce, gas_price = self._send_with_nonce(payload, nonce, to=to)
+        except Exception as e:
+            self._release_nonce(nonce if getattr(e, "nonce", None) is None else e.nonce)
+            self.rpc.end_anchor()
+            logger.error(f"Error enviando anclaje en pipeline: {e}")
+            raise TransactionError(f"Error en transacción: {e}")
+        
+        pending = PendingTransaction(
+            tx_hash=tx_hash,
+            nonce=nonce,
+            document_hash=document_hash,
+            classification_data=data,
+            gas_price=gas_price,
+            rpc_calls=self.rpc.end_anchor()
+        )
+        with self._in_flight_lock:
+            self._in_flight[tx_hash] = pending
+        logger.debug(f"TX enviada (nonce {nonce}): {tx_hash}")
+        
+        return pending
+    
+    def pending_transactions(self) -> List[PendingTransaction]:
+        """Transacciones enviadas que aún no tienen recibo"""
+        with self._in_flight_lock:
+            return list(self._in_flight.values())
+    
+    def forget(self, tx_hash: str) -> Optional[PendingTransaction]:
+        """Dejar de esperar el recibo de una transacción en vuelo"""
+        with self._in_flight_lock:
+            return self._in_flight.pop(tx_hash, None)
+    
+    def _fetch_receipt(self, tx_hash: str) -> Optional[Dict]:
+        """Obtener recibo o None si la transacción aún no está minada"""
+        from web3.exceptions import TransactionNotFound
+        
+        try:
+            return self.rpc.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            return None
+    
+    def collect_receipts(self, wait: bool = False, timeout: Optional[float] = None) -> List[BlockchainRecord]:
+        """
+        Recoger los recibos disponibles de las transacciones en vuelo.
+        
+        Args:
+            wait: Si es True, esperar hasta obtener al menos un recibo
+            timeout: Límite de espera en segundos (por defecto config.timeout)
+            
+        Una transacción sin recibo que lleva más de ``config.timeout``
+        segundos enviada y que el nodo ya no conoce (descartada del mempool)
+        deja de esperarse y su nonce se libera; no aparece en el resultado.
+        
+        Los recibos que ``submit`` recogió mientras esperaba hueco se
+        devuelven primero (sin esperar, aunque ``wait`` sea True).
+        
+        Returns:
+            Registros de las transacciones confirmadas desde la última llamada
+        """
+        with self._in_flight_lock:
+            completed, self._completed = self._completed, []
+        if completed:
+            return completed + self._poll_receipts(wait=False)
+        return self._poll_receipts(wait, timeout)
+    
+    def _poll_receipts(self, wait: bool, timeout: Optional[float] = None) -> List[BlockchainRecord]:
+        """Consultar los recibos de las transacciones en vuelo (ver collect_receipts)"""
+        deadline = time.monotonic() + (self.config.timeout if timeout is None else timeout)
+        
+        while True:
+            records = []
+            for pending in self.pending_transactions():
+                tx_hash = pending.tx_hash
+                receipt = self._fetch_receipt(tx_hash)
+                calls = pending.rpc_calls
+                calls['get_transaction_receipt'] = calls.get('get_transaction_receipt', 0) + 1
+                if receipt is None:
+                    self._evict_if_dropped(pending)
+                    continue
+                if self.forget(tx_hash) is None:
+                    continue
+                
+                if receipt.get('status') != 1:
+                    logger.warning(f"TX revertida (nonce {pending.nonce}): {tx_hash}")
+                records.append(self._build_record(
+                    pending.document_hash, pending.classification_data, receipt, calls
+                ))
+            
+            in_flight = len(self.pending_transactions())
+            if records or not wait or not in_flight:
+                return records
+            
+            if time.monotonic() >= deadline:
+                raise TransactionError(f"Sin recibos tras {self.config.timeout}s ({in_flight} en vuelo)")
+            
+            time.sleep(self.config.poll_interval)
+    
+    def _evict_if_dropped(self, pending: PendingTransaction) -> None:
+        """Dejar de esperar una transacción vencida que el nodo ya no tiene y liberar su nonce"""
+        if time.time() - pending.submitted_at < self.config.timeout:
+            return
+        from web3.exceptions import TransactionNotFound
+        
+        try:
+            if self.rpc.get_transaction(pending.tx_hash):
+                return
+        except TransactionNotFound:
+            pass
+        except Exception as e:
+            # Sin respuesta fiable del nodo no se descarta nada
+            logger.warning(f"No se pudo consultar la TX {pending.tx_hash}: {e}")
+            return
+        
+        if self.forget(pending.tx_hash) is None:
+            return
+        logger.warning(f"TX descartada por la red (nonce {pending.nonce}): {pending.tx_hash}")
+        self._release_nonce(pending.nonce)
+    
+    def anchor_many(self, items: List[Dict]) -> List[BlockchainRecord]:
+        """
+        Anclar varios documentos en pipeline y esperar todas las confirmaciones.
+        
+        Args:
+            items: Lista de datos a anclar
+            
+        Returns:
+            Registros en el mismo orden que ``items``
+        """
+        order = []
+        by_tx: Dict[str, BlockchainRecord] = {}
+        
+        for data in items:
+            order.append(self.submit(data).tx_hash)
+            for record in self.collect_receipts():
+                by_tx[record.transaction_hash] = record
+        
+        while self.pending_transactions():
+            for record in self.collect_receipts(wait=True):
+                by_tx[record.transaction_hash] = record
+        
+        dropped = [tx_hash for tx_hash in order if tx_hash not in by_tx]
+        if dropped:
+            raise TransactionError(f"{len(dropped)} transacciones descartadas por la red: {', '.join(dropped)}")
+        return [by_tx[tx_hash] for tx_hash in order]
     
     def verify(self, record: BlockchainRecord) -> bool:
         """Verificar registro en blockchain Ethereum"""
@@ -423,17 +1931,17 @@ class EthereumBackend(BaseBlockchainBackend):
                 return False
             
             # Obtener transacción
-            tx = self.web3.eth.get_transaction(record.transaction_hash)
+            tx = self.rpc.get_transaction(record.transaction_hash)
             
             if not tx:
                 logger.warning(f"Transacción no encontrada: {record.transaction_hash}")
                 return False
             
-            # Verificar datos
+            # Verificar datos (raíz Merkle si el registro se ancló en lote)
             tx_data = tx.get('input', b'').hex()
-            expected_data = record.document_hash
+            expected_data = record.anchored_hash()
             
-            if expected_data in tx_data:
+            if expected_data and expected_data in tx_data:
                 logger.info("Registro verificado en blockchain")
                 return True
             
@@ -444,13 +1952,54 @@ class EthereumBackend(BaseBlockchainBackend):
             logger.error(f"Error verificando registro: {e}")
             return False
     
+    def verify_many(
+        self,
+        records: List[BlockchainRecord],
+        batch_size: int = 100,
+        max_workers: int = 4
+    ) -> VerificationReport:
+        """Verificar muchos registros con peticiones JSON-RPC batch"""
+        if self.rpc_pool is not None:
+            # Los batches van por el pool: keep-alive, failover y hedging
+            client = self.rpc_pool
+        elif self.config.rpc_url:
+            client = JsonRpcBatchClient(self.config.rpc_url, timeout=self.config.timeout)
+        else:
+            # Proveedor inyectado (p. ej. eth-tester): sin endpoint HTTP para batch
+            return super().verify_many(records, batch_size, max_workers)
+        
+        return verify_records_jsonrpc(client, records, batch_size, max_workers)
+    
+    def get_block_number(self) -> int:
+        """Último bloque de la red"""
+        return self.rpc.block_number
+    
+    def get_block_receipts(self, block_number: int, tx_hashes: set) -> Dict[str, bool]:
+        """Cruzar las transacciones del bloque con las pendientes y leer sólo esos recibos"""
+        block = self.rpc.get_block(block_number)
+        found = {}
+        for tx in block.get('transactions', []):
+            tx_hash = tx.hex() if hasattr(tx, 'hex') else str(tx)
+            if tx_hash in tx_hashes:
+                receipt = self._fetch_receipt(tx_hash)
+                if receipt is not None:
+                    found[tx_hash] = receipt.get('status') == 1
+        return found
+    
+    def get_receipt(self, tx_hash: str) -> Optional[Tuple[int, bool]]:
+        """Recibo de una transacción o None si no está minada"""
+        receipt = self._fetch_receipt(tx_hash)
+        if receipt is None:
+            return None
+        return receipt.get('blockNumber'), receipt.get('status') == 1
+    
     def get_transaction_status(self, tx_hash: str) -> TransactionStatus:
         """Obtener estado de transacción"""
         if not self.web3:
             return TransactionStatus.UNKNOWN
         
         try:
-            receipt = self.web3.eth.get_transaction_receipt(tx_hash)
+            receipt = self._fetch_receipt(tx_hash)
             
             if receipt:
                 if receipt.get('status') == 1:
@@ -459,7 +2008,7 @@ class EthereumBackend(BaseBlockchainBackend):
                     return TransactionStatus.FAILED
             
             # Si no hay receipt, puede estar pending
-            tx = self.web3.eth.get_transaction(tx_hash)
+            tx = self.rpc.get_transaction(tx_hash)
             if tx:
                 return TransactionStatus.PENDING
             
@@ -469,12 +2018,535 @@ class EthereumBackend(BaseBlockchainBackend):
             logger.error(f"Error obteniendo estado: {e}")
             return TransactionStatus.UNKNOWN
 
+# ----------------------------------------------------------------------------
+# ALMACÉN LOCAL DE RECIBOS
+# ----------------------------------------------------------------------------
+
+class ReceiptStore:
+    """Estado local de las transacciones de anclaje (SQLite)"""
+    
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path or BLOCKCHAIN_DIR / "receipts.db")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS receipts (
+                tx_hash TEXT PRIMARY KEY,
+                document_hash TEXT,
+                network TEXT,
+                status TEXT NOT NULL,
+                block_number INTEGER,
+                confirmations INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_receipts_status ON receipts(status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_receipts_document ON receipts(document_hash)")
+        self._conn.commit()
+    
+    def upsert(
+        self,
+        tx_hash: str,
+        status: TransactionStatus,
+        document_hash: Optional[str] = None,
+        network: Optional[str] = None,
+        block_number: Optional[int] = None,
+        confirmations: int = 0
+    ) -> None:
+        """Crear o actualizar el estado de una transacción"""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO receipts (tx_hash, document_hash, network, status, block_number, confirmations, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(tx_hash) DO UPDATE SET
+                    document_hash = COALESCE(excluded.document_hash, receipts.document_hash),
+                    network = COALESCE(excluded.network, receipts.network),
+                    status = excluded.status,
+                    block_number = COALESCE(excluded.block_number, receipts.block_number),
+                    confirmations = excluded.confirmations,
+                    updated_at = excluded.updated_at
+                """,
+                (tx_hash, document_hash, network, status.value, block_number,
+                 confirmations, datetime.now().isoformat())
+            )
+            self._conn.commit()
+    
+    def get(self, tx_hash: str) -> Optional[Dict[str, Any]]:
+        """Estado almacenado de una transacción"""
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM receipts WHERE tx_hash = ?", (tx_hash,))
+            row = cursor.fetchone()
+            columns = [c[0] for c in cursor.description]
+        return dict(zip(columns, row)) if row else None
+    
+    def pending(self) -> List[str]:
+        """Hashes de transacciones aún no confirmadas"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT tx_hash FROM receipts WHERE status = ?", (TransactionStatus.PENDING.value,)
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def find_document(self, document_hash: str) -> Optional[Dict[str, Any]]:
+        """Transacción no fallida que ancló el documento, si existe"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT * FROM receipts WHERE document_hash = ? AND status != ? LIMIT 1",
+                (document_hash, TransactionStatus.FAILED.value)
+            )
+            row = cursor.fetchone()
+            columns = [c[0] for c in cursor.description]
+        return dict(zip(columns, row)) if row else None
+    
+    def document_hashes(self, batch_size: int = 10000) -> Iterator[str]:
+        """Hashes de documentos anclados (transacciones no fallidas), por lotes"""
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, document_hash FROM receipts "
+                    "WHERE rowid > ? AND document_hash IS NOT NULL AND status != ? "
+                    "ORDER BY rowid LIMIT ?",
+                    (last_rowid, TransactionStatus.FAILED.value, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            for _, document_hash in rows:
+                yield document_hash
+    
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+# ----------------------------------------------------------------------------
+# SEGUIMIENTO DE CONFIRMACIONES
+# ----------------------------------------------------------------------------
+
+@dataclass
+class _TrackedTransaction:
+    """Transacción vigilada por ConfirmationTracker"""
+    tx_hash: str
+    confirmations: int
+    future: Future
+    document_hash: Optional[str] = None
+    callback: Optional[Any] = None
+    block_number: Optional[int] = None
+    success: Optional[bool] = None
+    checked: bool = False
+
+
+class ConfirmationTracker:
+    """
+    Seguimiento en segundo plano de confirmaciones, guiado por bloques.
+    
+    Un único hilo sondea el último bloque con backoff exponencial y, por
+    cada bloque nuevo, cruza de una sola vez sus transacciones con todas las
+    pendientes. Cuando una transacción alcanza N confirmaciones se resuelve
+    su Future (con el TransactionStatus final) y se invoca su callback.
+    """
+    
+    def __init__(
+        self,
+        backend: BaseBlockchainBackend,
+        store: Optional[ReceiptStore] = None,
+        confirmations: int = 1,
+        poll_interval: float = 1.0,
+        max_interval: float = 30.0
+    ):
+        self.backend = backend
+        self.store = store
+        self.confirmations = max(1, confirmations)
+        self.poll_interval = poll_interval
+        self.max_interval = max_interval
+        self._tracked: Dict[str, _TrackedTransaction] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_block: Optional[int] = None
+    
+    def __enter__(self) -> 'ConfirmationTracker':
+        self.start()
+        return self
+    
+    def __exit__(self, *exc) -> None:
+        self.stop()
+    
+    def start(self) -> None:
+        """Arrancar el hilo de seguimiento"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="confirmation-tracker", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Detener el hilo de seguimiento"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+    
+    def track(
+        self,
+        tx_hash: str,
+        document_hash: Optional[str] = None,
+        confirmations: Optional[int] = None,
+        callback=None
+    ) -> Future:
+        """
+        Vigilar una transacción hasta N confirmaciones
+        
+        Args:
+            tx_hash: Hash de la transacción
+            document_hash: Hash del documento anclado (para el almacén)
+            confirmations: Confirmaciones requeridas (por defecto las del tracker)
+            callback: Función ``callback(tx_hash, status)`` al finalizar
+            
+        Returns:
+            Future que se resuelve con el TransactionStatus final
+        """
+        with self._lock:
+            tracked = self._tracked.get(tx_hash)
+            if tracked is None:
+                tracked = _TrackedTransaction(
+                    tx_hash=tx_hash,
+                    confirmations=max(1, confirmations or self.confirmations),
+                    future=Future(),
+                    document_hash=document_hash,
+                    callback=callback
+                )
+                self._tracked[tx_hash] = tracked
+        
+        if self.store:
+            self.store.upsert(tx_hash, TransactionStatus.PENDING, document_hash=document_hash,
+                              network=self.backend.config.network.value)
+        self._wakeup.set()
+        return tracked.future
+    
+    @property
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._tracked)
+    
+    def _run(self) -> None:
+        interval = self.poll_interval
+        while not self._stop.is_set():
+            try:
+                progressed = self.poll_once()
+                interval = self.poll_interval if progressed else min(interval * 2, self.max_interval)
+            except Exception as e:
+                logger.warning(f"Error en seguimiento de confirmaciones: {e}")
+                interval = min(interval * 2, self.max_interval)
+            
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+    
+    def poll_once(self) -> bool:
+        """
+        Procesar los bloques nuevos una vez
+        
+        Returns:
+            True si apareció al menos un bloque nuevo o se registraron TX nuevas
+        """
+        with self._lock:
+            tracked = list(self._tracked.values())
+        if not tracked:
+            return False
+        
+        head = self.backend.get_block_number()
+        progressed = False
+        
+        # TX añadidas desde el último sondeo: pueden estar en bloques ya vistos
+        for item in tracked:
+            if not item.checked:
+                item.checked = True
+                progressed = True
+                receipt = self.backend.get_receipt(item.tx_hash)
+                if receipt is not None:
+                    item.block_number, item.success = receipt
+        
+        if self._last_block is None:
+            self._last_block = head
+        elif head > self._last_block:
+            progressed = True
+            unmined = {item.tx_hash: item for item in tracked if item.block_number is None}
+            for number in range(self._last_block + 1, head + 1):
+                if not unmined:
+                    break
+                for tx_hash, success in self.backend.get_block_receipts(number, set(unmined)).items():
+                    item = unmined.pop(tx_hash)
+                    item.block_number, item.success = number, success
+            self._last_block = head
+        
+        for item in tracked:
+            if item.block_number is not None:
+                self._update(item, head)
+        
+        return progressed
+    
+    def _update(self, item: _TrackedTransaction, head: int) -> None:
+        """Actualizar confirmaciones y resolver la TX si ya es firme"""
+        confirmations = max(0, head - item.block_number + 1)
+        final = not item.success or confirmations >= item.confirmations
+        
+        if item.success:
+            status = TransactionStatus.CONFIRMED if final else TransactionStatus.PENDING
+        else:
+            status = TransactionStatus.FAILED
+        
+        if self.store:
+            self.store.upsert(item.tx_hash, status, block_number=item.block_number,
+                              confirmations=confirmations)
+        
+        if not final:
+            return
+        
+        with self._lock:
+            self._tracked.pop(item.tx_hash, None)
+        
+        item.future.set_result(status)
+        if item.callback:
+            try:
+                item.callback(item.tx_hash, status)
+            except Exception as e:
+                logger.error(f"Error en callback de confirmación {item.tx_hash}: {e}")
+
+# ----------------------------------------------------------------------------
+# REINTENTOS Y CIRCUIT BREAKER
+# ----------------------------------------------------------------------------
+
+@dataclass
+class RetryPolicy:
+    """
+    Reintentos con jitter decorrelado y presupuesto total por llamada
+    
+    Cada espera se elige al azar en ``[base_delay, 3 * espera_anterior]``
+    (acotada por ``max_delay``), de modo que los clientes que fallan a la
+    vez no reintentan sincronizados. ``deadline`` limita el tiempo total
+    (intentos + esperas) de una llamada.
+    """
+    max_attempts: int = 3
+    base_delay: float = 2.0
+    max_delay: float = 30.0
+    deadline: Optional[float] = 20.0
+    
+    @classmethod
+    def from_config(cls, config: AnchorConfig) -> 'RetryPolicy':
+        return cls(
+            max_attempts=max(1, config.max_retries),
+            base_delay=config.retry_delay,
+            max_delay=config.retry_max_delay,
+            deadline=config.retry_deadline or None
+        )
+    
+    def next_delay(self, previous: Optional[float] = None) -> float:
+        """Siguiente espera a partir de la anterior"""
+        if self.base_delay <= 0:
+            return 0.0
+        upper = max(self.base_delay, (previous or self.base_delay) * 3)
+        return min(self.max_delay, random.uniform(self.base_delay, upper))
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de tres estados alrededor de un backend
+    
+    - closed: las llamadas pasan; ``failure_threshold`` fallos seguidos lo abren
+    - open: las llamadas fallan en el acto durante ``reset_timeout`` segundos
+    - half_open: se deja pasar una llamada de prueba; si funciona se cierra,
+      si falla se vuelve a abrir. Una prueba que no informa resultado (el
+      llamante no llegó a usar el backend) se libera con ``release_probe``
+      o vence tras ``probe_timeout`` segundos
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, probe_timeout: Optional[float] = None):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.probe_timeout = reset_timeout if probe_timeout is None else probe_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self.counters = Counter()
+    
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+    
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+    
+    def allow(self) -> bool:
+        """¿Puede intentarse una llamada ahora? (en half_open, sólo una a la vez)"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and (
+                not self._probe_in_flight or time.monotonic() - self._probe_started >= self.probe_timeout
+            ):
+                self._probe_in_flight = True
+                self._probe_started = time.monotonic()
+                return True
+            self.counters["rejected"] += 1
+            return False
+    
+    def release_probe(self) -> None:
+        """Liberar la llamada de prueba en curso sin contarla como éxito ni fallo"""
+        with self._lock:
+            self._probe_in_flight = False
+    
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Circuit breaker cerrado: backend recuperado")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+            self.counters["successes"] += 1
+    
+    def record_failure(self) -> None:
+        with self._lock:
+            self.counters["failures"] += 1
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit breaker abierto tras {self._failures} fallos seguidos")
+                    self.counters["opened"] += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+    
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                **{k: self.counters[k] for k in ("successes", "failures", "rejected", "opened")}
+            }
+
+
+class ResilientCaller:
+    """
+    Ejecuta llamadas al backend con RetryPolicy + CircuitBreaker
+    
+    Ofrece la misma lógica en versión síncrona (``call``) y asyncio
+    (``call_async``); esta última espera con ``asyncio.sleep`` y ejecuta la
+    llamada bloqueante en un hilo, sin ocupar el event loop.
+    """
+    
+    def __init__(self, policy: RetryPolicy, breaker: CircuitBreaker):
+        self.policy = policy
+        self.breaker = breaker
+        self.counters = Counter()
+        self._lock = threading.Lock()
+    
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[key] += n
+    
+    def _attempts(self):
+        """
+        Generador de intentos: produce (intento, espera_previa) y recibe el
+        error del intento anterior; termina cuando se agotan intentos o plazo
+        """
+        started = time.monotonic()
+        delay = None
+        for attempt in range(self.policy.max_attempts):
+            if not self.breaker.allow():
+                self._count("short_circuited")
+                raise CircuitOpenError("Circuit breaker abierto: backend no disponible")
+            if attempt:
+                self._count("retries")
+            self._count("attempts")
+            error = yield attempt
+            if error is None:
+                return
+            self.breaker.record_failure()
+            
+            if attempt == self.policy.max_attempts - 1:
+                break
+            delay = self.policy.next_delay(delay)
+            elapsed = time.monotonic() - started
+            if self.policy.deadline is not None and elapsed + delay > self.policy.deadline:
+                self._count("deadline_exceeded")
+                raise TransactionError(
+                    f"Plazo de {self.policy.deadline}s agotado tras {attempt + 1} intentos: {error}"
+                )
+            logger.info(f"Reintentando en {delay:.2f} segundos...")
+            yield delay
+        
+        self._count("exhausted")
+        raise TransactionError(f"Falló después de {self.policy.max_attempts} intentos: {error}")
+    
+    def call(self, func, *args, **kwargs):
+        """Ejecutar ``func`` con reintentos (bloquea el hilo durante las esperas)"""
+        attempts = self._attempts()
+        attempt = next(attempts)
+        while True:
+            try:
+                result = func(*args, **kwargs)
+            except (ValidationError, CircuitOpenError):
+                attempts.close()
+                raise
+            except Exception as e:
+                logger.warning(f"Intento {attempt + 1} fallido: {e}")
+                time.sleep(attempts.send(e))
+                attempt = next(attempts)
+                continue
+            self.breaker.record_success()
+            self._count("successes")
+            attempts.close()
+            return result
+    
+    async def call_async(self, func, *args, **kwargs):
+        """Ejecutar ``func`` (bloqueante) con reintentos sin bloquear el event loop"""
+        attempts = self._attempts()
+        attempt = next(attempts)
+        while True:
+            try:
+                result = await asyncio.to_thread(func, *args, **kwargs)
+            except (ValidationError, CircuitOpenError):
+                attempts.close()
+                raise
+            except Exception as e:
+                logger.warning(f"Intento {attempt + 1} fallido: {e}")
+                await asyncio.sleep(attempts.send(e))
+                attempt = next(attempts)
+                continue
+            self.breaker.record_success()
+            self._count("successes")
+            attempts.close()
+            return result
+    
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {k: self.counters[k] for k in (
+                "attempts", "retries", "successes", "exhausted", "deadline_exceeded", "short_circuited"
+            )}
+        return {"retry": counters, "breaker": self.breaker.metrics()}
+
 # ----------------------------------------------------------------------------
 # CLASE PRINCIPAL
 # ----------------------------------------------------------------------------
 
 class BlockchainAnchor:
-    """Sistema principal de anclaje blockchain"""
+    """Sistema principal de anclaje blockchain (una instancia compartible entre hilos)"""
     
     def __init__(self, config: Optional[AnchorConfig] = None):
         """
@@ -485,6 +2557,20 @@ class BlockchainAnchor:
         """
         self.config = config or AnchorConfig()
         self.backend = self._initialize_backend()
+        self.receipt_store: Optional[ReceiptStore] = None
+        self.tracker: Optional[ConfirmationTracker] = None
+        # Índice local de eventos (event_indexer.ExpedienteEventIndexer)
+        self.index = None
+        # Cola persistente a la que se difieren anclajes con el circuito abierto
+        self.spill_queue = None
+        # Filtro de hashes ya anclados (anchor_filter.AnchoredHashFilter)
+        self.anchored_filter = None
+        # Arranque perezoso del tracker desde varios hilos
+        self._setup_lock = threading.Lock()
+        self.caller = ResilientCaller(
+            RetryPolicy.from_config(self.config),
+            CircuitBreaker(self.config.breaker_failure_threshold, self.config.breaker_reset_timeout)
+        )
         logger.info("BlockchainAnchor inicializado correctamente")
     
     def _initialize_backend(self) -> BaseBlockchainBackend:
@@ -521,65 +2607,162 @@ class BlockchainAnchor:
         try:
             # Validar datos
             self._validate_data(classification_data)
+            self._reject_duplicate(classification_data)
             
             # Anclar con retry
             record = self._anchor_with_retry(classification_data)
             
             # Guardar registro localmente
             self._save_record(record)
+            self._remember(record)
+            
+            # Seguir confirmaciones en segundo plano si el tracker está activo
+            if self.tracker:
+                self.tracker.track(record.transaction_hash, record.document_hash)
             
             return record
             
+        except CircuitOpenError as e:
+            raise self._spill(classification_data, e)
+        except DuplicateAnchorError:
+            raise
+        except Exception as e:
+            logger.error(f"Error en anclaje: {e}")
+            raise BlockchainError(f"Error anclando clasificación: {e}")
+    
+    async def anchor_classification_async(self, classification_data: Dict) -> BlockchainRecord:
+        """
+        Versión asyncio de ``anchor_classification``
+        
+        Las esperas entre reintentos usan ``asyncio.sleep`` y la llamada al
+        backend corre en un hilo, así que un servidor async no queda
+        bloqueado durante una caída del RPC.
+        """
+        try:
+            self._validate_data(classification_data)
+            self._reject_duplicate(classification_data)
+            record = await self.caller.call_async(self.backend.anchor, classification_data)
+            await asyncio.to_thread(self._save_record, record)
+            self._remember(record)
+            
+            if self.tracker:
+                self.tracker.track(record.transaction_hash, record.document_hash)
+            
+            return record
+            
+        except CircuitOpenError as e:
+            raise self._spill(classification_data, e)
+        except DuplicateAnchorError:
+            raise
         except Exception as e:
             logger.error(f"Error en anclaje: {e}")
             raise BlockchainError(f"Error anclando clasificación: {e}")
     
     def _validate_data(self, data: Dict) -> None:
         """Validar datos antes de anclar"""
-        required_fields = ['text', 'predicted_label', 'confidence']
-        
-        for field in required_fields:
-            if field not in data:
-                raise ValidationError(f"Campo requerido faltante: {field}")
+        validate_classification(data)
+    
+    def _reject_duplicate(self, data: Dict) -> None:
+        """
+        Rechazar documentos ya anclados
         
-        if not isinstance(data['confidence'], (int, float)):
-            raise ValidationError("Confidence debe ser numérico")
+        Un "no" del filtro es definitivo y no consulta nada; sólo los "quizá"
+        se confirman contra el almacén de recibos.
+        """
+        if self.anchored_filter is None:
+            return
+        document_hash = compute_document_hash(data)
+        if not self.anchored_filter.might_contain(document_hash):
+            return
+        existing = self.receipt_store.find_document(document_hash)
+        if existing:
+            raise DuplicateAnchorError(
+                f"Documento ya anclado en {existing['tx_hash']}", tx_hash=existing["tx_hash"]
+            )
+    
+    def _remember(self, record: BlockchainRecord) -> None:
+        """
+        Registrar el anclaje en el filtro y en el almacén de recibos
         
-        if not 0 <= data['confidence'] <= 1:
-            raise ValidationError("Confidence debe estar entre 0 y 1")
+        Sólo la simulación tiene finalidad inmediata; en una red real la
+        transacción queda PENDING hasta que el tracker la confirme.
+        """
+        if self.anchored_filter is None:
+            return
+        final = record.network == BlockchainNetwork.SIMULATION.value
+        self.receipt_store.upsert(
+            record.transaction_hash,
+            TransactionStatus.CONFIRMED if final else TransactionStatus.PENDING,
+            document_hash=record.document_hash, network=record.network,
+            block_number=record.block_number
+        )
+        self.anchored_filter.add(record.document_hash)
     
     def _anchor_with_retry(self, data: Dict) -> BlockchainRecord:
-        """Anclar con reintento automático"""
-        last_error = None
+        """Anclar con reintentos (jitter decorrelado, plazo y circuit breaker)"""
+        record = self.caller.call(self.backend.anchor, data)
+        logger.info("Anclaje exitoso")
+        return record
+    
+    def _spill(self, data: Dict, error: CircuitOpenError) -> CircuitOpenError:
+        """Diferir el anclaje a la cola persistente (si hay una) con el circuito abierto"""
+        if self.spill_queue is None:
+            logger.warning(f"Anclaje rechazado: {error}")
+            return error
+        job_id = self.spill_queue.enqueue(data)
+        logger.warning(f"Circuito abierto; anclaje diferido como trabajo {job_id}")
+        return CircuitOpenError(f"{error}; anclaje encolado como trabajo {job_id}", job_id=job_id)
+    
+    def attach_queue(self, queue) -> None:
+        """
+        Diferir anclajes a una cola persistente mientras el circuito esté abierto
         
-        for attempt in range(self.config.max_retries):
-            try:
-                logger.info(f"Intento de anclaje {attempt + 1}/{self.config.max_retries}")
-                
-                record = self.backend.anchor(data)
-                
-                logger.info("Anclaje exitoso")
-                return record
-                
-            except Exception as e:
-                last_error = e
-                logger.warning(f"Intento {attempt + 1} fallido: {e}")
-                
-                if attempt < self.config.max_retries - 1:
-                    delay = self.config.retry_delay * (2 ** attempt)  # Backoff exponencial
-                    logger.info(f"Reintentando en {delay} segundos...")
-                    time.sleep(delay)
+        Args:
+            queue: anchor_queue.AnchorQueue; ``anchor_classification`` encola
+                los datos y lanza CircuitOpenError con ``job_id``
+        """
+        self.spill_queue = queue
+    
+    def attach_filter(self, anchored_filter, store: Optional[ReceiptStore] = None) -> None:
+        """
+        Rechazar duplicados y verificaciones imposibles sin tocar disco ni red
+        
+        El filtro se reconstruye al arrancar con los documentos del almacén
+        de recibos; desde entonces cada anclaje se añade a ambos. Sólo acelera
+        el rechazo de duplicados: ``verify_record`` no lo consulta, porque un
+        registro válido puede venir de otro nodo o ser anterior al filtro.
         
-        raise TransactionError(f"Falló después de {self.config.max_retries} intentos: {last_error}")
+        Args:
+            anchored_filter: anchor_filter.AnchoredHashFilter
+            store: Almacén de recibos (por defecto blockchain_data/receipts.db)
+        """
+        with self._setup_lock:
+            self.receipt_store = store or self.receipt_store or ReceiptStore()
+            added = anchored_filter.update(self.receipt_store.document_hashes())
+            self.anchored_filter = anchored_filter
+        logger.info(f"Filtro de anclajes listo: {len(anchored_filter)} hashes ({added} desde recibos)")
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """Contadores de reintentos, estado del circuit breaker y filtro de anclajes"""
+        metrics = self.caller.metrics()
+        if self.anchored_filter is not None:
+            metrics["anchored_filter"] = self.anchored_filter.stats()
+        return metrics
     
     def _save_record(self, record: BlockchainRecord) -> None:
         """Guardar registro localmente"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"anchor_record_{timestamp}.json"
+        # Sufijo del tx_hash: anclajes concurrentes en el mismo segundo no se pisan
+        suffix = (record.transaction_hash or secrets.token_hex(4))[-8:]
+        filename = f"anchor_record_{timestamp}_{suffix}.json"
         filepath = BLOCKCHAIN_DIR / filename
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(record.to_dict(), f, indent=2, ensure_ascii=False)
+        # Serialización fuera de cualquier lock; escritura atómica vía rename
+        content = json.dumps(record.to_dict(), indent=2, ensure_ascii=False)
+        tmp_path = filepath.with_suffix(".json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, filepath)
         
         logger.info(f"Registro guardado localmente: {filepath}")
     
@@ -594,11 +2777,87 @@ class BlockchainAnchor:
             True si el registro es válido
         """
         try:
+            # Responder desde el índice local si ya cubre el bloque del registro
+            if self.index is not None:
+                if not record.verify_hash():
+                    return False
+                answer = self.index.verify(record)
+                if answer is not None:
+                    return answer
+            
             return self.backend.verify(record)
         except Exception as e:
             logger.error(f"Error verificando registro: {e}")
             return False
     
+    def verify_records(
+        self,
+        records: List[BlockchainRecord],
+        batch_size: Optional[int] = None,
+        max_workers: Optional[int] = None
+    ) -> VerificationReport:
+        """
+        Verificar muchos registros en blockchain (auditorías masivas)
+        
+        Args:
+            records: Registros a verificar
+            batch_size: Consultas por batch (por defecto config.verify_batch_size)
+            max_workers: Batches concurrentes (por defecto config.verify_max_workers)
+            
+        Returns:
+            VerificationReport con registros válidos, ausentes y alterados
+        """
+        return self.backend.verify_many(
+            records,
+            batch_size=batch_size or self.config.verify_batch_size,
+            max_workers=max_workers or self.config.verify_max_workers
+        )
+    
+    def attach_index(self, indexer) -> None:
+        """
+        Usar un índice local de eventos para verificar registros
+        
+        Args:
+            indexer: ExpedienteEventIndexer (ver event_indexer.py); los
+                registros en bloques ya sincronizados se verifican sin RPC
+        """
+        self.index = indexer
+    
+    def start_tracker(self, store: Optional[ReceiptStore] = None) -> ConfirmationTracker:
+        """
+        Arrancar el seguimiento de confirmaciones en segundo plano
+        
+        Los anclajes posteriores se vigilan automáticamente y su estado se
+        actualiza en el almacén local de recibos.
+        
+        Args:
+            store: Almacén de recibos (por defecto blockchain_data/receipts.db)
+        """
+        with self._setup_lock:
+            if self.tracker is None:
+                self.receipt_store = store or self.receipt_store or ReceiptStore()
+                self.tracker = ConfirmationTracker(
+                    self.backend,
+                    store=self.receipt_store,
+                    confirmations=self.config.confirmations,
+                    poll_interval=self.config.poll_interval,
+                    max_interval=self.config.tracker_max_interval
+                )
+            self.tracker.start()
+            return self.tracker
+    
+    def track_confirmations(self, tx_hash: str, callback=None, confirmations: Optional[int] = None) -> Future:
+        """
+        Obtener un Future que se resuelve cuando la TX alcanza N confirmaciones
+        
+        Args:
+            tx_hash: Hash de la transacción
+            callback: Función ``callback(tx_hash, status)`` opcional
+            confirmations: Confirmaciones requeridas (por defecto config.confirmations)
+        """
+        tracker = self.tracker or self.start_tracker()
+        return tracker.track(tx_hash, confirmations=confirmations, callback=callback)
+    
     def get_status(self, tx_hash: str) -> TransactionStatus:
         """
         Obtener estado de una transacción
@@ -620,6 +2879,27 @@ class BlockchainAnchor:
 # UTILIDADES
 # ----------------------------------------------------------------------------
 
+def validate_classification(data: Dict) -> None:
+    """Validar datos de clasificación antes de anclar"""
+    required_fields = ['text', 'predicted_label', 'confidence']
+    
+    for field in required_fields:
+        if field not in data:
+            raise ValidationError(f"Campo requerido faltante: {field}")
+    
+    if not isinstance(data['confidence'], (int, float)):
+        raise ValidationError("Confidence debe ser numérico")
+    
+    if not 0 <= data['confidence'] <= 1:
+        raise ValidationError("Confidence debe estar entre 0 y 1")
+
+
+def compute_document_hash(data: Dict) -> str:
+    """Hash SHA-256 canónico (JSON con claves ordenadas) de los datos a anclar"""
+    data_str = json.dumps(data, sort_keys=True)
+    return hashlib.sha256(data_str.encode()).hexdigest()
+
+
 def load_config_from_env() -> AnchorConfig:
     """Cargar configuración desde variables de entorno"""
     network_map = {
@@ -636,12 +2916,25 @@ def load_config_from_env() -> AnchorConfig:
     config = AnchorConfig(
         network=network_map.get(network, BlockchainNetwork.SIMULATION),
         rpc_url=os.getenv('BLOCKCHAIN_RPC_URL'),
+        rpc_urls=[u.strip() for u in os.getenv('BLOCKCHAIN_RPC_URLS', '').split(',') if u.strip()],
         private_key=os.getenv('BLOCKCHAIN_PRIVATE_KEY'),
         contract_address=os.getenv('BLOCKCHAIN_CONTRACT_ADDRESS'),
         gas_limit=int(os.getenv('BLOCKCHAIN_GAS_LIMIT', '300000')),
         max_retries=int(os.getenv('BLOCKCHAIN_MAX_RETRIES', '3')),
         retry_delay=int(os.getenv('BLOCKCHAIN_RETRY_DELAY', '2')),
-        timeout=int(os.getenv('BLOCKCHAIN_TIMEOUT', '30'))
+        timeout=int(os.getenv('BLOCKCHAIN_TIMEOUT', '30')),
+        max_in_flight=int(os.getenv('BLOCKCHAIN_MAX_IN_FLIGHT', '8')),
+        gas_price_bump=float(os.getenv('BLOCKCHAIN_GAS_PRICE_BUMP', '1.125')),
+        poll_interval=float(os.getenv('BLOCKCHAIN_POLL_INTERVAL', '1.0')),
+        fee_cache_ttl=float(os.getenv('BLOCKCHAIN_FEE_CACHE_TTL', '15')),
+        verify_batch_size=int(os.getenv('BLOCKCHAIN_VERIFY_BATCH_SIZE', '100')),
+        verify_max_workers=int(os.getenv('BLOCKCHAIN_VERIFY_MAX_WORKERS', '4')),
+        confirmations=int(os.getenv('BLOCKCHAIN_CONFIRMATIONS', '1')),
+        retry_max_delay=float(os.getenv('BLOCKCHAIN_RETRY_MAX_DELAY', '30')),
+        retry_deadline=float(os.getenv('BLOCKCHAIN_RETRY_DEADLINE', '20')),
+        breaker_failure_threshold=int(os.getenv('BLOCKCHAIN_BREAKER_THRESHOLD', '5')),
+        breaker_reset_timeout=float(os.getenv('BLOCKCHAIN_BREAKER_RESET', '30')),
+        ledger_payload_db=os.getenv('BLOCKCHAIN_LEDGER_PAYLOAD_DB')
     )
     
     return config
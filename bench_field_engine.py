@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+BENCH_FIELD_ENGINE.PY - Extracción de campos: campo a campo vs. una pasada
+=========================================================================
+
+Compara, sobre textos de varios MB, la extracción de iusweb de antes (un
+recorrido del texto por etiqueta y por campo, ``reference_fields``) con
+``iusweb.field_engine.extract_all`` y comprueba que ambas devuelven lo
+mismo.
+
+Los textos se arman repitiendo párrafos típicos de un expediente; con
+``--sparse`` casi no contienen campos, que es el peor caso de la versión
+campo a campo (cada búsqueda recorre el texto entero).
+
+Uso:
+    python bench_field_engine.py --mb 4 --repeat 3
+"""
+
+import re
+import time
+import random
+import argparse
+import calendar
+import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from iusweb.field_engine import extract_all
+
+# -----------------------------
+# Implementación anterior (referencia)
+# -----------------------------
+_LABEL_PATTERNS = [
+    (r"\b(póliza|poliza)\b", "Póliza"),
+    (r"\b(interventor|supervisor(a)?)\b", "Interventoría/Supervisión"),
+    (r"\b(objeto del contrato|objeto)\b", "Objeto"),
+    (r"\b(plazo|vigencia)\b", "Plazo/Vigencia"),
+    (r"\b(valor|cuantía|cuantia|\$ ?\d)", "Valor"),
+    (r"\b(garantía|garantia)\b", "Garantía"),
+    (r"\b(obra pública|obra publica|obra)\b", "Obra pública"),
+    (r"\b(adición|adicion|prórroga|prorroga)\b", "Modificaciones"),
+]
+
+_MONTHS = {
+    "enero":1,"febrero":2,"marzo":3,"abril":4,"mayo":5,"junio":6,
+    "julio":7,"agosto":8,"septiembre":9,"setiembre":9,"octubre":10,"noviembre":11,"diciembre":12
+}
+
+_RE_DATE_1 = re.compile(r"(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre)\s+de\s+(\d{4})", re.I)
+_RE_DATE_2 = re.compile(r"(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})")
+_RE_DATE_3 = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+_RE_AMOUNT = re.compile(r"(?:COP|COL|COL\$|\$)\s*[\d\.\,]+(?:\s*(?:millones|millón|millon|billones|billón))?", re.I)
+_RE_CONTRACTOR = re.compile(r"(?:contratista|proveedor|adjudicatario)\s*[:\-]\s*(.+)", re.I)
+_RE_MONTHS_TENOR = re.compile(r"(?:plazo|vigencia)\s*(?:de)?\s*(\d{1,3})\s*mes(?:es)?", re.I)
+
+
+def _to_iso(d: int, m: int, y: int) -> str:
+    try:
+        return datetime.date(y, m, d).isoformat()
+    except Exception:
+        return f"{y:04d}-{m:02d}-{d:02d}"
+
+
+def _add_months(y: int, m: int, d: int, k: int) -> str:
+    ny = y + (m - 1 + k) // 12
+    nm = (m - 1 + k) % 12 + 1
+    nd = min(d, calendar.monthrange(ny, nm)[1])
+    try:
+        return datetime.date(ny, nm, nd).isoformat()
+    except Exception:
+        return f"{ny:04d}-{nm:02d}-{nd:02d}"
+
+
+def _labels(text: str) -> List[str]:
+    text_low = text.lower()
+    return [tag for pat, tag in _LABEL_PATTERNS if re.search(pat, text_low)][:8]
+
+
+def _objeto(text: str) -> Optional[str]:
+    t = text[:4000]
+    m = re.search(r"\bobjeto\b[:\-]?\s*(.+)", t, re.I)
+    if m:
+        obj = m.group(1).strip()
+        obj = re.split(r"\n{2,}|^\s*\d+\)\s+", obj)[0].strip()
+        return obj[:280]
+    lines = [ln.strip() for ln in t.splitlines() if ln.strip()]
+    return (" ".join(lines[:2]))[:180] if lines else None
+
+
+def _amount(text: str) -> Optional[Dict[str, Any]]:
+    m = _RE_AMOUNT.search(text)
+    if not m:
+        return None
+    raw = m.group(0)
+    cur = "COP" if "cop" in raw.lower() or "$" in raw else None
+    mult = 1.0
+    if re.search(r"billon", raw, re.I) or re.search(r"billones|billón", raw, re.I):
+        mult = 1_000_000_000.0
+    elif re.search(r"millon|millón|millones", raw, re.I):
+        mult = 1_000_000.0
+    s = re.sub(r"[^\d,\.]", "", raw).replace(".", "").replace(",", ".")
+    try:
+        value = float(s) * mult
+    except Exception:
+        value = None
+    return {"raw": raw, "value": value, "currency": cur or "COP"}
+
+
+def _date_from(rx, m) -> str:
+    if rx is _RE_DATE_1:
+        return _to_iso(int(m.group(1)), _MONTHS[m.group(2).lower()], int(m.group(3)))
+    if rx is _RE_DATE_2:
+        y = int(m.group(3))
+        return _to_iso(int(m.group(1)), int(m.group(2)), y + 2000 if y < 100 else y)
+    return _to_iso(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+
+
+def _dates(text: str) -> Dict[str, Any]:
+    start = end = months = None
+    m = None
+    for rx in (_RE_DATE_1, _RE_DATE_2, _RE_DATE_3):
+        m = rx.search(text)
+        if m:
+            start = _date_from(rx, m)
+            break
+    for rx in (_RE_DATE_3, _RE_DATE_2, _RE_DATE_1):
+        m2 = rx.search(text, m.end() if m else 0)
+        if m2:
+            end = _date_from(rx, m2)
+            break
+    mtenor = _RE_MONTHS_TENOR.search(text)
+    if mtenor:
+        months = int(mtenor.group(1))
+    if start and end is None and months:
+        try:
+            y1, m1, d1 = [int(x) for x in start.split("-")]
+            end = _add_months(y1, m1, d1, months)
+        except Exception:
+            pass
+    if start and end and months is None:
+        try:
+            y1, m1, _ = [int(x) for x in start.split("-")]
+            y2, m2, _ = [int(x) for x in end.split("-")]
+            months = (y2 - y1) * 12 + (m2 - m1)
+        except Exception:
+            months = None
+    return {"start": start, "end": end, "months": months}
+
+
+def _contractor(text: str) -> Optional[str]:
+    m = _RE_CONTRACTOR.search(text)
+    return m.group(1).strip()[:120] if m else None
+
+
+def reference_fields(text: str) -> Dict[str, Any]:
+    """Campos con la implementación campo a campo anterior al motor de una pasada"""
+    if not text:
+        return {"labels": None, "objeto": None, "amount": None, "dates": None, "contractor": None}
+    return {"labels": _labels(text), "objeto": _objeto(text), "amount": _amount(text),
+            "dates": _dates(text), "contractor": _contractor(text)}
+
+# -----------------------------
+# Textos de prueba
+# -----------------------------
+_FILLER = [
+    "Las partes acuerdan cumplir las obligaciones descritas en los estudios previos.",
+    "El presente documento se rige por la Ley 80 de 1993 y sus decretos reglamentarios.",
+    "La entidad verificará el cumplimiento de los requisitos habilitantes del oferente.",
+    "Los pagos se realizarán previa presentación de la factura y del informe mensual.",
+    "Cualquier controversia se resolverá mediante los mecanismos de solución directa.",
+]
+
+_FIELDS = [
+    "OBJETO: Prestación de servicios profesionales de apoyo jurídico.",
+    "Contratista: Construcciones Andinas S.A.S.",
+    "Valor total: $ 1.250.000.000",
+    "Fecha de inicio 3 de febrero de 2025 y terminación 2025-12-31.",
+    "Plazo de 10 meses contados a partir del acta de inicio.",
+    "Se exige póliza de garantía de cumplimiento; el supervisor aprobará la adición.",
+]
+
+
+def make_text(size: int, sparse: bool = False, seed: int = 0) -> str:
+    """Texto de ``size`` caracteres aprox.; con ``sparse`` los campos sólo al final"""
+    rng = random.Random(seed)
+    parts, length = [], 0
+    while length < size:
+        para = rng.choice(_FILLER) if sparse or rng.random() < 0.9 else rng.choice(_FIELDS)
+        parts.append(para)
+        length += len(para) + 1
+    if sparse:
+        parts.extend(_FIELDS)
+    return "\n".join(parts)
+
+
+def timed(fn: Callable[[str], Any], text: str, repeat: int) -> float:
+    """Mejor tiempo (s) de ``repeat`` ejecuciones"""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extracción de campos de iusweb")
+    parser.add_argument("--mb", type=float, nargs="+", default=[1, 4, 8], help="Tamaños de texto en MB")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por medición")
+    args = parser.parse_args()
+
+    print(f"{'texto':>16}  {'campo a campo':>14}  {'una pasada':>11}  {'mejora':>7}")
+    for mb in args.mb:
+        for sparse in (False, True):
+            text = make_text(int(mb * 1024 * 1024), sparse=sparse)
+            if extract_all(text) != reference_fields(text):
+                raise SystemExit(f"Resultados distintos con {mb} MB (sparse={sparse})")
+            before = timed(reference_fields, text, args.repeat)
+            after = timed(extract_all, text, args.repeat)
+            name = f"{mb:g} MB{' disperso' if sparse else ''}"
+            print(f"{name:>16}  {before:>13.3f}s  {after:>10.3f}s  {before / after:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
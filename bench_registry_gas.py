@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+BENCH_REGISTRY_GAS.PY - Gas por documento: registro individual vs. lote
+=======================================================================
+
+Despliega ExpedienteRegistry en una EVM local en proceso (eth-tester /
+py-evm, sin red) y compara el gas por documento de:
+
+- ``registrar(expedienteId, hash)``: una transacción por documento
+- ``registrarLote(raiz, cantidad)``: una transacción por lote (raíz Merkle)
+
+Requiere: web3, eth-tester[py-evm] y py-solc-x con solc 0.8.20 instalado
+(``python -c "import solcx; solcx.install_solc('0.8.20')"``).
+
+Uso:
+    python bench_registry_gas.py -n 100
+"""
+
+import sys
+import argparse
+from pathlib import Path
+from typing import Dict, Tuple
+
+from anchor_v2 import AnchorConfig, BlockchainNetwork, EthereumBackend
+
+CONTRACT_PATH = (
+    Path(__file__).parent / "ius-digitalis" / "blockchain_registry" / "contracts" / "ExpedienteRegistry.sol"
+)
+SOLC_VERSION = "0.8.20"
+
+
+def compile_registry() -> Tuple[list, str]:
+    """Compilar ExpedienteRegistry.sol y devolver (abi, bytecode)"""
+    import solcx
+
+    compiled = solcx.compile_files(
+        [str(CONTRACT_PATH)],
+        output_values=["abi", "bin"],
+        solc_version=SOLC_VERSION
+    )
+    contract = next(v for k, v in compiled.items() if k.endswith(":ExpedienteRegistry"))
+    return contract["abi"], contract["bin"]
+
+
+def deploy_registry(web3, private_key: str) -> str:
+    """Desplegar el contrato con la cuenta dada y devolver su dirección"""
+    from eth_account import Account
+
+    abi, bytecode = compile_registry()
+    account = Account.from_key(private_key)
+    contract = web3.eth.contract(abi=abi, bytecode=bytecode)
+    tx = contract.constructor().build_transaction({
+        "from": account.address,
+        "nonce": web3.eth.get_transaction_count(account.address),
+        "gasPrice": web3.eth.gas_price,
+    })
+    signed = account.sign_transaction(tx)
+    tx_hash = web3.eth.send_raw_transaction(signed.rawTransaction)
+    return web3.eth.wait_for_transaction_receipt(tx_hash)["contractAddress"]
+
+
+def tester_backend_with_registry() -> EthereumBackend:
+    """EthereumBackend sobre eth-tester con ExpedienteRegistry desplegado"""
+    from web3 import Web3, EthereumTesterProvider
+
+    provider = EthereumTesterProvider()
+    web3 = Web3(provider)
+    key = provider.ethereum_tester.backend.account_keys[0].to_hex()
+    address = deploy_registry(web3, key)
+    config = AnchorConfig(
+        network=BlockchainNetwork.GANACHE,
+        private_key=key,
+        contract_address=address,
+        gas_limit=500000,
+        timeout=10,
+        poll_interval=0.01
+    )
+    return EthereumBackend(config, web3=web3)
+
+
+def run_benchmark(n_docs: int) -> Dict[str, float]:
+    """Medir el gas por documento de ambos modos"""
+    backend = tester_backend_with_registry()
+    items = [
+        {"expediente_id": f"EXP-BENCH-{i:05d}", "text": f"Documento {i}",
+         "predicted_label": "administrativo", "confidence": 0.9}
+        for i in range(n_docs)
+    ]
+
+    single_gas = sum(backend.anchor(data).metadata["gas_used"] for data in items)
+
+    batch_items = [{**data, "expediente_id": data["expediente_id"] + "-L"} for data in items]
+    batch_records = backend.anchor_batch(batch_items)
+    batch_gas = batch_records[0].metadata["gas_used"]
+
+    return {
+        "documents": n_docs,
+        "single_gas_per_doc": single_gas / n_docs,
+        "batch_gas_per_doc": batch_gas / n_docs,
+        "reduction": single_gas / batch_gas if batch_gas else float("inf"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gas por documento en ExpedienteRegistry")
+    parser.add_argument("-n", "--documents", type=int, default=100, help="Documentos por modo")
+    args = parser.parse_args()
+
+    try:
+        result = run_benchmark(args.documents)
+    except ImportError as e:
+        print(f"Dependencia faltante: {e}. Ver requisitos en la cabecera del script.")
+        sys.exit(1)
+
+    print("=" * 60)
+    print(f"Documentos:               {result['documents']}")
+    print(f"Gas/doc registrar():      {result['single_gas_per_doc']:,.0f}")
+    print(f"Gas/doc registrarLote():  {result['batch_gas_per_doc']:,.0f}")
+    print(f"Reducción:                {result['reduction']:.1f}x")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,46 @@
 from pathlib import Path
 import pandas as pd
-import hashlib, time, json
+import hashlib, time, json, sys
 
 ROOT = Path(__file__).resolve().parents[1]
 CSV = ROOT / "ia_classifier" / "outputs" / "classifications.csv"
 OUT = Path(__file__).resolve().parent / "outputs" / "anchors.json"
+BLOOM = OUT.parent / "anchored.bloom"
 OUT.parent.mkdir(parents=True, exist_ok=True)
 
+sys.path.insert(0, str(ROOT))
+from anchor_filter import AnchoredHashFilter
+
 def fake_tx_id(s: str) -> str:
     return hashlib.sha256(s.encode("utf-8")).hexdigest()[:66]
 
+def load_previous() -> dict:
+    """Anclas ya escritas, por sha256 (fuente de verdad del filtro)."""
+    if not OUT.exists():
+        return {}
+    with open(OUT, "r", encoding="utf-8") as f:
+        return {a["sha256"]: a for a in json.load(f).get("anchors", [])}
+
 def main():
     if not CSV.exists():
         raise SystemExit(f"No existe {CSV}. Ejecuta primero el clasificador.")
     df = pd.read_csv(CSV)
+    rebuild = not BLOOM.exists()
+    anchored = AnchoredHashFilter(capacity=1_000_000, path=BLOOM)
+    previous = None
+    if rebuild:
+        previous = load_previous()
+        anchored.update(previous)
     anchors = []
     for _, r in df.iterrows():
+        # Un "no" del filtro es definitivo; sólo un "quizá" consulta anchors.json
+        if r["sha256"] in anchored:
+            if previous is None:
+                previous = load_previous()
+            if r["sha256"] in previous:
+                anchors.append(previous[r["sha256"]])
+                print(f"[BC] {r['expediente_id']} ya anclado -> tx {previous[r['sha256']]['tx_id'][2:14]}...")
+                continue
         payload = f"{r['expediente_id']}|{r['sha256']}|{int(time.time())}"
         txid = fake_tx_id(payload)
         anchors.append({
@@ -26,9 +51,11 @@ def main():
             "network": "polygon-testnet (simulado)",
             "status": "CONFIRMED"
         })
+        anchored.add(r["sha256"])
         print(f"[BC] {r['expediente_id']} -> tx {txid[:12]}... CONFIRMED")
     with open(OUT, "w", encoding="utf-8") as f:
         json.dump({"anchors": anchors}, f, ensure_ascii=False, indent=2)
+    anchored.close()
     print(f"\nAnclas escritas en: {OUT}")
 
 if __name__ == "__main__":
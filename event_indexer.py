@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+EVENT_INDEXER.PY - Índice local de eventos de ExpedienteRegistry
+================================================================
+
+Sincroniza los eventos ``ExpedienteRegistrado`` y ``LoteRegistrado`` del
+contrato en una base SQLite local, por rangos de bloques, para que la
+verificación de anclajes se resuelva con una consulta indexada en disco
+en lugar de llamadas RPC.
+
+- Checkpoints reanudables: cada rango se guarda junto con su checkpoint
+  en una sola transacción SQLite
+- Reorganizaciones: si el hash del último bloque sincronizado ya no
+  coincide con la red, se retrocede de ``reorg_depth`` en ``reorg_depth``
+  bloques hasta uno cuyo hash guardado siga siendo canónico y se reindexa
+- ``BlockchainAnchor.verify_record`` consulta el índice y sólo va a la
+  cadena para bloques posteriores a la última sincronización
+
+Uso:
+    python event_indexer.py --rpc-url http://127.0.0.1:8545 --contract 0x...
+
+Autor: Consultoría de Sistemas Legales Automatizados
+Fecha: 2025-11-05
+Versión: 1.0.0
+"""
+
+import sys
+import sqlite3
+import logging
+import threading
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from anchor_v2 import BLOCKCHAIN_DIR, EXPEDIENTE_REGISTRY_ABI, BlockchainRecord
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------------------------------------------------------
+# FUENTES DE EVENTOS
+# ----------------------------------------------------------------------------
+
+class EventLogSource:
+    """
+    Fuente de eventos normalizados del registro.
+
+    Cada evento es un diccionario con: block_number, block_hash, tx_hash,
+    log_index, kind ('expediente' | 'lote'), expediente_id, document_hash
+    (hex sin prefijo; la raíz en los lotes), cantidad y timestamp.
+    """
+
+    def head(self) -> int:
+        """Último bloque disponible"""
+        raise NotImplementedError("Subclases deben implementar head()")
+
+    def block_hash(self, block_number: int) -> str:
+        """Hash de un bloque (para detectar reorganizaciones)"""
+        raise NotImplementedError("Subclases deben implementar block_hash()")
+
+    def get_events(self, from_block: int, to_block: int) -> List[Dict]:
+        """Eventos del registro en el rango [from_block, to_block]"""
+        raise NotImplementedError("Subclases deben implementar get_events()")
+
+
+class Web3LogSource(EventLogSource):
+    """Eventos de ExpedienteRegistry leídos con ``eth_getLogs`` vía web3.py"""
+
+    def __init__(self, web3, contract_address: str):
+        self.web3 = web3
+        self.contract = web3.eth.contract(
+            address=web3.to_checksum_address(contract_address),
+            abi=EXPEDIENTE_REGISTRY_ABI
+        )
+
+    def head(self) -> int:
+        return self.web3.eth.block_number
+
+    def block_hash(self, block_number: int) -> str:
+        return self.web3.eth.get_block(block_number)['hash'].hex()
+
+    def get_events(self, from_block: int, to_block: int) -> List[Dict]:
+        events = []
+        for log in self.contract.events.ExpedienteRegistrado().get_logs(fromBlock=from_block, toBlock=to_block):
+            events.append(self._normalize(log, 'expediente', {
+                "expediente_id": log['args']['expedienteId'],
+                "document_hash": log['args']['documentoHash'].hex(),
+                "cantidad": 1,
+                "timestamp": log['args']['timestamp']
+            }))
+        for log in self.contract.events.LoteRegistrado().get_logs(fromBlock=from_block, toBlock=to_block):
+            events.append(self._normalize(log, 'lote', {
+                "expediente_id": None,
+                "document_hash": log['args']['raiz'].hex(),
+                "cantidad": log['args']['cantidad'],
+                "timestamp": log['args']['timestamp']
+            }))
+        return sorted(events, key=lambda e: (e["block_number"], e["log_index"]))
+
+    @staticmethod
+    def _normalize(log, kind: str, fields: Dict) -> Dict:
+        fields["document_hash"] = fields["document_hash"].lower().removeprefix("0x")
+        return {
+            "block_number": log['blockNumber'],
+            "block_hash": log['blockHash'].hex(),
+            "tx_hash": log['transactionHash'].hex(),
+            "log_index": log['logIndex'],
+            "kind": kind,
+            **fields
+        }
+
+# ----------------------------------------------------------------------------
+# ÍNDICE LOCAL
+# ----------------------------------------------------------------------------
+
+class EventIndex:
+    """Almacén SQLite de eventos indexado por hash de documento y de transacción"""
+
+    def __init__(self, db_path: Optional[Path] = None):
+        self.db_path = Path(db_path or BLOCKCHAIN_DIR / "event_index.db")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                block_number INTEGER NOT NULL,
+                block_hash TEXT NOT NULL,
+                tx_hash TEXT NOT NULL,
+                log_index INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                expediente_id TEXT,
+                document_hash TEXT NOT NULL,
+                cantidad INTEGER,
+                timestamp INTEGER,
+                PRIMARY KEY (tx_hash, log_index)
+            );
+            CREATE INDEX IF NOT EXISTS idx_events_document ON events(document_hash);
+            CREATE INDEX IF NOT EXISTS idx_events_block ON events(block_number);
+            CREATE TABLE IF NOT EXISTS checkpoint (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                last_block INTEGER NOT NULL,
+                last_block_hash TEXT
+            );
+        """)
+        self._conn.commit()
+
+    def checkpoint(self) -> Optional[Dict]:
+        """Último bloque sincronizado y su hash, o None si el índice está vacío"""
+        with self._lock:
+            row = self._conn.execute("SELECT last_block, last_block_hash FROM checkpoint WHERE id = 1").fetchone()
+        return {"last_block": row[0], "last_block_hash": row[1]} if row else None
+
+    @property
+    def last_block(self) -> int:
+        checkpoint = self.checkpoint()
+        return checkpoint["last_block"] if checkpoint else -1
+
+    def store_range(self, events: List[Dict], last_block: int, last_block_hash: Optional[str]) -> None:
+        """Guardar los eventos de un rango y avanzar el checkpoint de forma atómica"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                """
+                INSERT OR REPLACE INTO events
+                    (block_number, block_hash, tx_hash, log_index, kind, expediente_id, document_hash, cantidad, timestamp)
+                VALUES (:block_number, :block_hash, :tx_hash, :log_index, :kind, :expediente_id, :document_hash, :cantidad, :timestamp)
+                """,
+                events
+            )
+            self._set_checkpoint(last_block, last_block_hash)
+
+    def rewind(self, to_block: int, block_hash: Optional[str]) -> None:
+        """Descartar los eventos posteriores a ``to_block`` (reorganización)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM events WHERE block_number > ?", (to_block,))
+            self._set_checkpoint(to_block, block_hash)
+
+    def _set_checkpoint(self, last_block: int, last_block_hash: Optional[str]) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO checkpoint (id, last_block, last_block_hash) VALUES (1, ?, ?)",
+            (last_block, last_block_hash)
+        )
+
+    def block_at_or_before(self, block_number: int) -> Optional[Tuple[int, str]]:
+        """Último bloque indexado con eventos hasta ``block_number``, con su hash guardado"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT block_number, block_hash FROM events WHERE block_number <= ? "
+                "ORDER BY block_number DESC LIMIT 1",
+                (block_number,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def find(self, document_hash: str) -> List[Dict]:
+        """Eventos que registran ``document_hash`` (o una raíz de lote)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT * FROM events WHERE document_hash = ? ORDER BY block_number",
+                (document_hash.lower().removeprefix("0x"),)
+            )
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+# ----------------------------------------------------------------------------
+# INDEXADOR
+# ----------------------------------------------------------------------------
+
+class ExpedienteEventIndexer:
+    """Sincronización incremental fuente -> índice, con rebobinado ante reorgs"""
+
+    def __init__(
+        self,
+        source: EventLogSource,
+        index: EventIndex,
+        start_block: int = 0,
+        batch_blocks: int = 2000,
+        reorg_depth: int = 12
+    ):
+        self.source = source
+        self.index = index
+        self.start_block = start_block
+        self.batch_blocks = max(1, batch_blocks)
+        self.reorg_depth = max(1, reorg_depth)
+
+    @property
+    def last_synced_block(self) -> int:
+        return max(self.index.last_block, self.start_block - 1)
+
+    def _check_reorg(self) -> None:
+        """
+        Rebobinar si el último bloque sincronizado ya no es canónico
+
+        Retrocede ``reorg_depth`` bloques cada vez y compara el hash guardado
+        del último bloque indexado hasta ahí con el de la red, hasta que
+        coincidan; si ninguno coincide se reindexa desde ``start_block``.
+        """
+        checkpoint = self.index.checkpoint()
+        if not checkpoint or checkpoint["last_block_hash"] is None:
+            return
+
+        block = checkpoint["last_block"]
+        if self.source.block_hash(block) == checkpoint["last_block_hash"]:
+            return
+
+        logger.warning(f"Reorganización detectada en bloque {block}")
+        while True:
+            known = self.index.block_at_or_before(max(self.start_block - 1, block - self.reorg_depth))
+            if known is None:
+                to_block, to_hash = self.start_block - 1, None
+                break
+            block, stored_hash = known
+            if self.source.block_hash(block) == stored_hash:
+                to_block, to_hash = block, stored_hash
+                break
+
+        logger.warning(f"Rebobinando el índice hasta el bloque {to_block}")
+        self.index.rewind(to_block, to_hash)
+
+    def sync(self, to_block: Optional[int] = None) -> int:
+        """
+        Sincronizar hasta ``to_block`` (por defecto, el último bloque)
+
+        Returns:
+            Número de eventos nuevos indexados
+        """
+        self._check_reorg()
+        head = self.source.head() if to_block is None else to_block
+        added = 0
+
+        start = self.last_synced_block + 1
+        while start <= head:
+            end = min(start + self.batch_blocks - 1, head)
+            events = self.source.get_events(start, end)
+            self.index.store_range(events, end, self.source.block_hash(end))
+            added += len(events)
+            logger.debug(f"Indexados bloques {start}-{end}: {len(events)} eventos")
+            start = end + 1
+
+        if added:
+            logger.info(f"Índice sincronizado hasta bloque {head}: {added} eventos nuevos")
+        return added
+
+    def verify(self, record: BlockchainRecord) -> Optional[bool]:
+        """
+        Verificar un registro usando sólo el índice
+
+        Returns:
+            True si el índice contiene el evento de la transacción; False si
+            la prueba Merkle del registro no es válida; None si el índice no
+            puede decidir (bloque posterior a la última sincronización o
+            anclaje sin evento, como la auto-transferencia sin contrato) y
+            hay que ir a la cadena
+        """
+        if record.block_number is None or record.block_number > self.last_synced_block:
+            return None
+
+        expected = record.anchored_hash()
+        if not expected:
+            return False
+
+        for event in self.index.find(expected):
+            if event["tx_hash"].lower() == (record.transaction_hash or "").lower():
+                return True
+        return None
+
+# ----------------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------------
+
+def main():
+    """Sincronizar el índice contra un nodo RPC"""
+    parser = argparse.ArgumentParser(description="Indexador de eventos de ExpedienteRegistry")
+    parser.add_argument("--rpc-url", required=True, help="URL del nodo RPC")
+    parser.add_argument("--contract", required=True, help="Dirección del contrato")
+    parser.add_argument("--db", type=Path, default=None, help="Ruta de la base SQLite")
+    parser.add_argument("--start-block", type=int, default=0, help="Bloque de despliegue del contrato")
+    parser.add_argument("--batch-blocks", type=int, default=2000, help="Bloques por consulta eth_getLogs")
+    parser.add_argument("--reorg-depth", type=int, default=12, help="Bloques a rebobinar ante una reorg")
+    args = parser.parse_args()
+
+    try:
+        from web3 import Web3
+    except ImportError:
+        logger.error("web3.py no disponible. Instala con: pip install web3")
+        sys.exit(1)
+
+    web3 = Web3(Web3.HTTPProvider(args.rpc_url))
+    indexer = ExpedienteEventIndexer(
+        Web3LogSource(web3, args.contract),
+        EventIndex(args.db),
+        start_block=args.start_block,
+        batch_blocks=args.batch_blocks,
+        reorg_depth=args.reorg_depth
+    )
+    added = indexer.sync()
+    print(f"Eventos nuevos: {added} - Último bloque indexado: {indexer.last_synced_block}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+HASH_UTILS.PY - Hash SHA-256 compartido de archivos, bytes y streams
+====================================================================
+
+Un único punto para los hashes de contenido que usan el RPA, el
+clasificador, la API web y el registro blockchain:
+
+- ``sha256_file``: archivos grandes vía ``mmap`` (sin copiarlos a memoria
+  de Python) y lectura por bloques para el resto
+- ``StreamingHasher``: hash incremental de subidas por fragmentos
+- ``hash_files``: muchos archivos en paralelo en un pool de hilos
+  (hashlib libera el GIL con buffers grandes)
+- ``HashCache``: caché por (ruta, tamaño, mtime) para no rehashear
+  archivos sin cambios entre ejecuciones nocturnas
+
+Uso:
+    python hash_utils.py rpa_secop/data/raw --cache data/hash_cache.db
+
+Autor: Consultoría de Sistemas Legales Automatizados
+Fecha: 2025-11-05
+Versión: 1.0.0
+"""
+
+import os
+import sys
+import mmap
+import json
+import sqlite3
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+
+PathLike = Union[str, Path]
+
+# Tamaño de lectura por bloques y umbral a partir del cual se usa mmap
+CHUNK_SIZE = 1 << 20
+MMAP_THRESHOLD = 8 << 20
+
+# ----------------------------------------------------------------------------
+# HASH DE BYTES Y ARCHIVOS
+# ----------------------------------------------------------------------------
+
+def sha256_bytes(data: bytes) -> str:
+    """SHA-256 hexadecimal de un buffer en memoria"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: PathLike, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    SHA-256 hexadecimal de un archivo
+
+    Los archivos de ``MMAP_THRESHOLD`` bytes o más se mapean en memoria y se
+    pasan a hashlib de una vez (el SO pagina bajo demanda; no se copian al
+    heap). Los pequeños se leen por bloques en un buffer reutilizado.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                h.update(mapped)
+        else:
+            buffer = bytearray(min(chunk_size, max(size, 1)))
+            view = memoryview(buffer)
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                h.update(view[:n])
+    return h.hexdigest()
+
+
+class StreamingHasher:
+    """SHA-256 incremental para contenidos que llegan por fragmentos (subidas)"""
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def update(self, chunk: bytes) -> "StreamingHasher":
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        return self
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def sha256_stream(stream, chunk_size: int = CHUNK_SIZE) -> str:
+    """SHA-256 de un objeto tipo archivo leído hasta el final"""
+    hasher = StreamingHasher()
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+# ----------------------------------------------------------------------------
+# CACHÉ POR (RUTA, TAMAÑO, MTIME)
+# ----------------------------------------------------------------------------
+
+class HashCache:
+    """
+    Caché de hashes de archivos válida mientras no cambien tamaño ni mtime
+
+    Sin ``db_path`` vive sólo en memoria; con él se guarda en SQLite y se
+    reutiliza entre ejecuciones.
+    """
+
+    def __init__(self, db_path: Optional[PathLike] = None):
+        self._lock = threading.Lock()
+        self._memory: Dict[str, tuple] = {}
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+        if db_path is not None:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL
+                )
+            """)
+            self._conn.commit()
+
+    @staticmethod
+    def _key(path: PathLike):
+        resolved = Path(path).resolve()
+        stat = resolved.stat()
+        return str(resolved), stat.st_size, stat.st_mtime_ns
+
+    def get(self, path: PathLike) -> Optional[str]:
+        """Hash guardado si el archivo no cambió desde entonces"""
+        key, size, mtime_ns = self._key(path)
+        with self._lock:
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT size, mtime_ns, sha256 FROM file_hashes WHERE path = ?", (key,)
+                ).fetchone()
+            else:
+                row = self._memory.get(key)
+            if row and row[0] == size and row[1] == mtime_ns:
+                self.hits += 1
+                return row[2]
+            self.misses += 1
+            return None
+
+    def put(self, path: PathLike, digest: str, size: int, mtime_ns: int) -> None:
+        key = str(Path(path).resolve())
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                    (key, size, mtime_ns, digest)
+                )
+                self._conn.commit()
+            else:
+                self._memory[key] = (size, mtime_ns, digest)
+
+    def hash_file(self, path: PathLike) -> str:
+        """Hash del archivo, desde la caché si sigue vigente"""
+        cached = self.get(path)
+        if cached is not None:
+            return cached
+        _, size, mtime_ns = self._key(path)
+        digest = sha256_file(path)
+        # Si el archivo cambió mientras se leía, no se cachea
+        if self._key(path)[1:] == (size, mtime_ns):
+            self.put(path, digest, size, mtime_ns)
+        return digest
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# ----------------------------------------------------------------------------
+# HASH EN PARALELO
+# ----------------------------------------------------------------------------
+
+def hash_files(
+    paths: Iterable[PathLike],
+    max_workers: Optional[int] = None,
+    cache: Optional[HashCache] = None
+) -> Dict[str, str]:
+    """
+    Hashear muchos archivos en paralelo
+
+    Args:
+        paths: Rutas de los archivos
+        max_workers: Hilos (por defecto, CPUs disponibles)
+        cache: HashCache opcional para saltar archivos sin cambios
+
+    Returns:
+        Diccionario ruta (tal como se pasó) -> SHA-256 hexadecimal
+    """
+    paths = [str(p) for p in paths]
+    hasher = cache.hash_file if cache is not None else sha256_file
+    workers = max_workers or os.cpu_count() or 4
+    if len(paths) <= 1 or workers == 1:
+        return {p: hasher(p) for p in paths}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(hasher, paths)))
+
+# ----------------------------------------------------------------------------
+# CLI
+# ----------------------------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="SHA-256 de archivos en paralelo con caché")
+    parser.add_argument("paths", nargs="+", type=Path, help="Archivos o directorios")
+    parser.add_argument("--pattern", default="*.pdf", help="Patrón dentro de directorios")
+    parser.add_argument("--cache", type=Path, default=None, help="Base SQLite de la caché")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="Hilos de hash")
+    args = parser.parse_args()
+
+    files = []
+    for path in args.paths:
+        files.extend(sorted(path.rglob(args.pattern)) if path.is_dir() else [path])
+
+    cache = HashCache(args.cache) if args.cache else None
+    hashes = hash_files(files, max_workers=args.workers, cache=cache)
+    json.dump(hashes, sys.stdout, indent=2, ensure_ascii=False)
+    print()
+    if cache:
+        print(f"Caché: {cache.hits} aciertos, {cache.misses} fallos", file=sys.stderr)
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 from pathlib import Path
+import sys
 import pandas as pd
-import hashlib
 from PyPDF2 import PdfReader
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from hash_utils import hash_files
+
 RAW_DIR = Path(__file__).resolve().parents[1] / "rpa_secop" / "data" / "raw"
 OUT_DIR = Path(__file__).resolve().parent / "outputs"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
@@ -14,13 +17,6 @@ CATEG = {
     "ACTA": "Acta"
 }
 
-def sha256_file(path):
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-    return h.hexdigest()
-
 def heuristica(pdf_path):
     try:
         reader = PdfReader(str(pdf_path))
@@ -37,9 +33,11 @@ def main():
     if not RAW_DIR.exists():
         raise SystemExit(f"No existe {RAW_DIR}. Ejecuta primero el RPA: python rpa_secop/src/main.py")
     rows = []
-    for pdf in sorted(RAW_DIR.glob("*.pdf")):
+    pdfs = sorted(RAW_DIR.glob("*.pdf"))
+    hashes = hash_files(pdfs)
+    for pdf in pdfs:
         categoria = heuristica(pdf)
-        content_hash = sha256_file(pdf)
+        content_hash = hashes[str(pdf)]
         rows.append({
             "expediente_id": pdf.stem,
             "pdf": str(pdf),
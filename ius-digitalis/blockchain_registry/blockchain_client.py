@@ -1,9 +1,12 @@
 # Cliente de ejemplo (no requiere Web3 para este placeholder)
-import hashlib, json, pathlib
+import sys, json, pathlib
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[2]))
+from hash_utils import sha256_file
 
 def sha256_bytes(path):
-    data = pathlib.Path(path).read_bytes()
-    return hashlib.sha256(data).hexdigest()
+    # Hash del archivo por bloques/mmap, sin cargarlo entero en memoria
+    return sha256_file(path)
 
 if __name__ == '__main__':
     print('Calcule el hash de un PDF y guárdelo para anclarlo on-chain más adelante.')
@@ -3,7 +3,10 @@ pragma solidity ^0.8.20;
 
 contract ExpedienteRegistry {
     event ExpedienteRegistrado(string expedienteId, bytes32 documentoHash, uint256 timestamp);
+    event LoteRegistrado(bytes32 indexed raiz, uint256 cantidad, uint256 timestamp);
     mapping(string => bytes32) private hashes;
+    // Raíz Merkle de un lote -> número de documentos que cubre
+    mapping(bytes32 => uint256) private lotes;
 
     function registrar(string calldata expedienteId, bytes32 documentoHash) external {
         require(hashes[expedienteId] == bytes32(0), "Ya existe");
@@ -11,7 +14,21 @@ contract ExpedienteRegistry {
         emit ExpedienteRegistrado(expedienteId, documentoHash, block.timestamp);
     }
 
+    // Registra un lote completo con una sola escritura: la raíz Merkle de los
+    // hashes de sus documentos. Cada documento se prueba fuera de la cadena
+    // con su ruta Merkle contra esta raíz.
+    function registrarLote(bytes32 raiz, uint256 cantidad) external {
+        require(cantidad > 0, "Lote vacio");
+        require(lotes[raiz] == 0, "Lote ya existe");
+        lotes[raiz] = cantidad;
+        emit LoteRegistrado(raiz, cantidad, block.timestamp);
+    }
+
     function verificar(string calldata expedienteId, bytes32 documentoHash) external view returns (bool) {
         return hashes[expedienteId] == documentoHash;
     }
+
+    function consultarLote(bytes32 raiz) external view returns (uint256) {
+        return lotes[raiz];
+    }
 }
@@ -1,12 +1,15 @@
-from fastapi import FastAPI, UploadFile, File, Body
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi import FastAPI, UploadFile, File, Body, Request
+from fastapi.responses import JSONResponse, HTMLResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
-import datetime, hashlib, sys, io, re, socket
+import datetime, sys, io, socket
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import date
-import json, glob, os
+import json, os, zipfile, tempfile, uuid
+import base64, hashlib
+import asyncio, threading, time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # -----------------------------
 # App & Middleware (debe ir primero)
@@ -65,6 +68,7 @@ class FileOut(BaseModel):
     dates: Optional['Dates'] = Field(None, description="Fechas relevantes detectadas")
     contractor: Optional[str] = Field(None, description="Contratista si se detecta")
     anchor: Optional[dict] = Field(None, description="Datos de anclaje (simulado) en blockchain si existe")
+    cached: bool = Field(False, description="La extracción se reutilizó de otra subida con el mismo SHA-256")
 
 # -----------------------------
 # Página Home (UI)
@@ -400,7 +404,7 @@ def home():
         const j = JSON.parse(txt);
         if(!j.hash){ toast('No hay hash para anclar'); return; }
         const r = await postJSON('/api/anchor', { hash: j.hash });
-        toast('Anclado: '+(r.txid||'ok'));
+        toast(r.error ? (r.error+': '+(r.txid||'')) : 'Anclado: '+(r.txid||'ok'));
         // refrescar detalle si backend actualizó el JSON
         try{ await loadRecent(); }catch(_){}
       }catch{ toast('Resultado inválido'); }
@@ -417,8 +421,298 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 UPLOADS = BASE_DIR / "iusweb" / "uploads"
 UPLOADS.mkdir(exist_ok=True, parents=True)
 
-def sha256_bytes(data: bytes) -> str:
-    return hashlib.sha256(data).hexdigest()
+# Hash compartido con el RPA y el registro blockchain (hash_utils.py en la raíz)
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+from hash_utils import StreamingHasher
+from anchor_filter import AnchoredHashFilter
+from iusweb.upload_index import UploadIndex, write_json_atomic
+from iusweb import field_engine
+
+# Índice hash -> JSON de resultado (evita recorrer uploads en cada búsqueda).
+# Se abre en el arranque de la app: importar el módulo no crea archivos.
+UPLOAD_INDEX: Optional[UploadIndex] = None
+
+# -----------------------------
+# Pools de ejecución (fuera del event loop)
+# -----------------------------
+# Parseo de PDF, OCR y regex van a un pool de procesos; la E/S de archivos,
+# a un pool de hilos. IUSWEB_CPU_WORKERS=0 usa hilos también para la CPU.
+CPU_WORKERS = int(os.getenv("IUSWEB_CPU_WORKERS", str(os.cpu_count() or 2)))
+IO_THREADS = int(os.getenv("IUSWEB_IO_THREADS", "8"))
+# Límite independiente por etapa: varios OCR largos no acaparan el parseo
+STAGE_LIMITS = {
+    "parse": int(os.getenv("IUSWEB_PARSE_CONCURRENCY", str(max(1, CPU_WORKERS)))),
+    "ocr": int(os.getenv("IUSWEB_OCR_CONCURRENCY", str(max(1, CPU_WORKERS // 2)))),
+}
+
+_pools = {"cpu": None, "io": None}
+_pools_lock = threading.Lock()
+_stage_slots = {}  # etapa -> (event loop, semáforo)
+
+def _io_pool() -> ThreadPoolExecutor:
+    with _pools_lock:
+        if _pools["io"] is None:
+            _pools["io"] = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="iusweb-io")
+        return _pools["io"]
+
+def _cpu_pool():
+    if CPU_WORKERS <= 0:
+        return _io_pool()
+    with _pools_lock:
+        if _pools["cpu"] is None:
+            _pools["cpu"] = ProcessPoolExecutor(max_workers=CPU_WORKERS)
+        return _pools["cpu"]
+
+def _slots(stage: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    owner, sem = _stage_slots.get(stage, (None, None))
+    if owner is not loop:
+        sem = asyncio.Semaphore(STAGE_LIMITS[stage])
+        _stage_slots[stage] = (loop, sem)
+    return sem
+
+async def run_cpu(stage: str, fn, *args):
+    """Ejecuta fn(*args) en el pool de CPU respetando el límite de la etapa."""
+    async with _slots(stage):
+        return await asyncio.get_running_loop().run_in_executor(_cpu_pool(), fn, *args)
+
+async def run_io(fn, *args):
+    """Ejecuta E/S bloqueante en el pool de hilos."""
+    return await asyncio.get_running_loop().run_in_executor(_io_pool(), fn, *args)
+
+def _page_ranges(pages: List[int], step: int) -> List[tuple]:
+    """Agrupa páginas en rangos contiguos de como mucho ``step`` páginas."""
+    ranges = []
+    for page in sorted(pages):
+        if ranges and page == ranges[-1][1] + 1 and page - ranges[-1][0] < step:
+            ranges[-1] = (ranges[-1][0], page)
+        else:
+            ranges.append((page, page))
+    return ranges
+
+async def ocr_pdf_pages(path: Path, n_pages: Optional[int] = None, only: Optional[List[int]] = None):
+    """
+    Devuelve ({página: texto}, n_pages, note) con OCR repartido por rangos
+    de páginas en el pool de CPU (todas, o sólo las de ``only``). Cada
+    tarea renderiza una página a la vez y la etapa "ocr" limita las tareas
+    simultáneas, así que nunca hay más de STAGE_LIMITS["ocr"] imágenes de
+    página en memoria. La nota incluye tiempos por página y el pico de
+    memoria de los procesos de OCR.
+    """
+    missing = _ocr_missing()
+    if missing:
+        return {}, None, "OCR no disponible: falta " + " y ".join(missing)
+    if not n_pages:
+        n_pages = await run_io(_pdf_page_count, path)
+    if not n_pages:
+        return {}, None, "OCR error: no se pudo leer el número de páginas"
+
+    targets = only if only is not None else range(1, n_pages + 1)
+    ranges = _page_ranges(list(targets), max(1, OCR_PAGES_PER_TASK))
+    started = time.perf_counter()
+    try:
+        parts = await asyncio.gather(*(run_cpu("ocr", ocr_page_range, path, first, last) for first, last in ranges))
+    except Exception as e:
+        return {}, None, f"OCR error: {e.__class__.__name__}"
+    elapsed = time.perf_counter() - started
+
+    results = sorted(page for chunk, _ in parts for page in chunk)
+    texts = {page: txt for page, txt, _ in results}
+    peaks = [peak for _, peak in parts if peak is not None]
+    note = "OCR aplicado" if any(t.strip() for t in texts.values()) else "OCR intentado sin texto"
+    note += f" ({len(results)} de {n_pages} págs en {elapsed:.1f} s; s por página: "
+    note += ", ".join(f"{page}:{secs:.2f}" for page, _, secs in results)
+    if peaks:
+        note += f"; pico de memoria por proceso: {max(peaks):.0f} MB"
+    return texts, n_pages, note + ")"
+
+async def extract_pdf_text(path: Path):
+    """
+    Devuelve (texto, n_pages, note) decidiendo el OCR página a página: se
+    usa la capa de texto donde existe y sólo se hace OCR de las páginas
+    vacías o con menos de OCR_MIN_PAGE_CHARS caracteres. Si la capa de texto
+    no pudo leerse, se hace OCR del documento completo.
+    """
+    page_texts, pages, note = await run_cpu("parse", extract_pdf_pages_file, path)
+    scan = pages_needing_ocr(page_texts) if page_texts is not None else None
+    if scan == []:
+        return "\n".join(page_texts).strip(), pages, note
+
+    ocr_texts, ocr_pages, ocr_note = await ocr_pdf_pages(path, pages, only=scan)
+    note = " | ".join([s for s in (note, ocr_note) if s])
+    pages = pages or ocr_pages
+    if page_texts is None:
+        return "\n".join(ocr_texts[p] for p in sorted(ocr_texts)).strip(), pages, note
+    # Mezclar en orden: texto OCR en las páginas escaneadas si trajo algo
+    merged = [ocr_texts.get(i, "").strip() or txt for i, txt in enumerate(page_texts, start=1)]
+    return "\n".join(merged).strip(), pages, note
+
+@app.on_event("shutdown")
+def _shutdown_pools():
+    with _pools_lock:
+        for name, pool in _pools.items():
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+            _pools[name] = None
+
+# -----------------------------
+# Caché de extracción por SHA-256
+# -----------------------------
+class ExtractionCache:
+    """
+    LRU acotado por tamaño de extracciones (texto, páginas, notas y campos)
+    indexado por el SHA-256 de la subida. Subidas simultáneas de los mismos
+    bytes comparten una sola extracción en curso. Vive en el event loop: no
+    necesita locks.
+    """
+
+    ENTRY_OVERHEAD = 2048  # campos estructurados y notas, aproximado
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # clave -> (resultado, tamaño)
+        self._inflight = {}  # clave -> asyncio.Task
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: str, value: dict) -> None:
+        cost = sys.getsizeof(value.get("text") or "") + self.ENTRY_OVERHEAD
+        if cost > self.max_bytes:
+            return
+        if key in self._entries:
+            self.size -= self._entries.pop(key)[1]
+        self._entries[key] = (value, cost)
+        self.size += cost
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+
+    async def get_or_compute(self, key: str, compute):
+        """Devuelve (resultado, origen) con origen "miss", "hit" o "coalesced"."""
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached, "hit"
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task), "coalesced"
+
+        self.misses += 1
+
+        async def run():
+            try:
+                value = await compute()
+                self.put(key, value)
+                return value
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.ensure_future(run())
+        self._inflight[key] = task
+        # shield: si quien la lanzó se desconecta, la extracción sigue para los demás
+        return await asyncio.shield(task), "miss"
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                "in_flight": len(self._inflight)}
+
+EXTRACTION_CACHE = ExtractionCache(int(os.getenv("IUSWEB_EXTRACTION_CACHE_MB", "256")) * 1024 * 1024)
+
+# -----------------------------
+# Subidas por bloques
+# -----------------------------
+# La subida se copia por bloques a un temporal mientras se calcula su
+# SHA-256; nunca se tiene el archivo completo en memoria.
+MAX_UPLOAD_BYTES = int(os.getenv("IUSWEB_MAX_UPLOAD_MB", "512")) * 1024 * 1024
+UPLOAD_CHUNK = 1 << 20
+# Lotes (/api/classify-batch): bytes totales (contenido de los ZIP incluido) y documentos
+MAX_BATCH_BYTES = int(os.getenv("IUSWEB_MAX_BATCH_MB", "2048")) * 1024 * 1024
+MAX_BATCH_DOCS = int(os.getenv("IUSWEB_MAX_BATCH_DOCS", "300"))
+# Ruta -> (límite del cuerpo, leído en cada petición; error)
+UPLOAD_PATHS = {
+    "/api/classify-file": (lambda: MAX_UPLOAD_BYTES, "Archivo demasiado grande"),
+    "/api/classify-batch": (lambda: MAX_BATCH_BYTES, "Lote demasiado grande"),
+}
+
+class UploadTooLarge(Exception):
+    def __init__(self, message: str = "Archivo demasiado grande"):
+        super().__init__(message)
+        self.message = message
+
+@app.middleware("http")
+async def _reject_oversized_uploads(request: Request, call_next):
+    """Rechaza por Content-Length antes de leer el cuerpo."""
+    if request.url.path in UPLOAD_PATHS:
+        limit, error = UPLOAD_PATHS[request.url.path]
+        try:
+            declared = int(request.headers.get("content-length", "0"))
+        except ValueError:
+            declared = 0
+        # Margen para las cabeceras multipart
+        if declared > limit() + 64 * 1024:
+            return JSONResponse({"error": error}, status_code=413)
+    return await call_next(request)
+
+def _write_chunk(fh, hasher: StreamingHasher, chunk: bytes) -> None:
+    fh.write(chunk)
+    hasher.update(chunk)
+
+def upload_prefix() -> str:
+    """Prefijo único para los archivos de una subida: instante (µs) y un sufijo aleatorio."""
+    return f"{datetime.datetime.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+
+async def receive_upload(file: UploadFile, path: Path, limit: Optional[int] = None) -> StreamingHasher:
+    """
+    Copia la subida a ``path`` por bloques y devuelve su hash incremental.
+    El archivo sólo aparece en ``path`` (rename atómico) si llegó completo
+    y no está vacío. Lanza UploadTooLarge al superar ``limit`` (por
+    defecto MAX_UPLOAD_BYTES).
+    """
+    limit = MAX_UPLOAD_BYTES if limit is None else limit
+    declared = getattr(file, "size", None)
+    if declared is not None and declared > limit:
+        raise UploadTooLarge()
+    # Temporal único en el mismo directorio: dos subidas simultáneas nunca
+    # comparten archivo y el rename final sigue siendo atómico
+    fd, tmp = await run_io(tempfile.mkstemp, ".part", "", str(path.parent))
+    part = Path(tmp)
+    hasher = StreamingHasher()
+    try:
+        fh = await run_io(os.fdopen, fd, "wb")
+    except BaseException:
+        os.close(fd)
+        part.unlink(missing_ok=True)
+        raise
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK)
+            if not chunk:
+                break
+            if hasher.size + len(chunk) > limit:
+                raise UploadTooLarge()
+            await run_io(_write_chunk, fh, hasher, chunk)
+        await run_io(fh.close)
+        if hasher.size:
+            await run_io(os.replace, part, path)
+        else:
+            part.unlink(missing_ok=True)
+    except BaseException:
+        fh.close()
+        part.unlink(missing_ok=True)
+        raise
+    return hasher
 
 # -----------------------------
 # Extractores y clasificación simple
@@ -432,8 +726,8 @@ def _try_import_pypdf2():
 
 def _try_import_pdf2image():
     try:
-        from pdf2image import convert_from_bytes  # type: ignore
-        return convert_from_bytes
+        import pdf2image  # type: ignore
+        return pdf2image
     except Exception:
         return None
 
@@ -446,15 +740,35 @@ def _try_import_pytesseract():
 
 def extract_text_from_pdf_bytes(data: bytes):
     """Devuelve (texto, n_pages, note). Si no hay librería, note explica el motivo."""
+    return _read_pdf_text(io.BytesIO(data))
+
+def extract_text_from_pdf_file(path: Path):
+    """Como extract_text_from_pdf_bytes, leyendo el PDF desde disco bajo demanda."""
+    with open(path, "rb") as fh:
+        return _read_pdf_text(fh)
+
+def extract_pdf_pages_file(path: Path):
+    """
+    Devuelve (textos por página, n_pages, note) de la capa de texto del PDF.
+    Los textos son None si no pudo leerse (falta PyPDF2 o PDF ilegible).
+    """
+    with open(path, "rb") as fh:
+        return _read_pdf_pages(fh)
+
+def _read_pdf_text(stream):
+    chunks, pages, note = _read_pdf_pages(stream)
+    return ("\n".join(chunks).strip() if chunks else ""), pages, note
+
+def _read_pdf_pages(stream):
     note = ""
-    text = ""
+    chunks = None
     pages = None
     PyPDF2 = _try_import_pypdf2()
     if PyPDF2 is None:
         note = "PyPDF2 no está instalado; se omitió la extracción de texto PDF."
-        return text, pages, note
+        return chunks, pages, note
     try:
-        reader = PyPDF2.PdfReader(io.BytesIO(data))
+        reader = PyPDF2.PdfReader(stream)
         pages = len(reader.pages)
         chunks = []
         for i in range(pages):
@@ -462,10 +776,19 @@ def extract_text_from_pdf_bytes(data: bytes):
                 chunks.append(reader.pages[i].extract_text() or "")
             except Exception:
                 chunks.append("")
-        text = "\n".join(chunks).strip()
     except Exception as e:
+        chunks = None
         note = f"Error al leer PDF: {e.__class__.__name__}"
-    return text, pages, note
+    return chunks, pages, note
+
+# Páginas con menos caracteres visibles que esto se consideran escaneadas
+OCR_MIN_PAGE_CHARS = int(os.getenv("IUSWEB_OCR_MIN_PAGE_CHARS", "20"))
+
+def pages_needing_ocr(page_texts: List[str], min_chars: Optional[int] = None) -> List[int]:
+    """Páginas (desde 1) sin capa de texto o con texto por debajo del umbral."""
+    threshold = OCR_MIN_PAGE_CHARS if min_chars is None else min_chars
+    return [i for i, txt in enumerate(page_texts, start=1)
+            if len("".join(txt.split())) < threshold]
 
 def extract_text_with_ocr_pdf_bytes(data: bytes):
     """
@@ -473,15 +796,37 @@ def extract_text_with_ocr_pdf_bytes(data: bytes):
     Requiere: pdf2image + poppler y pytesseract + tesseract.
     Es tolerante: si faltan dependencias, devuelve note explicando.
     """
-    convert_from_bytes = _try_import_pdf2image()
+    return _ocr_pdf(lambda pdf2image: pdf2image.convert_from_bytes(data, fmt="png"))
+
+def extract_text_with_ocr_pdf_file(path: Path):
+    """
+    Como extract_text_with_ocr_pdf_bytes, pero página a página desde disco:
+    sólo hay una imagen renderizada en memoria a la vez.
+    """
+    missing = _ocr_missing()
+    if missing:
+        return "", None, "OCR no disponible: falta " + " y ".join(missing)
+    n_pages = _pdf_page_count(path)
+    if not n_pages:
+        return "", None, "OCR error: no se pudo leer el número de páginas"
+    results, _ = ocr_page_range(path, 1, n_pages)
+    text = "\n".join(txt for _, txt, _ in results).strip()
+    return text, n_pages, ("OCR aplicado" if text else "OCR intentado sin texto")
+
+def _ocr_missing() -> List[str]:
+    miss = []
+    if _try_import_pdf2image() is None: miss.append("pdf2image/poppler")
+    if _try_import_pytesseract() is None: miss.append("pytesseract/tesseract")
+    return miss
+
+def _ocr_pdf(render):
+    missing = _ocr_missing()
+    if missing:
+        return "", None, "OCR no disponible: falta " + " y ".join(missing)
+    pdf2image = _try_import_pdf2image()
     pytesseract = _try_import_pytesseract()
-    if convert_from_bytes is None or pytesseract is None:
-        miss = []
-        if convert_from_bytes is None: miss.append("pdf2image/poppler")
-        if pytesseract is None: miss.append("pytesseract/tesseract")
-        return "", None, "OCR no disponible: falta " + " y ".join(miss)
     try:
-        images = convert_from_bytes(data, fmt="png")  # requiere poppler instalado en el sistema
+        images = render(pdf2image)  # requiere poppler instalado en el sistema
         texts = []
         for im in images:
             try:
@@ -494,6 +839,44 @@ def extract_text_with_ocr_pdf_bytes(data: bytes):
     except Exception as e:
         return "", None, f"OCR error: {e.__class__.__name__}"
 
+# ---- OCR por rangos de páginas ----
+OCR_DPI = int(os.getenv("IUSWEB_OCR_DPI", "200"))
+OCR_PAGES_PER_TASK = int(os.getenv("IUSWEB_OCR_PAGES_PER_TASK", "4"))
+
+def _peak_rss_mb() -> Optional[float]:
+    """Pico de memoria residente del proceso actual (MB), si el SO lo informa."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception:
+        return None
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _pdf_page_count(path: Path) -> Optional[int]:
+    try:
+        return int(_try_import_pdf2image().pdfinfo_from_path(str(path))["Pages"])
+    except Exception:
+        return None
+
+def ocr_page_range(path: Path, first: int, last: int, dpi: int = OCR_DPI):
+    """
+    OCR de las páginas first..last (desde 1), renderizando de una en una.
+    Devuelve ([(página, texto, segundos)], pico de memoria del proceso en MB).
+    """
+    pdf2image = _try_import_pdf2image()
+    pytesseract = _try_import_pytesseract()
+    results = []
+    for page in range(first, last + 1):
+        started = time.perf_counter()
+        try:
+            images = pdf2image.convert_from_path(str(path), dpi=dpi, first_page=page, last_page=page)
+            txt = pytesseract.image_to_string(images[0], lang="spa+eng") if images else ""
+        except Exception:
+            txt = ""
+        images = None
+        results.append((page, txt or "", time.perf_counter() - started))
+    return results, _peak_rss_mb()
+
 def extract_text_from_txt_bytes(data: bytes):
     for enc in ("utf-8", "latin-1", "cp1252"):
         try:
@@ -502,178 +885,52 @@ def extract_text_from_txt_bytes(data: bytes):
             continue
     return ""
 
-_LABEL_PATTERNS = [
-    (r"\b(póliza|poliza)\b", "Póliza"),
-    (r"\b(interventor|supervisor(a)?)\b", "Interventoría/Supervisión"),
-    (r"\b(objeto del contrato|objeto)\b", "Objeto"),
-    (r"\b(plazo|vigencia)\b", "Plazo/Vigencia"),
-    (r"\b(valor|cuantía|cuantia|\$ ?\d)", "Valor"),
-    (r"\b(garantía|garantia)\b", "Garantía"),
-    (r"\b(obra pública|obra publica|obra)\b", "Obra pública"),
-    (r"\b(adición|adicion|prórroga|prorroga)\b", "Modificaciones"),
-]
-
-def label_text_heuristic(text: str) -> List[str]:
-    text_low = text.lower()
-    labels = []
-    for pat, tag in _LABEL_PATTERNS:
-        if re.search(pat, text_low):
-            labels.append(tag)
-    # de-dup y orden estable
-    seen = set()
-    ordered = []
-    for t in labels:
-        if t not in seen:
-            ordered.append(t); seen.add(t)
-    return ordered[:8]
+def extract_text_from_txt_file(path: Path):
+    return extract_text_from_txt_bytes(Path(path).read_bytes())
 
 # -----------------------------
-# Extractores de campos estructurados (heurísticos)
+# Extractores de campos estructurados (heurísticos, iusweb/field_engine.py)
 # -----------------------------
-_MONTHS = {
-    "enero":1,"febrero":2,"marzo":3,"abril":4,"mayo":5,"junio":6,
-    "julio":7,"agosto":8,"septiembre":9,"setiembre":9,"octubre":10,"noviembre":11,"diciembre":12
-}
+# Presupuesto por documento: cabecera, ventanas alrededor de palabras clave y tope de reloj
+FIELD_BUDGET = field_engine.ExtractionBudget(
+    head_chars=int(os.getenv("IUSWEB_FIELDS_HEAD_KB", "64")) * 1024,
+    window_chars=int(os.getenv("IUSWEB_FIELDS_WINDOW_CHARS", "4096")),
+    max_windows=int(os.getenv("IUSWEB_FIELDS_MAX_WINDOWS", "64")),
+    seconds=float(os.getenv("IUSWEB_FIELDS_BUDGET_S", "2.0")),
+)
 
-def _to_iso(d: int, m: int, y: int) -> str:
-    try:
-        return datetime.date(y, m, d).isoformat()
-    except Exception:
-        return f"{y:04d}-{m:02d}-{d:02d}"
-
-_RE_DATE_1 = re.compile(r"(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre)\s+de\s+(\d{4})", re.I)
-_RE_DATE_2 = re.compile(r"(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})")
-_RE_DATE_3 = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
-_RE_AMOUNT = re.compile(r"(?:COP|COL|COL\$|\$)\s*[\d\.\,]+(?:\s*(?:millones|millón|millon|billones|billón))?", re.I)
-_RE_CONTRACTOR = re.compile(r"(?:contratista|proveedor|adjudicatario)\s*[:\-]\s*(.+)", re.I)
-
-# Nueva regex para meses de tenor y suma de meses a fecha
-_RE_MONTHS_TENOR = re.compile(r"(?:plazo|vigencia)\s*(?:de)?\s*(\d{1,3})\s*mes(?:es)?", re.I)
-
-def _add_months(y: int, m: int, d: int, k: int) -> str:
-    # suma k meses a una fecha (y,m,d) y devuelve ISO8601
-    ny = y + (m - 1 + k) // 12
-    nm = (m - 1 + k) % 12 + 1
-    # ajustar día fin de mes
-    import calendar
-    last = calendar.monthrange(ny, nm)[1]
-    nd = min(d, last)
-    try:
-        return datetime.date(ny, nm, nd).isoformat()
-    except Exception:
-        return f"{ny:04d}-{nm:02d}-{nd:02d}"
-
-def extract_objeto(text: str) -> Optional[str]:
-    if not text: return None
-    t = text[:4000]  # limitar búsqueda
-    # Busca encabezados de "objeto" y toma el renglón siguiente o mismo párrafo
-    m = re.search(r"\bobjeto\b[:\-]?\s*(.+)", t, re.I)
-    if m:
-        obj = m.group(1).strip()
-        # Cortar si es demasiado largo o se va a otra sección
-        obj = re.split(r"\n{2,}|^\s*\d+\)\s+", obj)[0].strip()
-        return obj[:280]
-    # Fallback: primeras dos líneas
-    lines = [ln.strip() for ln in t.splitlines() if ln.strip()]
-    return (" ".join(lines[:2]))[:180] if lines else None
-
-def _parse_amount_raw(raw: str) -> (Optional[float], Optional[str]):
-    if not raw: return None, None
-    cur = "COP" if "cop" in raw.lower() or "$" in raw else None
-    s = raw
-    mult = 1.0
-    if re.search(r"billon", raw, re.I) or re.search(r"billones|billón", raw, re.I):
-        mult = 1_000_000_000.0
-    elif re.search(r"millon|millón|millones", raw, re.I):
-        mult = 1_000_000.0
-    # quitar moneda y espacios
-    s = re.sub(r"[^\d,\.]", "", s)
-    # heurística CO: punto como mil, coma decimal
-    s = s.replace(".", "").replace(",", ".")
-    try:
-        val = float(s) * mult
-        return val, cur or "COP"
-    except Exception:
-        return None, cur or "COP"
 
 def extract_amount(text: str) -> Optional[Amount]:
-    if not text: return None
-    m = _RE_AMOUNT.search(text)
-    if not m: return None
-    raw = m.group(0)
-    val, cur = _parse_amount_raw(raw)
-    return Amount(raw=raw, value=val, currency=cur)
+    amount = field_engine.extract_amount(text)
+    return Amount(**amount) if amount else None
 
 def extract_dates(text: str) -> Optional[Dates]:
-    if not text: return None
-    start = end = None
-    # 1) Fecha de inicio (varios formatos)
-    m = _RE_DATE_1.search(text)
-    if m:
-        d = int(m.group(1)); mth = _MONTHS[m.group(2).lower()]; y = int(m.group(3))
-        start = _to_iso(d, mth, y)
-    else:
-        m = _RE_DATE_2.search(text)
-        if m:
-            d = int(m.group(1)); mth = int(m.group(2)); y = int(m.group(3))
-            if y < 100: y += 2000
-            start = _to_iso(d, mth, y)
-        else:
-            m = _RE_DATE_3.search(text)
-            if m:
-                y = int(m.group(1)); mth = int(m.group(2)); d = int(m.group(3))
-                start = _to_iso(d, mth, y)
-
-    # 2) Buscar una segunda fecha explícita (fin)
-    m2 = None
-    rx_used = None
-    for rx in (_RE_DATE_3, _RE_DATE_2, _RE_DATE_1):
-        m2 = rx.search(text, (m.end() if m else 0))
-        if m2:
-            rx_used = rx
-            break
-    if m2 and rx_used is _RE_DATE_1:
-        d = int(m2.group(1)); mth = _MONTHS[m2.group(2).lower()]; y = int(m2.group(3))
-        end = _to_iso(d, mth, y)
-    elif m2 and rx_used is _RE_DATE_2:
-        d = int(m2.group(1)); mth = int(m2.group(2)); y = int(m2.group(3)); y = y+2000 if y<100 else y
-        end = _to_iso(d, mth, y)
-    elif m2 and rx_used is _RE_DATE_3:
-        y = int(m2.group(1)); mth = int(m2.group(2)); d = int(m2.group(3))
-        end = _to_iso(d, mth, y)
-
-    # 3) Si no hay fin pero existe un tenor de meses (p.ej. "plazo 12 meses"), calcúlalo
-    months = None
-    mtenor = _RE_MONTHS_TENOR.search(text)
-    if mtenor:
-        try:
-            months = int(mtenor.group(1))
-        except Exception:
-            months = None
-
-    if start and (end is None) and months:
-        try:
-            y1, m1, d1 = [int(x) for x in start.split("-")]
-            end = _add_months(y1, m1, d1, months)
-        except Exception:
-            pass
-
-    # 4) Si hay dos fechas, computar meses aproximados
-    if start and end and months is None:
-        try:
-            y1, m1, d1 = [int(x) for x in start.split("-")]
-            y2, m2i, d2 = [int(x) for x in end.split("-")]
-            months = (y2 - y1) * 12 + (m2i - m1)
-        except Exception:
-            months = None
-
-    return Dates(start=start, end=end, months=months)
+    dates = field_engine.extract_dates(text)
+    return Dates(**dates) if dates else None
 
 def extract_contractor(text: str) -> Optional[str]:
-    if not text: return None
-    m = _RE_CONTRACTOR.search(text)
-    if not m: return None
-    return m.group(1).strip()[:120]
+    return field_engine.extract_contractor(text)
+
+def extract_fields(text: str) -> dict:
+    """Extracto, etiquetas y campos estructurados dentro de FIELD_BUDGET (se ejecuta en el pool de CPU)."""
+    excerpt = (text[:1000] + ("…" if len(text) > 1000 else "")) if text else None
+    fields, note = field_engine.extract_within_budget(text, FIELD_BUDGET)
+    amount, dates = fields["amount"], fields["dates"]
+    return {"excerpt": excerpt, "labels": fields["labels"], "objeto": fields["objeto"],
+            "amount": Amount(**amount) if amount else None,
+            "dates": Dates(**dates) if dates else None,
+            "contractor": fields["contractor"], "note": note}
+
+def _write_sidecar(path: Path, result: "FileOut") -> None:
+    """Guarda el JSON del resultado junto al archivo subido y lo indexa por hash."""
+    try:
+        json_path = path.with_suffix(path.suffix + ".json")
+        data = json.loads(result.model_dump_json())
+        write_json_atomic(json_path, data)
+        UPLOAD_INDEX.upsert(json_path, data)
+    except Exception as e:
+        # No interrumpir flujo si falla el guardado
+        pass
 
 # -----------------------------
 # Endpoints de API (JSON)
@@ -697,6 +954,24 @@ async def api_classify_text(payload: TextIn = Body(...)):
         return JSONResponse({"error": "Falta 'text'"}, status_code=400)
     return TextOut(ok=True, echo=text, ts=datetime.datetime.now())
 
+async def extract_upload(path: Path, kind: str) -> dict:
+    """Texto, páginas, notas y campos de un archivo subido (parseo y OCR en el pool de CPU)."""
+    text = ""
+    pages = None
+    note = ""
+    if kind == ".pdf":
+        # Capa de texto donde exista; OCR sólo en las páginas escaneadas
+        text, pages, note = await extract_pdf_text(path)
+    elif kind == ".txt":
+        text = await run_cpu("parse", extract_text_from_txt_file, path)
+    else:
+        note = "Tipo de archivo no reconocido para extracción automática (se admiten .pdf y .txt)."
+
+    # ---- Etiquetas y campos estructurados ----
+    fields = await run_cpu("parse", extract_fields, text) if text else {}
+    note = " | ".join([s for s in (note, fields.get("note")) if s])
+    return {"text": text, "pages": pages, "note": note, "fields": fields}
+
 @app.post(
     "/api/classify-file",
     summary="Subir y clasificar archivo",
@@ -713,71 +988,170 @@ async def api_classify_text(payload: TextIn = Body(...)):
             }}},
         },
         400: {"description": "Archivo vacío o no provisto", "content": {"application/json": {"example": {"error": "Archivo vacío"}}}},
+        413: {"description": "Archivo mayor que el límite configurado", "content": {"application/json": {"example": {"error": "Archivo demasiado grande"}}}},
     },
 )
 async def api_classify_file(file: UploadFile = File(...)):
-    contents = await file.read()
-    if not contents:
+    # Guardar archivo con nombre único (por bloques, con hash incremental)
+    path = UPLOADS / f"{upload_prefix()}_{Path(file.filename or 'archivo').name}"
+    try:
+        hasher = await receive_upload(file, path)
+    except UploadTooLarge:
+        return JSONResponse({"error": "Archivo demasiado grande"}, status_code=413)
+    if not hasher.size:
         return JSONResponse({"error": "Archivo vacío"}, status_code=400)
-
-    # Guardar archivo con timestamp
-    fname = f"{datetime.datetime.now():%Y%m%dT%H%M%S}_{file.filename}"
-    path = UPLOADS / fname
-    path.write_bytes(contents)
-
-    # Extraer según extensión
-    ext = (file.filename or "").lower()
-    text = ""
-    pages = None
-    note = ""
-    if ext.endswith(".pdf"):
-        text, pages, note = extract_text_from_pdf_bytes(contents)
-        if (not text or len(text.strip()) < 20):
-            # Fallback: intentar OCR para PDFs escaneados
-            ocr_text, ocr_pages, ocr_note = extract_text_with_ocr_pdf_bytes(contents)
-            # Si OCR trajo texto, úsalo; combinar notas
-            if ocr_text:
-                text = ocr_text
-                pages = pages or ocr_pages
-            note = " | ".join([s for s in (note, ocr_note) if s])
-    elif ext.endswith(".txt"):
-        text = extract_text_from_txt_bytes(contents)
-    else:
-        note = "Tipo de archivo no reconocido para extracción automática (se admiten .pdf y .txt)."
-
-    excerpt = (text[:1000] + ("…" if len(text) > 1000 else "")) if text else None
-    labels = label_text_heuristic(text) if text else None
-
-    # ---- Campos estructurados ----
-    objeto = extract_objeto(text) if text else None
-    amount = extract_amount(text) if text else None
-    dates = extract_dates(text) if text else None
-    contractor = extract_contractor(text) if text else None
+    return await classify_saved(path, file.filename, hasher)
+
+async def classify_saved(path: Path, source_file: str, hasher: StreamingHasher) -> FileOut:
+    """Extrae, arma el resultado y guarda su JSON para un archivo ya recibido en ``path``."""
+    # Extraer según extensión; los mismos bytes ya subidos (o en curso) no se repiten
+    ext = (source_file or "").lower()
+    kind = ".pdf" if ext.endswith(".pdf") else ".txt" if ext.endswith(".txt") else ""
+    extraction, origin = await EXTRACTION_CACHE.get_or_compute(
+        f"{kind}:{hasher.hexdigest()}", lambda: extract_upload(path, kind)
+    )
+    pages, note, fields = extraction["pages"], extraction["note"], extraction["fields"]
 
     result = FileOut(
-        source_file=file.filename,
+        source_file=source_file,
         upload_path=str(path),
-        hash=sha256_bytes(contents),
+        hash=hasher.hexdigest(),
         received_at=datetime.datetime.now(),
         n_pages=pages,
-        text_excerpt=excerpt,
-        labels=labels,
+        text_excerpt=fields.get("excerpt"),
+        labels=fields.get("labels"),
         notes=(note or None),
-        objeto=objeto,
-        amount=amount,
-        dates=dates,
-        contractor=contractor,
+        objeto=fields.get("objeto"),
+        amount=fields.get("amount"),
+        dates=fields.get("dates"),
+        contractor=fields.get("contractor"),
+        cached=(origin != "miss"),
     )
     # Guardar JSON junto al PDF
-    try:
-        json_path = path.with_suffix(path.suffix + ".json")
-        with open(json_path, "w", encoding="utf-8") as fh:
-            json.dump(json.loads(result.model_dump_json()), fh, ensure_ascii=False, indent=2)
-    except Exception as e:
-        # No interrumpir flujo si falla el guardado
-        pass
+    await run_io(_write_sidecar, path, result)
     return result
 
+# ---- Lotes: varios archivos o ZIP, resultados en NDJSON a medida que terminan ----
+def _expand_zip(zip_path: Path, prefix: str, first: int, max_bytes: int, max_docs: int) -> List[tuple]:
+    """
+    Extrae los archivos de un ZIP a UPLOADS por bloques, con hash.
+    Devuelve [(ruta, nombre, hasher)] y lanza UploadTooLarge si el contenido
+    descomprimido supera ``max_bytes`` o hay más de ``max_docs`` archivos.
+    """
+    docs = []
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            members = [info for info in zf.infolist() if not info.is_dir()]
+            if len(members) > max_docs:
+                raise UploadTooLarge(f"Lote con más de {MAX_BATCH_DOCS} documentos")
+            total = 0
+            for info in members:
+                name = Path(info.filename).name  # sin directorios del ZIP
+                path = UPLOADS / f"{prefix}_{first + len(docs):03d}_{name}"
+                hasher = StreamingHasher()
+                docs.append((path, name, hasher))
+                with zf.open(info) as src, open(path, "wb") as fh:
+                    for chunk in iter(lambda: src.read(UPLOAD_CHUNK), b""):
+                        total += len(chunk)
+                        if total > max_bytes:  # tamaños declarados del ZIP no fiables
+                            raise UploadTooLarge("Lote demasiado grande")
+                        _write_chunk(fh, hasher, chunk)
+                if not hasher.size:
+                    path.unlink()
+    except BaseException:
+        for path, _, _ in docs:
+            path.unlink(missing_ok=True)
+        raise
+    finally:
+        zip_path.unlink(missing_ok=True)
+    return docs
+
+async def receive_batch(files: List[UploadFile]) -> List[tuple]:
+    """
+    Guarda los archivos de un lote (expandiendo los .zip) dentro de
+    MAX_BATCH_BYTES y MAX_BATCH_DOCS. Devuelve [(ruta, nombre, hasher)].
+    """
+    prefix = upload_prefix()
+    docs, total = [], 0
+    try:
+        for file in files:
+            if len(docs) >= MAX_BATCH_DOCS:
+                raise UploadTooLarge(f"Lote con más de {MAX_BATCH_DOCS} documentos")
+            name = Path(file.filename or "archivo").name
+            path = UPLOADS / f"{prefix}_{len(docs):03d}_{name}"
+            remaining = MAX_BATCH_BYTES - total
+            try:
+                hasher = await receive_upload(file, path, min(MAX_UPLOAD_BYTES, remaining))
+            except UploadTooLarge:
+                if remaining < MAX_UPLOAD_BYTES:
+                    raise UploadTooLarge("Lote demasiado grande") from None
+                raise
+            total += hasher.size
+            if name.lower().endswith(".zip") and hasher.size:
+                expanded = await run_io(_expand_zip, path, prefix, len(docs),
+                                        MAX_BATCH_BYTES - total, MAX_BATCH_DOCS - len(docs))
+                total += sum(h.size for _, _, h in expanded)
+                docs.extend(expanded)
+            else:
+                docs.append((path, name, hasher))
+    except BaseException:
+        for path, _, _ in docs:
+            path.unlink(missing_ok=True)
+        raise
+    return docs
+
+async def _classify_batch_lines(docs: List[tuple]):
+    """Una línea NDJSON por documento, en el orden en que terminan, y un resumen final."""
+    async def _one(index: int, path: Path, name: str, hasher: StreamingHasher) -> dict:
+        if not hasher.size:
+            return {"index": index, "source_file": name, "error": "Archivo vacío"}
+        try:
+            result = await classify_saved(path, name, hasher)
+            return {"index": index, "source_file": name, "result": json.loads(result.model_dump_json())}
+        except Exception as e:
+            return {"index": index, "source_file": name, "error": f"{e.__class__.__name__}: {e}"}
+
+    # El pool de CPU y sus semáforos por etapa acotan cuántos se extraen a la vez
+    tasks = [asyncio.create_task(_one(i, *doc)) for i, doc in enumerate(docs)]
+    errors = 0
+    try:
+        for done in asyncio.as_completed(tasks):
+            line = await done
+            errors += "error" in line
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        yield json.dumps({"done": True, "documents": len(docs), "errors": errors}) + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@app.post(
+    "/api/classify-batch",
+    summary="Subir y clasificar un lote (varios archivos o ZIP)",
+    tags=["Clasificación"],
+    responses={
+        200: {
+            "description": "Una línea JSON por documento según van terminando; la última resume el lote",
+            "content": {"application/x-ndjson": {"example": (
+                '{"index": 1, "source_file": "b.pdf", "result": {"hash": "9f2f5a...abcd", "...": "..."}}\n'
+                '{"index": 0, "source_file": "a.txt", "result": {"hash": "1c0e7b...42aa", "...": "..."}}\n'
+                '{"done": true, "documents": 2, "errors": 0}\n'
+            )}},
+        },
+        400: {"description": "ZIP inválido o lote vacío", "content": {"application/json": {"example": {"error": "ZIP inválido"}}}},
+        413: {"description": "Lote mayor que los límites configurados", "content": {"application/json": {"example": {"error": "Lote con más de 300 documentos"}}}},
+    },
+)
+async def api_classify_batch(files: List[UploadFile] = File(...)):
+    try:
+        docs = await receive_batch(files)
+    except UploadTooLarge as e:
+        return JSONResponse({"error": e.message}, status_code=413)
+    except zipfile.BadZipFile:
+        return JSONResponse({"error": "ZIP inválido"}, status_code=400)
+    if not docs:
+        return JSONResponse({"error": "Lote vacío"}, status_code=400)
+    return StreamingResponse(_classify_batch_lines(docs), media_type="application/x-ndjson")
+
 # -----------------------------
 # Auditoría viva: endpoints y helpers
 # -----------------------------
@@ -787,32 +1161,87 @@ class AnchorIn(BaseModel):
     hash: str = Field(..., description="Hash SHA-256 del documento a anclar")
 
 def _update_json_by_hash(doc_hash: str, updater):
-    """Busca JSON en uploads por hash y permite actualizar su contenido en sitio."""
-    for fp in glob.glob(str(UPLOADS / "*.pdf.json")):
-        try:
-            with open(fp, "r", encoding="utf-8") as fh:
-                data = json.load(fh)
-            if data.get("hash") == doc_hash:
-                newdata = updater(data) or data
-                with open(fp, "w", encoding="utf-8") as fh:
-                    json.dump(newdata, fh, ensure_ascii=False, indent=2)
-                return True
-        except Exception:
-            continue
-    return False
+    """Actualiza en sitio los JSON con ese hash (búsqueda por índice, sin recorrer uploads)."""
+    try:
+        return UPLOAD_INDEX.update_by_hash(doc_hash, updater)
+    except Exception:
+        return False
+
+# Filtro persistente de hashes anclados: un "no" evita recorrer los JSON de uploads
+# (se abre en el arranque, igual que UPLOAD_INDEX)
+ANCHORED: Optional[AnchoredHashFilter] = None
+
+def _find_anchor_by_hash(doc_hash: str):
+    """Anclaje registrado en el JSON del documento, si existe."""
+    for _, data in UPLOAD_INDEX.find(doc_hash):
+        if data.get("anchor"):
+            return data["anchor"]
+    return None
+
+@app.on_event("startup")
+def _open_upload_stores():
+    """Abrir índice y filtro bajo UPLOADS (se respetan los ya asignados, p. ej. en tests)."""
+    global UPLOAD_INDEX, ANCHORED
+    if UPLOAD_INDEX is None:
+        UPLOAD_INDEX = UploadIndex(UPLOADS / "index.db")
+    if ANCHORED is None:
+        ANCHORED = AnchoredHashFilter(capacity=1_000_000, path=UPLOADS / "anchored.bloom")
+
+@app.on_event("startup")
+def _rebuild_anchored_filter():
+    """Reconstruir el filtro desde los resultados ya anclados (índice poblado desde los JSON)."""
+    if not len(UPLOAD_INDEX):
+        # Primer arranque con el índice: poblarlo desde los JSON existentes
+        UPLOAD_INDEX.rebuild(UPLOADS)
+    ANCHORED.update(UPLOAD_INDEX.anchored_hashes())
+    ANCHORED.flush()
+
+@app.on_event("shutdown")
+def _flush_anchored_filter():
+    if ANCHORED is not None:
+        ANCHORED.flush()
+
+RECENT_MAX_LIMIT = 100
+
+def _encode_cursor(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str):
+    try:
+        updated_at, sidecar = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(updated_at), str(sidecar)
+    except Exception:
+        raise ValueError("cursor inválido")
 
-# Endpoint para listar últimos JSON
+# Endpoint para listar últimos JSON (desde el índice, paginado y con ETag)
 @app.get("/api/recent", summary="Últimos resultados JSON", tags=["Auditoría"])
-def api_recent():
-    files = sorted(glob.glob(str(UPLOADS / "*.pdf.json")), key=os.path.getmtime, reverse=True)[:10]
-    out = []
-    for fp in files:
-        try:
-            with open(fp, "r", encoding="utf-8") as fh:
-                out.append(json.load(fh))
-        except Exception:
-            continue
-    return out
+def api_recent(request: Request, limit: int = 10, cursor: Optional[str] = None, fields: Optional[str] = None):
+    """
+    Resultados del más reciente al más antiguo. La página siguiente se pide
+    con el valor de la cabecera ``X-Next-Cursor`` en ``cursor``; ``fields``
+    (separados por comas) limita las claves devueltas. Con ``If-None-Match``
+    y sin cambios en el índice se responde 304 sin leer resultados.
+    """
+    limit = max(1, min(limit, RECENT_MAX_LIMIT))
+    tag = hashlib.sha1(f"{UPLOAD_INDEX.generation()}|{limit}|{cursor}|{fields}".encode("utf-8")).hexdigest()[:20]
+    etag = f'W/"{tag}"'
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers={"ETag": etag})
+
+    try:
+        after = _decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    items, next_key = UPLOAD_INDEX.recent(limit, after, suffix=".pdf.json")
+    if fields:
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        items = [{k: item.get(k) for k in wanted} for item in items]
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if next_key is not None:
+        headers["X-Next-Cursor"] = _encode_cursor(next_key)
+    return JSONResponse(items, headers=headers)
 
 # Endpoint para anclar hash (simulado)
 @app.post("/api/anchor", summary="Anclar hash en blockchain (simulado)", tags=["Auditoría"])
@@ -820,6 +1249,14 @@ def api_anchor(payload: AnchorIn):
     h = (payload.hash or "").strip()
     if not h:
         return JSONResponse({"error": "Falta hash"}, status_code=400)
+    # Sólo un "quizá" del filtro obliga a buscar el anclaje previo en disco
+    if h in ANCHORED:
+        previous = _find_anchor_by_hash(h)
+        if previous:
+            return JSONResponse(
+                {"error": "Hash ya anclado", "txid": previous.get("txid"), "anchor": previous},
+                status_code=409,
+            )
     # Simular un txid determinístico
     now = datetime.datetime.now().isoformat()
     txid = f"sim-{h[:16]}-{int(datetime.datetime.now().timestamp())}"
@@ -829,9 +1266,15 @@ def api_anchor(payload: AnchorIn):
         "anchored_at": now,
     }
     # Intentar actualizar el JSON correspondiente
-    _update_json_by_hash(h, lambda d: {**d, "anchor": anchor_obj})
+    if _update_json_by_hash(h, lambda d: {**d, "anchor": anchor_obj}):
+        ANCHORED.add(h)
     return {"ok": True, "txid": txid, "anchor": anchor_obj}
 
+# Estado del filtro de anclajes
+@app.get("/api/anchor/filter", summary="Estado del filtro de hashes anclados", tags=["Auditoría"])
+def api_anchor_filter():
+    return ANCHORED.stats()
+
 # -----------------------------
 # DEBUG
 # -----------------------------
@@ -861,7 +1304,9 @@ def _find_free_port(preferred: int = 8000) -> int:
 # Modo ejecutable local (python iusweb/app.py)
 # -----------------------------
 if __name__ == "__main__":
-    import threading, time, webbrowser
+    import webbrowser
+    import multiprocessing
+    multiprocessing.freeze_support()  # pool de procesos en el ejecutable empaquetado
     try:
         import uvicorn  # type: ignore
     except Exception as _e:
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+FIELD_ENGINE.PY - Motor de extracción de campos de expedientes
+==============================================================
+
+Etiquetas, objeto, valor, fechas y contratista a partir del texto de un
+documento, con las mismas heurísticas de siempre pero sin que cada patrón
+recorra el texto entero con el motor de expresiones regulares:
+
+- El texto se pasa a minúsculas una sola vez y se comparte entre campos
+- Cada patrón tiene sus "disparadores": literales sin los que no puede
+  coincidir (``$``, ``contratista``, ``plazo``, el nombre del mes, el
+  separador de ``dd/mm/aaaa``...). Se localizan con ``str.find`` y la
+  expresión precompilada sólo se prueba (``match``) donde aparecen
+- Las posiciones candidatas se visitan en orden, así que la primera que
+  coincide es la misma que daría ``search``: los resultados son idénticos
+
+Si un patrón acumula demasiados candidatos fallidos, o el texto contiene
+caracteres que cambian de longitud o se pliegan a ASCII al pasar a
+minúsculas (``İ``, ``ı``, ``ſ``, ``K``), se vuelve a ``search`` normal.
+
+Con un ``ExtractionBudget`` (``extract_within_budget``) el trabajo por
+documento queda acotado, para que un volcado de OCR de cientos de páginas
+no retenga un worker:
+
+- Cabecera: los patrones se prueban en todos sus candidatos de los
+  primeros ``head_chars`` caracteres
+- Ventanas: fuera de la cabecera, sólo en ``max_windows`` candidatos por
+  patrón (alrededor de sus palabras clave), y cada intento ve como mucho
+  ``window_chars`` caracteres (acota los ``(.+)`` y las rachas de espacios)
+- Reloj: pasados ``seconds`` se devuelven los campos ya resueltos y una
+  nota con los que faltan
+
+Sin dependencias de FastAPI: devuelve diccionarios y ``iusweb.app`` los
+convierte en sus modelos.
+
+Autor: Consultoría de Sistemas Legales Automatizados
+Fecha: 2025-11-05
+Versión: 1.0.0
+"""
+
+import re
+import time
+import calendar
+import datetime
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# -----------------------------
+# Patrones y disparadores
+# -----------------------------
+# (patrón sobre el texto en minúsculas, etiqueta, literales con los que empieza)
+_LABEL_PATTERNS = [
+    (r"\b(póliza|poliza)\b", "Póliza", ("póliza", "poliza")),
+    (r"\b(interventor|supervisor(a)?)\b", "Interventoría/Supervisión", ("interventor", "supervisor")),
+    (r"\b(objeto del contrato|objeto)\b", "Objeto", ("objeto",)),
+    (r"\b(plazo|vigencia)\b", "Plazo/Vigencia", ("plazo", "vigencia")),
+    (r"\b(valor|cuantía|cuantia|\$ ?\d)", "Valor", ("valor", "cuantía", "cuantia", "$")),
+    (r"\b(garantía|garantia)\b", "Garantía", ("garantía", "garantia")),
+    (r"\b(obra pública|obra publica|obra)\b", "Obra pública", ("obra",)),
+    (r"\b(adición|adicion|prórroga|prorroga)\b", "Modificaciones", ("adición", "adicion", "prórroga", "prorroga")),
+]
+
+_RE_LABELS = [re.compile(pat) for pat, _, _ in _LABEL_PATTERNS]
+
+_MONTHS = {
+    "enero":1,"febrero":2,"marzo":3,"abril":4,"mayo":5,"junio":6,
+    "julio":7,"agosto":8,"septiembre":9,"setiembre":9,"octubre":10,"noviembre":11,"diciembre":12
+}
+
+_RE_DATE_1 = re.compile(r"(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre)\s+de\s+(\d{4})", re.I)
+_RE_DATE_2 = re.compile(r"(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})")
+_RE_DATE_3 = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+_RE_AMOUNT = re.compile(r"(?:COP|COL|COL\$|\$)\s*[\d\.\,]+(?:\s*(?:millones|millón|millon|billones|billón))?", re.I)
+_RE_CONTRACTOR = re.compile(r"(?:contratista|proveedor|adjudicatario)\s*[:\-]\s*(.+)", re.I)
+_RE_MONTHS_TENOR = re.compile(r"(?:plazo|vigencia)\s*(?:de)?\s*(\d{1,3})\s*mes(?:es)?", re.I)
+
+# patrón -> (campo, disparadores, distancias del inicio de la coincidencia al
+# disparador); sin distancias, el disparador es el mes y el inicio se busca hacia atrás
+_TRIGGERS = {
+    _RE_DATE_1: ("dates", tuple(_MONTHS), None),
+    _RE_DATE_2: ("dates", ("/", "-"), (2, 1)),
+    _RE_DATE_3: ("dates", ("-",), (4,)),
+    _RE_AMOUNT: ("amount", ("cop", "col", "$"), (0,)),
+    _RE_CONTRACTOR: ("contractor", ("contratista", "proveedor", "adjudicatario"), (0,)),
+    _RE_MONTHS_TENOR: ("dates", ("plazo", "vigencia"), (0,)),
+}
+
+FIELDS = ("labels", "objeto", "amount", "dates", "contractor")
+
+_RE_OBJETO = re.compile(r"\bobjeto\b[:\-]?\s*(.+)", re.I)
+_RE_OBJETO_CUT = re.compile(r"\n{2,}|^\s*\d+\)\s+")
+_RE_BILLIONS = re.compile(r"billon|billones|billón", re.I)
+_RE_MILLIONS = re.compile(r"millon|millón|millones", re.I)
+_RE_NOT_NUMBER = re.compile(r"[^\d,\.]")
+
+# Con re.I se pliegan a letras ASCII de los disparadores, o cambian de longitud con lower()
+_UNSAFE_FOLDS = ("İ", "ı", "ſ", "K")
+
+OBJETO_SCAN_CHARS = 4000
+# Candidatos fallidos por patrón antes de volver a un search normal
+MAX_MISSES = 1000
+# Bloques de búsqueda de disparadores (crecen al doble hasta el máximo)
+FIRST_BLOCK_CHARS = 4096
+MAX_BLOCK_CHARS = 1 << 20
+
+# -----------------------------
+# Presupuesto por documento
+# -----------------------------
+@dataclass
+class ExtractionBudget:
+    """Límites de trabajo de la extracción de campos de un documento"""
+    head_chars: int = 64 * 1024
+    window_chars: int = 4096
+    max_windows: int = 64
+    seconds: Optional[float] = 2.0  # None o 0: sin tope de reloj
+
+class _OutOfTime(Exception):
+    pass
+
+class _Limits:
+    """Estado del presupuesto durante la extracción de un documento"""
+
+    def __init__(self, budget: ExtractionBudget):
+        self.budget = budget
+        self.deadline = time.monotonic() + budget.seconds if budget.seconds else None
+        self.capped = set()  # campos con candidatos sin probar
+
+    def check(self) -> None:
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise _OutOfTime()
+
+    def window(self, start: int, head: int, windows: int, field: str) -> Optional[int]:
+        """
+        Fin de la ventana para un intento en ``start`` (``windows`` ya usadas
+        fuera de la cabecera), o None si el campo agotó sus ventanas
+        """
+        self.check()
+        if start >= head and windows >= self.budget.max_windows:
+            self.capped.add(field)
+            return None
+        return start + self.budget.window_chars
+
+# -----------------------------
+# Búsqueda por disparadores
+# -----------------------------
+def _occurrences(low: str, literals: Sequence[str], start: int) -> Iterator[int]:
+    """
+    Posiciones de cualquiera de los literales a partir de ``start``, en orden
+
+    Se busca por bloques crecientes para no recorrer el texto entero por un
+    literal ausente cuando otro aparece pronto.
+    """
+    size, end = FIRST_BLOCK_CHARS, len(low)
+    while start < end:
+        stop = min(start + size, end)
+        found = set()
+        for lit in literals:
+            limit = stop + len(lit) - 1  # que empiece antes de stop
+            i = low.find(lit, start, limit)
+            while i >= 0:
+                found.add(i)
+                i = low.find(lit, i + 1, limit)
+        yield from sorted(found)
+        start, size = stop, min(size * 2, MAX_BLOCK_CHARS)
+
+def _date_starts(low: str, month_at: int, reach: Optional[int] = None) -> Tuple[int, ...]:
+    """Inicios posibles de "dd de <mes>" con el mes en ``month_at`` (a lo sumo ``reach`` antes)"""
+    lo = max(0, month_at - reach) if reach else 0
+    j = month_at
+    while j > lo and low[j - 1].isspace():
+        j -= 1
+    if j == month_at or j < 2 or low[j - 2:j] != "de":
+        return ()
+    k = j = j - 2
+    while k > lo and low[k - 1].isspace():
+        k -= 1
+    return (k - 2, k - 1) if k < j else ()
+
+def _search(
+    rx: re.Pattern,
+    text: str,
+    low: Optional[str],
+    pos: int = 0,
+    limits: Optional[_Limits] = None
+) -> Optional[re.Match]:
+    """
+    Lo mismo que ``rx.search(text, pos)``, probando ``rx`` sólo donde
+    aparece alguno de sus disparadores en ``low`` (``text`` en minúsculas)
+
+    Con ``limits`` cada intento se acota a su ventana y no hay ``search``
+    de respaldo sobre el texto entero.
+    """
+    field, literals, offsets = _TRIGGERS[rx]
+    if limits is not None:
+        head = min(limits.budget.head_chars, len(text))
+        if low is None:  # sin disparadores fiables: sólo la cabecera
+            limits.check()
+            if len(text) > head:
+                limits.capped.add(field)
+            return rx.search(text, pos, head)
+    elif low is None:
+        return rx.search(text, pos)
+    reach = limits.budget.window_chars if limits else None
+    misses, last, windows = 0, -1, 0
+    for at in _occurrences(low, literals, pos + (min(offsets) if offsets else 0)):
+        starts = _date_starts(low, at, reach) if offsets is None else [at - off for off in offsets]
+        for start in starts:
+            if start < pos or start <= last:
+                continue
+            last = start
+            if limits is None:
+                m = rx.match(text, start)
+            else:
+                endpos = limits.window(start, head, windows, field)
+                if endpos is None:
+                    return None
+                windows += start >= head
+                m = rx.match(text, start, endpos)
+            if m:
+                return m
+            misses += 1
+            if limits is None and misses > MAX_MISSES:
+                return rx.search(text, pos)
+    return None
+
+def _has_label(i: int, low: str, limits: Optional[_Limits] = None) -> bool:
+    rx, literals = _RE_LABELS[i], _LABEL_PATTERNS[i][2]
+    head = min(limits.budget.head_chars, len(low)) if limits else None
+    windows = 0
+    for misses, at in enumerate(_occurrences(low, literals, 0)):
+        if limits is None:
+            if rx.match(low, at):
+                return True
+            if misses > MAX_MISSES:
+                return rx.search(low, at) is not None
+            continue
+        endpos = limits.window(at, head, windows, "labels")
+        if endpos is None:
+            return False
+        windows += at >= head
+        if rx.match(low, at, endpos):
+            return True
+    return False
+
+def _lower(text: str) -> Tuple[str, Optional[str]]:
+    """(minúsculas para etiquetas, minúsculas alineadas con ``text`` o None)"""
+    low = text.lower()
+    aligned = len(low) == len(text) and not any(ch in text for ch in _UNSAFE_FOLDS)
+    return low, (low if aligned else None)
+
+# -----------------------------
+# Utilidades de fechas y montos
+# -----------------------------
+def _to_iso(d: int, m: int, y: int) -> str:
+    try:
+        return datetime.date(y, m, d).isoformat()
+    except Exception:
+        return f"{y:04d}-{m:02d}-{d:02d}"
+
+def _add_months(y: int, m: int, d: int, k: int) -> str:
+    # suma k meses a una fecha (y,m,d) y devuelve ISO8601
+    ny = y + (m - 1 + k) // 12
+    nm = (m - 1 + k) % 12 + 1
+    # ajustar día fin de mes
+    last = calendar.monthrange(ny, nm)[1]
+    nd = min(d, last)
+    try:
+        return datetime.date(ny, nm, nd).isoformat()
+    except Exception:
+        return f"{ny:04d}-{nm:02d}-{nd:02d}"
+
+def _date_iso(rx: re.Pattern, m: re.Match) -> str:
+    if rx is _RE_DATE_1:
+        return _to_iso(int(m.group(1)), _MONTHS[m.group(2).lower()], int(m.group(3)))
+    if rx is _RE_DATE_2:
+        y = int(m.group(3))
+        return _to_iso(int(m.group(1)), int(m.group(2)), y + 2000 if y < 100 else y)
+    return _to_iso(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+
+def _parse_amount_raw(raw: str) -> Tuple[Optional[float], Optional[str]]:
+    if not raw: return None, None
+    cur = "COP" if "cop" in raw.lower() or "$" in raw else None
+    mult = 1.0
+    if _RE_BILLIONS.search(raw):
+        mult = 1_000_000_000.0
+    elif _RE_MILLIONS.search(raw):
+        mult = 1_000_000.0
+    # quitar moneda y espacios
+    s = _RE_NOT_NUMBER.sub("", raw)
+    # heurística CO: punto como mil, coma decimal
+    s = s.replace(".", "").replace(",", ".")
+    try:
+        val = float(s) * mult
+        return val, cur or "COP"
+    except Exception:
+        return None, cur or "COP"
+
+# -----------------------------
+# Extractores
+# -----------------------------
+def _labels(low: str, limits: Optional[_Limits] = None) -> List[str]:
+    return [tag for i, (_, tag, _) in enumerate(_LABEL_PATTERNS) if _has_label(i, low, limits)][:8]
+
+def _objeto(text: str, limits: Optional[_Limits] = None) -> Optional[str]:
+    scan = min(OBJETO_SCAN_CHARS, limits.budget.head_chars) if limits else OBJETO_SCAN_CHARS
+    t = text[:scan]  # limitar búsqueda
+    # Busca encabezados de "objeto" y toma el renglón siguiente o mismo párrafo
+    m = _RE_OBJETO.search(t)
+    if m:
+        obj = m.group(1).strip()
+        # Cortar si es demasiado largo o se va a otra sección
+        obj = _RE_OBJETO_CUT.split(obj)[0].strip()
+        return obj[:280]
+    # Fallback: primeras dos líneas
+    lines = [ln.strip() for ln in t.splitlines() if ln.strip()]
+    return (" ".join(lines[:2]))[:180] if lines else None
+
+def _amount(text: str, low: Optional[str], limits: Optional[_Limits] = None) -> Optional[Dict[str, Any]]:
+    m = _search(_RE_AMOUNT, text, low, limits=limits)
+    if not m: return None
+    raw = m.group(0)
+    val, cur = _parse_amount_raw(raw)
+    return {"raw": raw, "value": val, "currency": cur}
+
+def _dates(text: str, low: Optional[str], limits: Optional[_Limits] = None) -> Dict[str, Any]:
+    start = end = None
+    # 1) Fecha de inicio: el primer formato (en orden de preferencia) que aparezca
+    m = None
+    for rx in (_RE_DATE_1, _RE_DATE_2, _RE_DATE_3):
+        m = _search(rx, text, low, limits=limits)
+        if m:
+            start = _date_iso(rx, m)
+            break
+
+    # 2) Buscar una segunda fecha explícita (fin)
+    for rx in (_RE_DATE_3, _RE_DATE_2, _RE_DATE_1):
+        m2 = _search(rx, text, low, m.end() if m else 0, limits)
+        if m2:
+            end = _date_iso(rx, m2)
+            break
+
+    # 3) Si no hay fin pero existe un tenor de meses (p.ej. "plazo 12 meses"), calcúlalo
+    months = None
+    mtenor = _search(_RE_MONTHS_TENOR, text, low, limits=limits)
+    if mtenor:
+        try:
+            months = int(mtenor.group(1))
+        except Exception:
+            months = None
+
+    if start and (end is None) and months:
+        try:
+            y1, m1, d1 = [int(x) for x in start.split("-")]
+            end = _add_months(y1, m1, d1, months)
+        except Exception:
+            pass
+
+    # 4) Si hay dos fechas, computar meses aproximados
+    if start and end and months is None:
+        try:
+            y1, m1, d1 = [int(x) for x in start.split("-")]
+            y2, m2i, d2 = [int(x) for x in end.split("-")]
+            months = (y2 - y1) * 12 + (m2i - m1)
+        except Exception:
+            months = None
+
+    return {"start": start, "end": end, "months": months}
+
+def _contractor(text: str, low: Optional[str], limits: Optional[_Limits] = None) -> Optional[str]:
+    m = _search(_RE_CONTRACTOR, text, low, limits=limits)
+    if not m: return None
+    return m.group(1).strip()[:120]
+
+def label_text_heuristic(text: str) -> List[str]:
+    return _labels(text.lower())
+
+def extract_objeto(text: str) -> Optional[str]:
+    return _objeto(text) if text else None
+
+def extract_amount(text: str) -> Optional[Dict[str, Any]]:
+    return _amount(text, _lower(text)[1]) if text else None
+
+def extract_dates(text: str) -> Optional[Dict[str, Any]]:
+    return _dates(text, _lower(text)[1]) if text else None
+
+def extract_contractor(text: str) -> Optional[str]:
+    return _contractor(text, _lower(text)[1]) if text else None
+
+def _extract(text: str, limits: Optional[_Limits]) -> Tuple[Dict[str, Any], List[str]]:
+    """(campos, campos sin resolver por falta de tiempo)"""
+    fields = dict.fromkeys(FIELDS)
+    if not text:
+        return fields, []
+    low, aligned = _lower(text)
+    steps = (
+        ("labels", lambda: _labels(low, limits)),
+        ("objeto", lambda: _objeto(text, limits)),
+        ("amount", lambda: _amount(text, aligned, limits)),
+        ("dates", lambda: _dates(text, aligned, limits)),
+        ("contractor", lambda: _contractor(text, aligned, limits)),
+    )
+    for done, (name, step) in enumerate(steps):
+        try:
+            fields[name] = step()
+        except _OutOfTime:
+            return fields, [pending for pending, _ in steps[done:]]
+    return fields, []
+
+def extract_all(text: str) -> Dict[str, Any]:
+    """
+    Etiquetas, objeto, valor, fechas y contratista de un texto, pasándolo a
+    minúsculas una sola vez
+
+    Returns:
+        {"labels": [...], "objeto": str, "amount": {"raw", "value", "currency"},
+         "dates": {"start", "end", "months"}, "contractor": str}; con texto
+        vacío todos son None
+    """
+    return _extract(text, None)[0]
+
+def extract_within_budget(text: str, budget: ExtractionBudget) -> Tuple[Dict[str, Any], str]:
+    """
+    Como ``extract_all`` pero con el trabajo acotado por ``budget``
+
+    Returns:
+        (campos, nota); la nota explica qué quedó sin buscar o sin resolver
+        y es "" si el presupuesto alcanzó para todo
+    """
+    limits = _Limits(budget)
+    fields, pending = _extract(text, limits)
+    notes = []
+    capped = [name for name in FIELDS if name in limits.capped and name not in pending]
+    if capped:
+        notes.append(f"Campos buscados en los primeros {budget.head_chars // 1024} KB y "
+                     f"{budget.max_windows} ventanas por patrón: {', '.join(capped)}")
+    if pending:
+        notes.append(f"Extracción de campos cortada a los {budget.seconds:g} s; "
+                     f"sin resolver: {', '.join(pending)}")
+    return fields, " | ".join(notes)
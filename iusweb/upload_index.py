@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+UPLOAD_INDEX.PY - Índice SQLite de los resultados JSON de iusweb
+================================================================
+
+Cada subida deja un JSON junto al archivo (``<archivo>.json``). Este índice
+guarda una copia de ese JSON por ruta, con el SHA-256 del documento y la
+fecha de última escritura indexados, para que anclar, buscar por hash o
+listar los más recientes no tenga que abrir y parsear todos los JSON de
+``uploads``.
+
+El JSON en disco sigue siendo la fuente de verdad; el índice se puede
+reconstruir en cualquier momento:
+
+    python -m iusweb.upload_index iusweb/uploads
+
+Autor: Consultoría de Sistemas Legales Automatizados
+Fecha: 2025-11-05
+Versión: 1.0.0
+"""
+
+import os
+import json
+import time
+import sqlite3
+import secrets
+import argparse
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+PathLike = Union[str, Path]
+
+
+def write_json_atomic(path: PathLike, data: Dict) -> None:
+    """Escribir un JSON vía archivo temporal y rename (sin lectores a medias)"""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(data, fh, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+class UploadIndex:
+    """Índice hash -> JSON de resultado (SQLite)"""
+
+    def __init__(self, db_path: PathLike):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                sidecar TEXT PRIMARY KEY,
+                hash TEXT,
+                updated_at REAL NOT NULL,
+                data TEXT NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents(hash)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_recent ON documents(updated_at, sidecar)")
+        self._conn.commit()
+        self._writes = 0
+        # Los contadores vuelven a empezar en cada proceso: sin esta marca una
+        # generación anterior al reinicio podría repetirse con otros datos
+        self._instance = secrets.token_hex(4)
+
+    def upsert(self, sidecar: PathLike, data: Dict, updated_at: Optional[float] = None) -> None:
+        """Registrar (o reemplazar) el JSON de un resultado"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (sidecar, hash, updated_at, data) VALUES (?, ?, ?, ?)",
+                (str(sidecar), data.get("hash"), updated_at if updated_at is not None else time.time(),
+                 json.dumps(data, ensure_ascii=False))
+            )
+            self._conn.commit()
+            self._writes += 1
+
+    def find(self, doc_hash: str) -> List[Tuple[str, Dict]]:
+        """Resultados (ruta del JSON, contenido) con ese hash, del más reciente al más antiguo"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT sidecar, data FROM documents WHERE hash = ? ORDER BY updated_at DESC", (doc_hash,)
+            ).fetchall()
+        return [(sidecar, json.loads(data)) for sidecar, data in rows]
+
+    def update_by_hash(self, doc_hash: str, updater: Callable[[Dict], Optional[Dict]]) -> bool:
+        """
+        Aplicar ``updater`` a todos los resultados con ese hash, en disco y en
+        el índice. Devuelve True si había alguno.
+        """
+        records = self.find(doc_hash)
+        for sidecar, data in records:
+            newdata = updater(data) or data
+            write_json_atomic(sidecar, newdata)
+            self.upsert(sidecar, newdata)
+        return bool(records)
+
+    def anchored_hashes(self) -> Iterator[str]:
+        """Hashes de documentos cuyo resultado ya registra un anclaje"""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT hash, data FROM documents WHERE hash IS NOT NULL").fetchall()
+        for doc_hash, data in rows:
+            if json.loads(data).get("anchor"):
+                yield doc_hash
+
+    def rebuild(self, uploads: PathLike, pattern: str = "*.json") -> int:
+        """
+        Reconstruir el índice desde los JSON de ``uploads``
+
+        Returns:
+            Número de resultados indexados
+        """
+        entries = []
+        for fp in Path(uploads).glob(pattern):
+            try:
+                with open(fp, "r", encoding="utf-8") as fh:
+                    data = json.load(fh)
+            except Exception:
+                continue
+            if isinstance(data, dict) and data.get("hash"):
+                entries.append((str(fp), data["hash"], fp.stat().st_mtime, json.dumps(data, ensure_ascii=False)))
+        with self._lock:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (sidecar, hash, updated_at, data) VALUES (?, ?, ?, ?)", entries
+            )
+            self._conn.commit()
+            self._writes += 1
+        return len(entries)
+
+    def recent(
+        self,
+        limit: int = 10,
+        after: Optional[Tuple[float, str]] = None,
+        suffix: str = ""
+    ) -> Tuple[List[Dict], Optional[Tuple[float, str]]]:
+        """
+        Resultados del más reciente al más antiguo, por páginas
+
+        Args:
+            limit: Resultados por página
+            after: Clave (updated_at, sidecar) del último de la página anterior
+            suffix: Filtrar por terminación de la ruta (p. ej. ".pdf.json")
+
+        Returns:
+            (resultados, clave para la página siguiente o None si no hay más)
+        """
+        clauses, params = ["sidecar LIKE ?"], ["%" + suffix]
+        if after is not None:
+            clauses.append("(updated_at < ? OR (updated_at = ? AND sidecar < ?))")
+            params += [after[0], after[0], after[1]]
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT updated_at, sidecar, data FROM documents WHERE {' AND '.join(clauses)} "
+                "ORDER BY updated_at DESC, sidecar DESC LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+        page = rows[:limit]
+        next_key = (page[-1][0], page[-1][1]) if len(rows) > limit else None
+        return [json.loads(data) for _, _, data in page], next_key
+
+    def generation(self) -> str:
+        """
+        Marca que cambia con cada escritura, propia o de otra conexión
+        (``PRAGMA data_version`` no lee páginas de la base), y entre
+        instancias: nunca se repite tras reiniciar el proceso
+        """
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            return f"{self._instance}.{self._writes}.{data_version}"
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruir el índice de resultados de iusweb")
+    parser.add_argument("uploads", type=Path, nargs="?",
+                        default=Path(__file__).resolve().parent / "uploads", help="Directorio de subidas")
+    parser.add_argument("--db", type=Path, default=None, help="Base SQLite (por defecto <uploads>/index.db)")
+    args = parser.parse_args()
+
+    index = UploadIndex(args.db or args.uploads / "index.db")
+    count = index.rebuild(args.uploads)
+    index.close()
+    print(f"Índice reconstruido: {count} resultados")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+MULTI_ANCHOR.PY - Anclaje concurrente en varias redes con quórum
+================================================================
+
+Envía el mismo anclaje (un documento o la raíz Merkle de un lote) a varios
+backends a la vez, por ejemplo Polygon y Sepolia, en lugar de hacerlo en
+serie. Cada red tiene su propio timeout y el resultado se decide con una
+regla de quórum:
+
+- ``"all"``: todas las redes deben confirmar
+- ``"any"``: basta con una
+- ``k`` (entero): al menos k de n
+
+La llamada retorna en cuanto el quórum se cumple o ya no puede cumplirse;
+las redes lentas no añaden latencia más allá de su timeout.
+
+A diferencia de ``BlockchainAnchor``, aquí un backend que no puede
+inicializarse es un error: no se sustituye en silencio por la simulación.
+
+Autor: Consultoría de Sistemas Legales Automatizados
+Fecha: 2025-11-05
+Versión: 1.0.0
+"""
+
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Union
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from anchor_v2 import (
+    AnchorConfig,
+    BaseBlockchainBackend,
+    BlockchainNetwork,
+    BlockchainRecord,
+    EthereumBackend,
+    NetworkError,
+    SimulationBackend,
+    TransactionError,
+    ValidationError,
+    compute_document_hash,
+    merkle_proof,
+    merkle_root,
+    validate_classification,
+)
+
+logger = logging.getLogger(__name__)
+
+Quorum = Union[str, int]
+
+# ----------------------------------------------------------------------------
+# RESULTADOS
+# ----------------------------------------------------------------------------
+
+@dataclass
+class MultiAnchorResult:
+    """Resultado por red de un anclaje multi-red"""
+    quorum: Quorum
+    required: int
+    records: Dict[str, Any] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    timed_out: List[str] = field(default_factory=list)
+    elapsed: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def quorum_met(self) -> bool:
+        return len(self.records) >= self.required
+
+    def to_dict(self) -> Dict:
+        def dump(value):
+            if isinstance(value, list):
+                return [r.to_dict() for r in value]
+            return value.to_dict()
+
+        return {
+            "quorum": self.quorum,
+            "required": self.required,
+            "quorum_met": self.quorum_met,
+            "records": {name: dump(value) for name, value in self.records.items()},
+            "errors": self.errors,
+            "timed_out": self.timed_out,
+            "elapsed": self.elapsed,
+        }
+
+
+def required_confirmations(quorum: Quorum, networks: int) -> int:
+    """Número de redes que deben confirmar según la regla de quórum"""
+    if quorum == "all":
+        return networks
+    if quorum == "any":
+        return min(1, networks)
+    if isinstance(quorum, int) and not isinstance(quorum, bool) and 1 <= quorum <= networks:
+        return quorum
+    raise ValidationError(f"Quórum inválido para {networks} redes: {quorum!r}")
+
+# ----------------------------------------------------------------------------
+# ANCLAJE MULTI-RED
+# ----------------------------------------------------------------------------
+
+class MultiNetworkAnchor:
+    """Fan-out concurrente de anclajes a varios backends"""
+
+    def __init__(
+        self,
+        backends: Dict[str, BaseBlockchainBackend],
+        quorum: Quorum = "all",
+        timeouts: Optional[Dict[str, float]] = None,
+        default_timeout: float = 30.0
+    ):
+        """
+        Args:
+            backends: Backends por nombre de red
+            quorum: "all", "any" o k (al menos k redes)
+            timeouts: Timeout en segundos por red (por defecto ``default_timeout``)
+        """
+        if not backends:
+            raise ValidationError("Se requiere al menos un backend")
+        self.backends = dict(backends)
+        self.quorum = quorum
+        self.required = required_confirmations(quorum, len(self.backends))
+        self.timeouts = {name: (timeouts or {}).get(name, default_timeout) for name in self.backends}
+        # Varios hilos por red: un envío que venció su timeout puede seguir ocupando uno
+        self._executor = ThreadPoolExecutor(
+            max_workers=4 * len(self.backends), thread_name_prefix="multi-anchor"
+        )
+
+    @classmethod
+    def from_configs(cls, configs: List[AnchorConfig], quorum: Quorum = "all") -> "MultiNetworkAnchor":
+        """
+        Construir un backend por configuración (timeout de cada red: ``config.timeout``)
+
+        Raises:
+            NetworkError: si alguna red no puede inicializarse
+        """
+        backends: Dict[str, BaseBlockchainBackend] = {}
+        timeouts: Dict[str, float] = {}
+        for config in configs:
+            name = config.network.value
+            if name in backends:
+                name = f"{name}-{sum(1 for n in backends if n.startswith(config.network.value))}"
+            backend_class = SimulationBackend if config.network == BlockchainNetwork.SIMULATION else EthereumBackend
+            try:
+                backends[name] = backend_class(config)
+            except Exception as e:
+                raise NetworkError(f"No se pudo inicializar la red {name}: {e}")
+            timeouts[name] = config.timeout
+        return cls(backends, quorum=quorum, timeouts=timeouts)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self) -> "MultiNetworkAnchor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _fan_out(self, call: Callable[[BaseBlockchainBackend], Any], raise_on_failure: bool) -> MultiAnchorResult:
+        """Ejecutar ``call`` en todas las redes y decidir por quórum"""
+        result = MultiAnchorResult(quorum=self.quorum, required=self.required)
+        started = time.monotonic()
+        pending = {self._executor.submit(call, backend): name for name, backend in self.backends.items()}
+        deadlines = {name: started + timeout for name, timeout in self.timeouts.items()}
+
+        while pending:
+            failed = len(result.errors)
+            if len(result.records) >= self.required or failed > len(self.backends) - self.required:
+                break  # Quórum decidido: no esperar a las demás redes
+
+            next_deadline = min(deadlines[name] for name in pending.values())
+            done, _ = wait(pending, timeout=max(0.0, next_deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name = pending.pop(future)
+                result.elapsed[name] = time.monotonic() - started
+                try:
+                    result.records[name] = future.result()
+                except Exception as e:
+                    logger.warning(f"Anclaje en {name} fallido: {e}")
+                    result.errors[name] = str(e)
+
+            now = time.monotonic()
+            for future, name in list(pending.items()):
+                if now >= deadlines[name]:
+                    pending.pop(future)
+                    future.cancel()
+                    result.timed_out.append(name)
+                    result.errors[name] = f"Timeout de {self.timeouts[name]}s"
+                    logger.warning(f"Anclaje en {name} sin respuesta tras {self.timeouts[name]}s")
+
+        if pending:
+            logger.info(f"Quórum decidido; {len(pending)} red(es) siguen en segundo plano")
+
+        if raise_on_failure and not result.quorum_met:
+            raise TransactionError(
+                f"Quórum {self.quorum!r} no alcanzado ({len(result.records)}/{self.required}): {result.errors}"
+            )
+        return result
+
+    def anchor(self, data: Dict, raise_on_failure: bool = True) -> MultiAnchorResult:
+        """
+        Anclar los mismos datos en todas las redes a la vez
+
+        Returns:
+            MultiAnchorResult con un BlockchainRecord por red confirmada
+
+        Raises:
+            TransactionError: si no se alcanza el quórum (y ``raise_on_failure``)
+        """
+        validate_classification(data)
+        return self._fan_out(lambda backend: backend.anchor(data), raise_on_failure)
+
+    def anchor_batch(self, items: List[Dict], raise_on_failure: bool = True) -> MultiAnchorResult:
+        """
+        Anclar la raíz Merkle de un lote en todas las redes a la vez
+
+        Los backends con contrato ExpedienteRegistry la registran con
+        ``registrarLote``; en los que no tienen ``anchor_batch`` se ancla un
+        documento que contiene la raíz. En ambos casos cada red devuelve un
+        registro por elemento con su ruta Merkle. Un EthereumBackend sin
+        contrato ancla cada documento por separado (en pipeline si puede):
+        la raíz dentro de otro documento no se podría verificar en su cadena.
+        """
+        for data in items:
+            validate_classification(data)
+        hashes = [compute_document_hash(data) for data in items]
+        root = merkle_root(hashes)
+
+        def call(backend: BaseBlockchainBackend) -> List[BlockchainRecord]:
+            if not hasattr(backend, "anchor_batch"):
+                return _anchor_root_document(backend, items, hashes, root)
+            if _has_registry(backend):
+                return backend.anchor_batch(items)
+            if hasattr(backend, "anchor_many"):
+                return backend.anchor_many(items)
+            return [backend.anchor(data) for data in items]
+
+        return self._fan_out(call, raise_on_failure)
+
+
+def _has_registry(backend: BaseBlockchainBackend) -> bool:
+    """¿Tiene el backend un contrato configurado para ``registrarLote``?"""
+    return getattr(backend, "contract", None) is not None
+
+
+def _anchor_root_document(
+    backend: BaseBlockchainBackend,
+    items: List[Dict],
+    hashes: List[str],
+    root: str
+) -> List[BlockchainRecord]:
+    """Anclar la raíz de un lote como documento en backends sin registrarLote"""
+    root_record = backend.anchor({
+        "text": f"Raíz Merkle de lote: {root}",
+        "predicted_label": "lote_merkle",
+        "confidence": 1.0,
+        "merkle_root": root,
+        "batch_size": len(items),
+    })
+    return [
+        BlockchainRecord(
+            document_hash=document_hash,
+            classification_data=data,
+            timestamp=root_record.timestamp,
+            block_number=root_record.block_number,
+            transaction_hash=root_record.transaction_hash,
+            network=root_record.network,
+            merkle_root=root,
+            metadata={
+                "merkle_proof": merkle_proof(hashes, i),
+                "batch_size": len(items),
+                "batch_index": i,
+                "root_document_hash": root_record.document_hash,
+            }
+        )
+        for i, (data, document_hash) in enumerate(zip(items, hashes))
+    ]
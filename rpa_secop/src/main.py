@@ -1,7 +1,10 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from pathlib import Path
-import json, time, hashlib
+import json, time, sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from hash_utils import sha256_file
 
 RAW_DIR = Path(__file__).resolve().parents[1] / "data" / "raw"
 RAW_DIR.mkdir(parents=True, exist_ok=True)
@@ -25,13 +28,6 @@ def crea_pdf(path, titulo, cuerpo):
     c.showPage()
     c.save()
 
-def sha256_file(path):
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-    return h.hexdigest()
-
 def main():
     registros = []
     for e in EXPEDIENTES:
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+RPC_POOL.PY - Proveedor JSON-RPC multi-endpoint con pool de conexiones
+======================================================================
+
+Reparte las llamadas JSON-RPC entre varios nodos (propios y de terceros)
+para que un proveedor lento no ralentice todo el anclaje:
+
+- Conexiones HTTP keep-alive reutilizadas por endpoint (pool acotado)
+- Latencia móvil (EWMA) y tasa de error en ventana por endpoint
+- Cada llamada va al endpoint más sano; si falla, al siguiente
+- Lecturas con "hedging": si el primero no responde en ``hedge_after``
+  segundos se lanza la misma lectura a otro endpoint y gana el primero.
+  Las escrituras (``eth_sendRawTransaction``) nunca se duplican.
+- ``call_batch`` envía batches JSON-RPC (verificación masiva) por la misma
+  ruta, así que ``verify_records_jsonrpc`` puede usar el pool como cliente
+- ``make_web3_provider`` lo expone como proveedor de web3.py
+
+Autor: Consultoría de Sistemas Legales Automatizados
+Fecha: 2025-11-05
+Versión: 1.0.0
+"""
+
+import json
+import time
+import queue
+import logging
+import threading
+import http.client
+from collections import deque
+from urllib.parse import urlparse
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from anchor_v2 import BlockchainError, NetworkError, parse_batch_reply
+
+logger = logging.getLogger(__name__)
+
+# Métodos sin efectos: se pueden repetir o duplicar sin riesgo
+READ_METHODS = frozenset({
+    "eth_blockNumber", "eth_chainId", "net_version", "eth_gasPrice", "eth_maxPriorityFeePerGas",
+    "eth_feeHistory", "eth_getBalance", "eth_getCode", "eth_getTransactionCount", "eth_call",
+    "eth_estimateGas", "eth_getBlockByNumber", "eth_getBlockByHash", "eth_getTransactionByHash",
+    "eth_getTransactionReceipt", "eth_getLogs", "eth_syncing",
+})
+
+
+class RpcRemoteError(BlockchainError):
+    """El nodo respondió con un error JSON-RPC (no es un fallo del endpoint)"""
+
+    def __init__(self, error: Dict):
+        super().__init__(error.get("message", str(error)))
+        self.error = error
+
+# ----------------------------------------------------------------------------
+# ENDPOINT
+# ----------------------------------------------------------------------------
+
+class RpcEndpoint:
+    """Un nodo RPC: pool de conexiones keep-alive y estadísticas de salud"""
+
+    def __init__(self, url: str, timeout: float = 30, max_connections: int = 4,
+                 window: int = 50, alpha: float = 0.2):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError(f"Esquema no soportado: {url}")
+        self.url = url
+        self.timeout = timeout
+        self._host = parsed.hostname
+        self._port = parsed.port
+        self._path = parsed.path or "/"
+        self._https = parsed.scheme == "https"
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, max_connections))
+        self._lock = threading.Lock()
+        self._alpha = alpha
+        self._outcomes = deque(maxlen=window)
+        self.latency: Optional[float] = None  # EWMA en segundos
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.connections_opened = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        with self._lock:
+            self.connections_opened += 1
+        return cls(self._host, self._port, timeout=self.timeout)
+
+    def post(self, payload: bytes) -> Any:
+        """Enviar un cuerpo JSON-RPC reutilizando una conexión del pool"""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                conn.request("POST", self._path, body=payload,
+                             headers={"Content-Type": "application/json", "Connection": "keep-alive"})
+                response = conn.getresponse()
+                body = response.read()
+                if response.status != 200:
+                    raise NetworkError(f"HTTP {response.status} de {self.url}")
+            except Exception:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+            return json.loads(body)
+
+    def record(self, ok: bool, elapsed: float, cooldown: float) -> None:
+        with self._lock:
+            self.requests += 1
+            self._outcomes.append(ok)
+            if ok:
+                self.consecutive_failures = 0
+                self.latency = elapsed if self.latency is None else (
+                    self._alpha * elapsed + (1 - self._alpha) * self.latency
+                )
+            else:
+                self.consecutive_failures += 1
+                if self.consecutive_failures >= 3:
+                    self.cooldown_until = time.monotonic() + cooldown
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    def score(self) -> float:
+        """
+        Menor es mejor: latencia penalizada por la tasa de error
+
+        Un endpoint aún sin medir puntúa 0 para que se pruebe; uno en
+        enfriamiento tras fallos seguidos queda el último.
+        """
+        if time.monotonic() < self.cooldown_until:
+            return float("inf")
+        error_rate = self.error_rate
+        return (self.latency or 0.0) * (1 + 10 * error_rate) + error_rate
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "latency_ms": round(self.latency * 1000, 2) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "cooling_down": time.monotonic() < self.cooldown_until,
+        }
+
+# ----------------------------------------------------------------------------
+# POOL
+# ----------------------------------------------------------------------------
+
+class RpcPool:
+    """Enrutado de llamadas JSON-RPC al endpoint más sano, con failover y hedging"""
+
+    def __init__(
+        self,
+        urls: List[str],
+        timeout: float = 30,
+        max_connections: int = 4,
+        hedge_after: Optional[float] = 0.25,
+        cooldown: float = 10.0
+    ):
+        """
+        Args:
+            urls: Endpoints RPC
+            timeout: Timeout de socket por petición
+            max_connections: Conexiones keep-alive máximas por endpoint
+            hedge_after: Segundos antes de duplicar una lectura lenta (None: sin hedging)
+            cooldown: Segundos fuera de rotación tras 3 fallos seguidos
+        """
+        if not urls:
+            raise ValueError("Se requiere al menos una URL RPC")
+        self.endpoints = [RpcEndpoint(url, timeout, max_connections) for url in urls]
+        self.hedge_after = hedge_after
+        self.cooldown = cooldown
+        self.hedges = 0
+        self._ids = iter(range(1, 1 << 62))
+        self._id_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(4, len(self.endpoints) * max_connections), thread_name_prefix="rpc-pool"
+        )
+
+    def _next_id(self) -> int:
+        with self._id_lock:
+            return next(self._ids)
+
+    def ranked(self) -> List[RpcEndpoint]:
+        """Endpoints de mejor a peor según latencia y errores recientes"""
+        return sorted(self.endpoints, key=lambda e: e.score())
+
+    def _attempt(self, endpoint: RpcEndpoint, payload: bytes) -> Any:
+        started = time.monotonic()
+        try:
+            reply = endpoint.post(payload)
+        except Exception:
+            endpoint.record(False, time.monotonic() - started, self.cooldown)
+            raise
+        endpoint.record(True, time.monotonic() - started, self.cooldown)
+        return reply
+
+    def make_request(self, method: str, params: list) -> Dict:
+        """
+        Ejecutar una llamada y devolver la respuesta JSON-RPC completa
+
+        Raises:
+            NetworkError: si ningún endpoint respondió
+        """
+        payload = json.dumps({"jsonrpc": "2.0", "id": self._next_id(), "method": method, "params": params}).encode()
+        return self._send(payload, method, method in READ_METHODS)
+
+    def call_batch(self, calls: List[Tuple[str, list]]) -> List[Any]:
+        """
+        Varias llamadas en una sola petición batch, enrutada como las demás
+
+        Mismo contrato que ``anchor_v2.JsonRpcBatchClient.call_batch``: los
+        resultados van en el orden de ``calls`` y las llamadas con error
+        devuelven un BlockchainError en su posición. Un batch sólo de
+        lecturas admite hedging.
+        """
+        if not calls:
+            return []
+        payload = json.dumps([
+            {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+            for i, (method, params) in enumerate(calls)
+        ]).encode()
+        read_only = all(method in READ_METHODS for method, _ in calls)
+        return parse_batch_reply(self._send(payload, "batch", read_only), len(calls))
+
+    def _send(self, payload: bytes, label: str, read_only: bool) -> Any:
+        """Enviar al mejor endpoint con failover; las lecturas, con hedging"""
+        candidates = self.ranked()
+        if read_only and self.hedge_after is not None and len(candidates) > 1:
+            return self._hedged(candidates, payload)
+
+        errors = []
+        for endpoint in candidates:
+            try:
+                return self._attempt(endpoint, payload)
+            except Exception as e:
+                errors.append(f"{endpoint.url}: {e}")
+                logger.warning(f"RPC {label} fallido en {endpoint.url}: {e}")
+        raise NetworkError(f"Ningún endpoint RPC respondió a {label}: {errors}")
+
+    def _hedged(self, candidates: List[RpcEndpoint], payload: bytes) -> Any:
+        """Lectura al mejor endpoint; si tarda, también al siguiente. Gana la primera respuesta"""
+        remaining = list(candidates)
+        pending = {}
+        errors = []
+
+        def launch():
+            endpoint = remaining.pop(0)
+            pending[self._executor.submit(self._attempt, endpoint, payload)] = endpoint
+
+        launch()
+        while pending:
+            timeout = self.hedge_after if remaining else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                self.hedges += 1
+                launch()  # El primero va lento: duplicar la lectura
+                continue
+            for future in done:
+                endpoint = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    errors.append(f"{endpoint.url}: {e}")
+                    if remaining:
+                        launch()
+        raise NetworkError(f"Ningún endpoint RPC respondió: {errors}")
+
+    def call(self, method: str, *params) -> Any:
+        """Llamada que devuelve ``result`` o lanza RpcRemoteError"""
+        reply = self.make_request(method, list(params))
+        if "error" in reply:
+            raise RpcRemoteError(reply["error"])
+        return reply.get("result")
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [endpoint.stats() for endpoint in self.endpoints] + [{"hedged_reads": self.hedges}]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        for endpoint in self.endpoints:
+            endpoint.close()
+
+
+def make_web3_provider(pool: RpcPool):
+    """Proveedor de web3.py respaldado por un RpcPool"""
+    from web3.providers.base import JSONBaseProvider
+
+    class PooledProvider(JSONBaseProvider):
+        def make_request(self, method, params):
+            return pool.make_request(str(method), list(params))
+
+        def is_connected(self, show_traceback: bool = False) -> bool:
+            try:
+                return "result" in pool.make_request("eth_chainId", [])
+            except Exception:
+                if show_traceback:
+                    raise
+                return False
+
+    return PooledProvider()
@@ -0,0 +1,1592 @@
+"""
+Tests del Sistema de Anclaje Blockchain (anchor_v2)
+===================================================
+
+Tests de los backends de anclaje. Los que requieren una cadena EVM local
+(eth-tester / py-evm) se omiten si esas dependencias no están instaladas;
+nunca se usa la red.
+
+Autor: Consultoría de Sistemas Legales Automatizados
+Fecha: 2025-11-05
+Versión: 1.0.0
+"""
+
+import unittest
+import sys
+import json
+import asyncio
+import time
+import threading
+import tempfile
+import tracemalloc
+import importlib.util
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+
+# Agregar el directorio raíz al path para imports
+sys.path.insert(0, str(Path(__file__).parent))
+
+from anchor_v2 import (
+    AnchorConfig,
+    BlockchainAnchor,
+    BlockchainNetwork,
+    BlockchainError,
+    BlockchainRecord,
+    CachedRPC,
+    CircuitBreaker,
+    CircuitOpenError,
+    CompactLedger,
+    DuplicateAnchorError,
+    ConfirmationTracker,
+    PendingTransaction,
+    EthereumBackend,
+    JsonRpcBatchClient,
+    NetworkError,
+    MerkleMountainRange,
+    PayloadStore,
+    ReceiptStore,
+    RetryPolicy,
+    SimulationBackend,
+    TransactionError,
+    TransactionStatus,
+    ValidationError,
+    compute_document_hash,
+    merkle_proof,
+    merkle_root,
+    mmr_leaf_hash,
+    verify_merkle_proof,
+    verify_mmr_consistency,
+    verify_mmr_inclusion,
+    verify_records_jsonrpc,
+)
+from anchor_filter import AnchoredHashFilter, optimal_parameters
+from anchor_queue import AnchorQueue, AnchorWorkerPool
+from multi_anchor import MultiNetworkAnchor
+from rpc_pool import RpcPool
+from event_indexer import EventIndex, EventLogSource, ExpedienteEventIndexer
+
+HAS_ETH_TESTER = all(
+    importlib.util.find_spec(mod) is not None
+    for mod in ("web3", "eth_account", "eth_tester", "eth")
+)
+
+
+HAS_SOLC = HAS_ETH_TESTER and importlib.util.find_spec("solcx") is not None
+
+
+def _sample_data(i: int) -> dict:
+    """Clasificación mínima válida"""
+    return {"text": f"Contrato de obra {i}", "predicted_label": "administrativo", "confidence": 0.9}
+
+
+def _record(i: int, tx_hash: str) -> BlockchainRecord:
+    """Registro con hash de documento coherente con sus datos"""
+    data = _sample_data(i)
+    return BlockchainRecord(
+        document_hash=EthereumBackend._document_hash(data),
+        classification_data=data,
+        timestamp="2025-11-05T12:00:00",
+        transaction_hash=tx_hash
+    )
+
+
+class FakeJsonRpcNode:
+    """
+    Nodo JSON-RPC local: ``eth_getTransactionByHash`` desde un dict, otros
+    métodos desde ``results``; con latencia (``delay``) y fallos HTTP
+    (``fail``) inyectables y conexiones keep-alive (HTTP/1.1)
+    """
+
+    def __init__(self, transactions: dict, results: dict = None, delay: float = 0.0, fail: bool = False):
+        self.transactions = transactions
+        self.results = results or {}
+        self.delay = delay
+        self.fail = fail
+        self.requests = []
+        self.connections = 0
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                node.connections += 1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                node.requests.append(body)
+                time.sleep(node.delay)
+                if node.fail:
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                calls = body if isinstance(body, list) else [body]
+                replies = [node.handle(call) for call in calls]
+                payload = json.dumps(replies if isinstance(body, list) else replies[0]).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def handle(self, call: dict) -> dict:
+        if call["method"] in self.results:
+            return {"jsonrpc": "2.0", "id": call["id"], "result": self.results[call["method"]]}
+        if call["method"] != "eth_getTransactionByHash":
+            return {"jsonrpc": "2.0", "id": call["id"], "error": {"code": -32601, "message": "method not found"}}
+        return {"jsonrpc": "2.0", "id": call["id"], "result": self.transactions.get(call["params"][0])}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _tester_backend(**overrides) -> EthereumBackend:
+    """EthereumBackend sobre una cadena eth-tester en proceso"""
+    from web3 import Web3, EthereumTesterProvider
+
+    provider = EthereumTesterProvider()
+    web3 = Web3(provider)
+    key = provider.ethereum_tester.backend.account_keys[0]
+    config = AnchorConfig(
+        network=BlockchainNetwork.GANACHE,
+        private_key=key.to_hex(),
+        timeout=5,
+        poll_interval=0.01,
+        **overrides
+    )
+    return EthereumBackend(config, web3=web3)
+
+
+class _CountingEth:
+    """Sustituto mínimo de ``web3.eth`` que cuenta las lecturas"""
+
+    def __init__(self):
+        self.reads = {"chain_id": 0, "gas_price": 0, "get_transaction_count": 0}
+        self.nonce = 7
+
+    @property
+    def chain_id(self):
+        self.reads["chain_id"] += 1
+        return 1337
+
+    @property
+    def gas_price(self):
+        self.reads["gas_price"] += 1
+        return 10
+
+    def get_transaction_count(self, address, block):
+        self.reads["get_transaction_count"] += 1
+        return self.nonce
+
+
+class TestCachedRPC(unittest.TestCase):
+    """Fachada RPC con caché"""
+
+    def setUp(self):
+        self.eth = _CountingEth()
+        self.rpc = CachedRPC(SimpleNamespace(eth=self.eth), address="0xabc", fee_ttl=60)
+
+    def test_chain_id_and_fees_are_cached(self):
+        for _ in range(5):
+            self.assertEqual(self.rpc.chain_id, 1337)
+            self.assertEqual(self.rpc.gas_price, 10)
+        self.assertEqual(self.eth.reads["chain_id"], 1)
+        self.assertEqual(self.eth.reads["gas_price"], 1)
+
+        self.rpc.invalidate_fees()
+        self.rpc.gas_price
+        self.assertEqual(self.eth.reads["gas_price"], 2)
+
+    def test_fee_ttl_expiry(self):
+        rpc = CachedRPC(SimpleNamespace(eth=self.eth), fee_ttl=0)
+        rpc.gas_price
+        rpc.gas_price
+        self.assertEqual(self.eth.reads["gas_price"], 2)
+
+    def test_local_nonce_counter_and_resync(self):
+        self.assertEqual([self.rpc.allocate_nonce() for _ in range(3)], [7, 8, 9])
+        self.assertEqual(self.eth.reads["get_transaction_count"], 1)
+
+        self.assertTrue(self.rpc.rollback_nonce(9))
+        self.assertFalse(self.rpc.rollback_nonce(7))
+        self.assertEqual(self.rpc.allocate_nonce(), 9)
+
+        self.eth.nonce = 20
+        self.rpc.resync_nonce()
+        self.assertEqual(self.rpc.allocate_nonce(), 20)
+        self.assertEqual(self.eth.reads["get_transaction_count"], 2)
+
+    def test_per_anchor_counters(self):
+        self.rpc.begin_anchor()
+        self.rpc.chain_id
+        self.rpc.gas_price
+        self.rpc.allocate_nonce()
+        first = self.rpc.end_anchor()
+
+        self.rpc.begin_anchor()
+        self.rpc.chain_id
+        self.rpc.gas_price
+        self.rpc.allocate_nonce()
+        second = self.rpc.end_anchor()
+
+        self.assertEqual(sum(first.values()), 3)
+        self.assertEqual(second, {})
+        stats = self.rpc.stats()
+        self.assertEqual(stats["anchors"], 2)
+        self.assertEqual(stats["total_calls"], 3)
+
+    def test_concurrent_anchors_count_separately(self):
+        rpc = CachedRPC(SimpleNamespace(eth=self.eth), fee_ttl=0)
+        barrier = threading.Barrier(2)
+
+        def anchor(reads: int):
+            rpc.begin_anchor()
+            barrier.wait()  # ambos anclajes en curso a la vez
+            for _ in range(reads):
+                rpc.gas_price
+            barrier.wait()
+            return rpc.end_anchor()
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(anchor, (2, 5)))
+
+        self.assertEqual(results, [{"gas_price": 2}, {"gas_price": 5}])
+
+    def test_totals_are_exact_under_concurrency(self):
+        rpc = CachedRPC(SimpleNamespace(eth=self.eth), fee_ttl=0)
+
+        def anchor(_):
+            rpc.begin_anchor()
+            for _ in range(500):
+                rpc.gas_price
+            return rpc.end_anchor()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(anchor, range(8)))
+
+        self.assertEqual(results, [{"gas_price": 500}] * 8)
+        self.assertEqual(rpc.stats()["total_calls"], 4000)
+        self.assertEqual(rpc.stats()["anchors"], 8)
+
+
+class _RejectingEth(_CountingEth):
+    """``web3.eth`` que rechaza cada envío; otra herramienta ya usó los nonces 7 y 8"""
+
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = list(errors)
+
+    def send_raw_transaction(self, raw_tx):
+        self.nonce = 9
+        raise self.errors.pop(0)
+
+
+class TestEthereumNonces(unittest.TestCase):
+    """Liberación de nonces en envíos fallidos (sin nodo)"""
+
+    def test_failed_send_after_resync_releases_nonce_actually_used(self):
+        eth = _RejectingEth([ValueError("nonce too low"), ValueError("insufficient funds for gas")])
+        backend = EthereumBackend(AnchorConfig(network=BlockchainNetwork.GANACHE), web3=SimpleNamespace(eth=eth))
+        backend.account = SimpleNamespace(
+            address="0xabc",
+            sign_transaction=lambda tx: SimpleNamespace(rawTransaction=b"raw", hash=bytes(32))
+        )
+
+        with mock.patch.object(backend, "_release_nonce") as release:
+            with self.assertRaises(TransactionError):
+                backend.submit(_sample_data(1))
+        # Se asignó el 7, pero tras resincronizar el envío fallido usó el 9
+        release.assert_called_once_with(9)
+        self.assertEqual(backend.pending_transactions(), [])
+
+
+class TestBatchVerification(unittest.TestCase):
+    """Verificación masiva con JSON-RPC batch contra un nodo local"""
+
+    def setUp(self):
+        self.records = [_record(i, "0x%064x" % i) for i in range(25)]
+        transactions = {r.transaction_hash: {"input": "0x" + r.document_hash} for r in self.records}
+        # 3 ausentes, 2 con input distinto
+        for r in self.records[:3]:
+            del transactions[r.transaction_hash]
+        for r in self.records[3:5]:
+            transactions[r.transaction_hash] = {"input": "0x" + "00" * 32}
+        self.node = FakeJsonRpcNode(transactions)
+        self.addCleanup(self.node.close)
+
+    def test_report_classifies_records(self):
+        # Un registro alterado localmente no se consulta en la red
+        self.records[5].classification_data = {**self.records[5].classification_data, "confidence": 0.1}
+        client = JsonRpcBatchClient(self.node.url, timeout=5)
+
+        report = verify_records_jsonrpc(client, self.records, batch_size=10, max_workers=3)
+
+        tx = [r.transaction_hash for r in self.records]
+        self.assertEqual(sorted(report.missing), tx[:3])
+        self.assertEqual(sorted(report.mismatched), tx[3:6])
+        self.assertEqual(sorted(report.valid), tx[6:])
+        self.assertEqual(report.errors, {})
+        self.assertEqual(report.to_dict()["summary"]["total"], 25)
+
+    def test_lookups_are_grouped_in_batches(self):
+        client = JsonRpcBatchClient(self.node.url, timeout=5)
+
+        verify_records_jsonrpc(client, self.records, batch_size=10, max_workers=2)
+
+        self.assertEqual(client.requests_sent, 3)
+        self.assertEqual(sorted(len(req) for req in self.node.requests), [5, 10, 10])
+
+    def test_unreachable_node_reports_errors(self):
+        self.node.close()
+        client = JsonRpcBatchClient(self.node.url, timeout=1)
+
+        report = verify_records_jsonrpc(client, self.records[:4], batch_size=2)
+
+        self.assertEqual(len(report.errors), 4)
+        self.assertFalse(report.all_valid)
+
+    def test_simulation_verify_records(self):
+        anchor = BlockchainAnchor(AnchorConfig())
+        records = [anchor.backend.anchor(_sample_data(i)) for i in range(5)]
+        records.append(_record(99, "0xsim_missing"))
+
+        report = anchor.verify_records(records)
+
+        self.assertEqual(len(report.valid), 5)
+        self.assertEqual(report.missing, ["0xsim_missing"])
+
+
+class TestMerkleBatch(unittest.TestCase):
+    """Raíz y rutas Merkle de los lotes"""
+
+    def test_proofs_for_every_leaf(self):
+        for n in (1, 2, 3, 7, 16):
+            hashes = [EthereumBackend._document_hash(_sample_data(i)) for i in range(n)]
+            root = merkle_root(hashes)
+            for i, leaf in enumerate(hashes):
+                self.assertTrue(verify_merkle_proof(leaf, merkle_proof(hashes, i), root))
+            self.assertFalse(verify_merkle_proof("00" * 32, merkle_proof(hashes, 0), root))
+
+    def test_simulation_root_unchanged(self):
+        backend = SimulationBackend(AnchorConfig())
+        hashes = ["a" * 64, "b" * 64, "c" * 64]
+        self.assertEqual(backend._calculate_merkle_root(list(hashes)), merkle_root(hashes))
+        self.assertEqual(merkle_root(["a" * 64]), "a" * 64)
+
+    def test_batch_record_anchored_hash(self):
+        items = [_sample_data(i) for i in range(5)]
+        hashes = [EthereumBackend._document_hash(d) for d in items]
+        record = _record(2, "0x" + "11" * 32)
+        record.merkle_root = merkle_root(hashes)
+        record.metadata["merkle_proof"] = merkle_proof(hashes, 2)
+        self.assertEqual(record.anchored_hash(), record.merkle_root)
+
+        record.metadata["merkle_proof"] = merkle_proof(hashes, 3)
+        self.assertIsNone(record.anchored_hash())
+
+
+class TestMerkleMountainRange(unittest.TestCase):
+    """Acumulador MMR: raíces por tamaño, inclusión y consistencia"""
+
+    @staticmethod
+    def _leaves(n: int, salt: str = ""):
+        return [mmr_leaf_hash(i + 1, f"0x{salt}{i}", f"{i:064x}") for i in range(n)]
+
+    def _mmr(self, leaves) -> MerkleMountainRange:
+        mmr = MerkleMountainRange()
+        for leaf in leaves:
+            mmr.append(leaf)
+        return mmr
+
+    def test_historical_roots_match_fresh_builds(self):
+        leaves = self._leaves(40)
+        mmr = self._mmr(leaves)
+        for size in range(41):
+            self.assertEqual(mmr.root(size), self._mmr(leaves[:size]).root())
+        # Nodos guardados: 2n - popcount(n), crecimiento lineal y append O(log n)
+        self.assertEqual(mmr.node_count(), 2 * 40 - bin(40).count("1"))
+
+    def test_inclusion_proofs(self):
+        leaves = self._leaves(23)
+        mmr = self._mmr(leaves)
+        for size in (1, 8, 13, 23):
+            root = mmr.root(size)
+            for index in range(size):
+                proof = mmr.inclusion_proof(index, size)
+                self.assertTrue(verify_mmr_inclusion(leaves[index], index, size, proof, root))
+
+        proof = mmr.inclusion_proof(4)
+        self.assertFalse(verify_mmr_inclusion(leaves[5], 4, 23, proof, mmr.root()))
+        self.assertFalse(verify_mmr_inclusion(leaves[4], 4, 23, proof, mmr.root(22)))
+
+    def test_consistency_between_all_lengths(self):
+        mmr = self._mmr(self._leaves(33))
+        for old_size in range(34):
+            for new_size in range(old_size, 34):
+                proof = mmr.consistency_proof(old_size, new_size)
+                self.assertTrue(
+                    verify_mmr_consistency(old_size, mmr.root(old_size), new_size, mmr.root(new_size), proof),
+                    (old_size, new_size)
+                )
+
+    def test_rewritten_history_is_detected(self):
+        honest = self._mmr(self._leaves(20))
+        forged_leaves = self._leaves(20)
+        forged_leaves[5] = mmr_leaf_hash(6, "0xforjada", "f" * 64)
+        forged = self._mmr(forged_leaves)
+
+        old_root = honest.root(9)
+        proof = forged.consistency_proof(9, 20)
+        self.assertFalse(verify_mmr_consistency(9, old_root, 20, forged.root(20), proof))
+        # Tamaños intercambiados o prueba truncada tampoco valen
+        good = honest.consistency_proof(9, 20)
+        self.assertFalse(verify_mmr_consistency(20, honest.root(20), 9, old_root, good))
+        self.assertFalse(verify_mmr_consistency(9, old_root, 20, honest.root(20), {**good, "paths": good["paths"][:-1]}))
+
+    def test_simulation_backend_commits_every_block(self):
+        backend = SimulationBackend(AnchorConfig())
+        records = [backend.anchor(_sample_data(i)) for i in range(12)]
+
+        for record in records:
+            self.assertEqual(record.metadata["mmr_root"], backend.block_root(record.block_number))
+
+        audit = backend.consistency_proof(records[3].block_number)
+        self.assertEqual(audit["old_root"], records[3].metadata["mmr_root"])
+        self.assertTrue(verify_mmr_consistency(
+            audit["old_size"], records[3].metadata["mmr_root"], audit["new_size"], audit["new_root"], audit["proof"]
+        ))
+
+        inclusion = backend.inclusion_proof(records[7].transaction_hash)
+        self.assertTrue(verify_mmr_inclusion(
+            inclusion["leaf_hash"], inclusion["leaf_index"], inclusion["size"], inclusion["proof"], inclusion["root"]
+        ))
+        self.assertIsNone(backend.inclusion_proof("0xdesconocida"))
+
+
+class TestCompactLedger(unittest.TestCase):
+    """Ledger en columnas con payloads direccionados por contenido"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+
+    @staticmethod
+    def _records(n: int):
+        for i in range(n):
+            data = {**_sample_data(i), "text": (f"Contrato de obra pública {i} " * 30)[:500]}
+            document_hash = EthereumBackend._document_hash(data)
+            yield BlockchainRecord(
+                document_hash=document_hash,
+                classification_data=data,
+                timestamp=f"2025-11-05T12:00:{i % 60:02d}.{i:06d}",
+                block_number=i + 1,
+                transaction_hash=f"0xsim_{i:064x}",
+                merkle_root=document_hash,
+                metadata={"simulation": True, "chain_length": i + 1}
+            )
+
+    def test_simulation_records_round_trip(self):
+        backend = SimulationBackend(AnchorConfig())
+        originals = [backend.anchor(_sample_data(i)) for i in range(5)]
+
+        self.assertIsInstance(backend.chain, CompactLedger)
+        self.assertEqual([r.to_dict() for r in backend.chain], [r.to_dict() for r in originals])
+        self.assertEqual(backend.chain[-1].to_dict(), originals[-1].to_dict())
+        self.assertEqual(backend.chain.find(originals[2].transaction_hash), 2)
+        self.assertIsNone(backend.chain.find("0xsim_" + "0" * 64))
+
+    def test_irregular_records_round_trip(self):
+        ledger = CompactLedger()
+        odd = [
+            BlockchainRecord("ab" * 32, _sample_data(1), "2025-11-05T12:00:00+01:00",
+                             transaction_hash=None, network="ganache", merkle_root=None),
+            BlockchainRecord(EthereumBackend._document_hash(_sample_data(2)), _sample_data(2),
+                             "2025-11-05T12:00:00", block_number=7, transaction_hash="0x" + "cd" * 32,
+                             network="sepolia", merkle_root="ef" * 32, metadata={"gas_used": 21000}),
+        ]
+        for record in odd:
+            ledger.append(record)
+
+        self.assertEqual([r.to_dict() for r in ledger], [r.to_dict() for r in odd])
+        self.assertEqual(ledger.find("0x" + "cd" * 32), 1)
+
+    def test_payloads_are_deduplicated_and_copies_are_isolated(self):
+        ledger = CompactLedger(PayloadStore(self.tmp / "payloads.db"))
+        record = next(self._records(1))
+        ledger.append(record)
+        ledger.append(BlockchainRecord(**{**record.__dict__, "transaction_hash": "0xsim_" + "1" * 64}))
+        self.assertEqual(len(ledger.payloads), 1)
+
+        ledger[0].classification_data["text"] = "alterado"
+        self.assertTrue(ledger[0].verify_hash())
+
+    def test_resident_memory_reduction(self):
+        n = 3000
+        factory = lambda i: {"simulation": True, "chain_length": i + 1}
+
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        plain = list(self._records(n))
+        plain_bytes = tracemalloc.get_traced_memory()[0]
+        del plain
+
+        baseline = tracemalloc.get_traced_memory()[0]
+        ledger = CompactLedger(PayloadStore(self.tmp / "payloads.db", cache_size=0), metadata_factory=factory)
+        for record in self._records(n):
+            ledger.append(record)
+        compact_bytes = tracemalloc.get_traced_memory()[0] - baseline
+
+        self.assertGreaterEqual(plain_bytes / compact_bytes, 10)
+        self.assertEqual(ledger[n // 2].to_dict(), list(self._records(n // 2 + 1))[-1].to_dict())
+
+
+class TestConcurrentAnchoring(unittest.TestCase):
+    """Un BlockchainAnchor compartido entre muchos hilos"""
+
+    THREADS = 16
+    PER_THREAD = 40
+
+    def test_block_numbers_unique_and_contiguous(self):
+        backend = SimulationBackend(AnchorConfig())
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker(t):
+            barrier.wait()
+            return [backend.anchor(_sample_data(t * 1000 + i)) for i in range(self.PER_THREAD)]
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+            records = [r for batch in pool.map(worker, range(self.THREADS)) for r in batch]
+
+        total = self.THREADS * self.PER_THREAD
+        self.assertEqual(sorted(r.block_number for r in records), list(range(1, total + 1)))
+        self.assertEqual(len(backend.chain), total)
+        self.assertEqual(backend.mmr.size, total)
+        self.assertEqual(backend.block_number, total)
+
+        # Ledger, MMR y metadata coinciden posición a posición
+        by_block = {r.block_number: r for r in records}
+        fresh = MerkleMountainRange()
+        for index, stored in enumerate(backend.chain):
+            self.assertEqual(stored.block_number, index + 1)
+            self.assertEqual(stored.to_dict(), by_block[index + 1].to_dict())
+            fresh.append(mmr_leaf_hash(stored.block_number, stored.transaction_hash, stored.document_hash))
+        self.assertEqual(fresh.root(), backend.mmr.root())
+
+    def test_shared_anchor_saves_every_record(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        anchor = BlockchainAnchor(AnchorConfig(retry_delay=0))
+
+        with mock.patch("anchor_v2.BLOCKCHAIN_DIR", Path(tmp.name)):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                records = list(pool.map(anchor.anchor_classification, [_sample_data(i) for i in range(80)]))
+
+        self.assertEqual(sorted(r.block_number for r in records), list(range(1, 81)))
+        self.assertEqual(len(list(Path(tmp.name).glob("anchor_record_*.json"))), 80)
+        self.assertEqual(anchor.get_metrics()["retry"]["successes"], 80)
+        self.assertTrue(anchor.verify_records(records).all_valid)
+
+
+class _SlowSimulation(SimulationBackend):
+    """Simulación con latencia inyectada y fallo opcional"""
+
+    def __init__(self, delay: float, fail: bool = False):
+        super().__init__(AnchorConfig())
+        self.delay = delay
+        self.fail = fail
+
+    def anchor(self, data):
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("nodo caído")
+        return super().anchor(data)
+
+
+class _NoContractBackend(SimulationBackend):
+    """Como EthereumBackend sin BLOCKCHAIN_CONTRACT_ADDRESS: ``anchor_batch`` existe pero falla"""
+
+    contract = None
+
+    def __init__(self):
+        super().__init__(AnchorConfig())
+        self.pipelined = 0
+
+    def anchor_batch(self, items):
+        raise BlockchainError("No hay contrato configurado (BLOCKCHAIN_CONTRACT_ADDRESS)")
+
+    def anchor_many(self, items):
+        self.pipelined += len(items)
+        return [self.anchor(data) for data in items]
+
+
+class TestMultiNetworkAnchor(unittest.TestCase):
+    """Fan-out concurrente con quórum y timeouts por red"""
+
+    def _multi(self, backends, **kwargs) -> MultiNetworkAnchor:
+        multi = MultiNetworkAnchor(backends, **kwargs)
+        self.addCleanup(multi.close)
+        return multi
+
+    def test_networks_are_anchored_concurrently(self):
+        multi = self._multi({name: _SlowSimulation(0.2) for name in ("polygon", "sepolia", "bsc")})
+
+        started = time.monotonic()
+        result = multi.anchor(_sample_data(1))
+
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertTrue(result.quorum_met)
+        self.assertEqual(set(result.records), {"polygon", "sepolia", "bsc"})
+        self.assertEqual({r.document_hash for r in result.records.values()}, {compute_document_hash(_sample_data(1))})
+
+    def test_any_returns_with_fastest_network(self):
+        multi = self._multi({"rapida": _SlowSimulation(0.01), "lenta": _SlowSimulation(1.0)}, quorum="any")
+
+        started = time.monotonic()
+        result = multi.anchor(_sample_data(1))
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(list(result.records), ["rapida"])
+
+    def test_k_of_n_tolerates_failures(self):
+        backends = {"a": _SlowSimulation(0.01), "b": _SlowSimulation(0.02), "c": _SlowSimulation(0.01, fail=True)}
+        result = self._multi(backends, quorum=2).anchor(_sample_data(1))
+        self.assertTrue(result.quorum_met)
+
+        with self.assertRaises(TransactionError) as ctx:
+            self._multi(backends, quorum="all").anchor(_sample_data(2))
+        self.assertIn("nodo caído", str(ctx.exception))
+
+    def test_per_network_timeout(self):
+        multi = self._multi(
+            {"ok": _SlowSimulation(0.01), "colgada": _SlowSimulation(2.0)},
+            timeouts={"colgada": 0.1}
+        )
+
+        started = time.monotonic()
+        result = multi.anchor(_sample_data(1), raise_on_failure=False)
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertFalse(result.quorum_met)
+        self.assertEqual(result.timed_out, ["colgada"])
+        self.assertIn("ok", result.records)
+
+    def test_batch_root_on_every_network(self):
+        items = [_sample_data(i) for i in range(5)]
+        multi = self._multi({"polygon": _SlowSimulation(0), "sepolia": _SlowSimulation(0)})
+        result = multi.anchor_batch(items)
+
+        roots = set()
+        for name, records in result.records.items():
+            self.assertEqual(len(records), 5)
+            for record in records:
+                self.assertEqual(record.anchored_hash(), record.merkle_root)
+                self.assertTrue(multi.backends[name].verify(record))
+                roots.add(record.merkle_root)
+            # La verificación masiva coincide con verify() registro a registro
+            anchor = BlockchainAnchor(AnchorConfig())
+            anchor.backend = multi.backends[name]
+            report = anchor.verify_records(records)
+            self.assertEqual(len(report.valid), 5)
+            self.assertTrue(report.all_valid)
+
+            tampered = replace(records[0], metadata={**records[0].metadata, "merkle_proof": []})
+            self.assertEqual(anchor.verify_records([tampered]).mismatched, [tampered.transaction_hash])
+        self.assertEqual(len(roots), 1)
+
+    def test_batch_without_contract_anchors_each_document(self):
+        items = [_sample_data(i) for i in range(3)]
+        backend = _NoContractBackend()
+        result = self._multi({"sepolia": backend, "polygon": _SlowSimulation(0)}).anchor_batch(items)
+
+        records = result.records["sepolia"]
+        self.assertEqual(backend.pipelined, 3)
+        self.assertEqual([r.document_hash for r in records], [compute_document_hash(d) for d in items])
+        for record in records:
+            self.assertNotIn("merkle_proof", record.metadata)
+            self.assertTrue(backend.verify(record))
+        self.assertEqual(len(result.records["polygon"]), 3)
+
+    def test_invalid_quorum(self):
+        with self.assertRaises(ValidationError):
+            MultiNetworkAnchor({"a": SimulationBackend(AnchorConfig())}, quorum=2)
+
+
+class TestRpcPool(unittest.TestCase):
+    """Pool multi-endpoint: keep-alive, enrutado por latencia, failover y hedging"""
+
+    def _node(self, **kwargs) -> FakeJsonRpcNode:
+        node = FakeJsonRpcNode({}, results={"eth_blockNumber": "0x10", "eth_sendRawTransaction": "0xabc"}, **kwargs)
+        self.addCleanup(node.close)
+        return node
+
+    def _pool(self, nodes, **kwargs) -> RpcPool:
+        pool = RpcPool([n.url for n in nodes], timeout=5, **kwargs)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_connections_are_reused(self):
+        node = self._node()
+        pool = self._pool([node])
+        for _ in range(20):
+            self.assertEqual(pool.call("eth_blockNumber"), "0x10")
+        self.assertEqual(node.connections, 1)
+        self.assertEqual(pool.endpoints[0].stats()["connections_opened"], 1)
+
+    def test_routes_to_fastest_endpoint(self):
+        slow, fast = self._node(delay=0.05), self._node()
+        pool = self._pool([slow, fast], hedge_after=None)
+        for _ in range(20):
+            pool.call("eth_blockNumber")
+
+        self.assertEqual(pool.ranked()[0].url, fast.url)
+        self.assertLessEqual(len(slow.requests), 2)
+
+    def test_failover_and_cooldown(self):
+        broken, healthy = self._node(fail=True), self._node(delay=0.01)
+        pool = self._pool([broken, healthy], hedge_after=None)
+        for _ in range(10):
+            self.assertEqual(pool.call("eth_sendRawTransaction", "0x00"), "0xabc")
+
+        # Un fallo basta para que el endpoint roto pase al final del ranking
+        self.assertEqual(len(broken.requests), 1)
+        self.assertEqual(pool.endpoints[0].stats()["error_rate"], 1.0)
+
+        alone = self._pool([broken])
+        for _ in range(3):
+            with self.assertRaises(NetworkError):
+                alone.call("eth_blockNumber")
+        self.assertTrue(alone.endpoints[0].stats()["cooling_down"])
+
+    def test_slow_reads_are_hedged(self):
+        stalled, backup = self._node(), self._node()
+        pool = self._pool([stalled, backup], hedge_after=0.05)
+        pool.call("eth_blockNumber")
+        pool.call("eth_blockNumber")
+        # El preferido se vuelve lento: la lectura se duplica en el otro
+        best = pool.ranked()[0]
+        (stalled if best.url == stalled.url else backup).delay = 1.0
+
+        started = time.monotonic()
+        self.assertEqual(pool.call("eth_blockNumber"), "0x10")
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(pool.hedges, 1)
+
+    def test_writes_are_never_hedged(self):
+        slow, other = self._node(delay=0.2), self._node(delay=0.2)
+        pool = self._pool([slow, other], hedge_after=0.01)
+        pool.call("eth_sendRawTransaction", "0x00")
+        self.assertEqual(len(slow.requests) + len(other.requests), 1)
+        self.assertEqual(pool.hedges, 0)
+
+    def test_batch_verification_goes_through_pool(self):
+        records = [_record(i, "0x%064x" % i) for i in range(6)]
+        transactions = {r.transaction_hash: {"input": "0x" + r.document_hash} for r in records[:4]}
+        broken = self._node(fail=True)
+        healthy = FakeJsonRpcNode(transactions)
+        self.addCleanup(healthy.close)
+        pool = self._pool([broken, healthy], hedge_after=None)
+
+        report = verify_records_jsonrpc(pool, records, batch_size=2, max_workers=1)
+
+        tx = [r.transaction_hash for r in records]
+        self.assertEqual(sorted(report.valid), tx[:4])
+        self.assertEqual(sorted(report.missing), tx[4:])
+        self.assertEqual(report.errors, {})
+        # El endpoint roto se prueba una vez; el resto de batches reutiliza una conexión
+        self.assertEqual(len(broken.requests), 1)
+        self.assertEqual(sorted(len(req) for req in healthy.requests), [2, 2, 2])
+        self.assertEqual(healthy.connections, 1)
+
+    def test_remote_errors_do_not_penalise_endpoint(self):
+        node = self._node()
+        pool = self._pool([node])
+        with self.assertRaises(BlockchainError):
+            pool.call("eth_desconocido")
+        self.assertEqual(pool.endpoints[0].stats()["error_rate"], 0.0)
+
+
+class TestAnchoredHashFilter(unittest.TestCase):
+    """Filtro de Bloom de hashes anclados y su uso en BlockchainAnchor"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def test_sizing_and_false_positive_rate(self):
+        bits, hashes = optimal_parameters(20_000_000, 0.001)
+        self.assertLess(bits / 8 / 20_000_000, 2)  # < 2 bytes por hash
+        self.assertEqual(hashes, 10)
+
+        bloom = AnchoredHashFilter(capacity=5000, error_rate=0.01)
+        added = [compute_document_hash({"i": i}) for i in range(5000)]
+        self.assertGreater(bloom.update(added), 4900)  # Algún falso positivo al insertar
+        self.assertTrue(all(h in bloom for h in added))
+
+        probes = [compute_document_hash({"otro": i}) for i in range(20000)]
+        observed = sum(h in bloom for h in probes) / len(probes)
+        self.assertLess(observed, 0.02)
+        stats = bloom.stats()
+        self.assertAlmostEqual(stats["estimated_fp_rate"], 0.01, delta=0.003)
+        self.assertEqual(stats["memory_bytes"], (bloom.num_bits + 7) // 8)
+
+    def test_persistent_filter_survives_restart(self):
+        path = self.dir / "anchored.bloom"
+        doc = compute_document_hash(_sample_data(1))
+        with AnchoredHashFilter(capacity=1000, error_rate=0.001, path=path) as bloom:
+            bloom.add(doc)
+
+        reopened = AnchoredHashFilter(capacity=10, path=path)
+        self.addCleanup(reopened.close)
+        self.assertIn(doc, reopened)
+        self.assertEqual(len(reopened), 1)
+        self.assertEqual(reopened.capacity, 1000)
+
+    def test_duplicates_rejected_and_rebuilt_from_receipts(self):
+        store = ReceiptStore(self.dir / "receipts.db")
+        self.addCleanup(store.close)
+        anchor = BlockchainAnchor(AnchorConfig(retry_delay=0))
+        anchor.attach_filter(AnchoredHashFilter(capacity=1000), store=store)
+
+        with mock.patch("anchor_v2.BLOCKCHAIN_DIR", self.dir):
+            record = anchor.anchor_classification(_sample_data(1))
+            with self.assertRaises(DuplicateAnchorError) as ctx:
+                anchor.anchor_classification(_sample_data(1))
+        self.assertEqual(ctx.exception.tx_hash, record.transaction_hash)
+        self.assertEqual(anchor.get_metrics()["anchored_filter"]["count"], 1)
+
+        # Un arranque nuevo reconstruye el filtro desde el almacén de recibos
+        restarted = BlockchainAnchor(AnchorConfig(retry_delay=0))
+        restarted.attach_filter(AnchoredHashFilter(capacity=1000), store=store)
+        with self.assertRaises(DuplicateAnchorError):
+            restarted.anchor_classification(_sample_data(1))
+
+    def test_definite_misses_skip_duplicate_lookups(self):
+        store = ReceiptStore(self.dir / "receipts.db")
+        self.addCleanup(store.close)
+        anchor = BlockchainAnchor(AnchorConfig(retry_delay=0))
+        anchor.attach_filter(AnchoredHashFilter(capacity=1000), store=store)
+
+        with mock.patch("anchor_v2.BLOCKCHAIN_DIR", self.dir):
+            record = anchor.anchor_classification(_sample_data(1))
+            foreign = SimulationBackend(AnchorConfig()).anchor(_sample_data(2))
+
+            with mock.patch.object(store, "find_document", wraps=store.find_document) as lookup:
+                anchor.anchor_classification(_sample_data(3))
+            lookup.assert_not_called()
+
+        # El filtro no decide verificaciones: un registro de otro nodo o
+        # anterior al filtro se consulta igual en el backend
+        with mock.patch.object(anchor.backend, "verify", return_value=True) as verify:
+            self.assertTrue(anchor.verify_record(foreign))
+            self.assertTrue(anchor.verify_record(record))
+        self.assertEqual(verify.call_count, 2)
+
+    def test_real_network_receipts_stay_pending_until_tracked(self):
+        store = ReceiptStore(self.dir / "receipts.db")
+        self.addCleanup(store.close)
+        anchor = BlockchainAnchor(AnchorConfig(retry_delay=0))
+        anchor.attach_filter(AnchoredHashFilter(capacity=1000), store=store)
+
+        with mock.patch("anchor_v2.BLOCKCHAIN_DIR", self.dir):
+            simulated = anchor.anchor_classification(_sample_data(1))
+        submitted = SimulationBackend(AnchorConfig()).anchor(_sample_data(2))
+        submitted.network = "sepolia"
+        anchor._remember(submitted)
+
+        self.assertEqual(store.get(simulated.transaction_hash)["status"], "confirmed")
+        self.assertEqual(store.get(submitted.transaction_hash)["status"], "pending")
+
+
+@unittest.skipUnless(HAS_SOLC, "eth-tester/py-solc-x no instalados")
+class TestRegistryContract(unittest.TestCase):
+    """Registro individual y en lote contra ExpedienteRegistry en EVM local"""
+
+    def test_batch_is_cheaper_per_document(self):
+        from bench_registry_gas import run_benchmark
+
+        result = run_benchmark(20)
+        self.assertLess(result["batch_gas_per_doc"] * 5, result["single_gas_per_doc"])
+
+    def test_batch_records_verify(self):
+        from bench_registry_gas import tester_backend_with_registry
+
+        backend = tester_backend_with_registry()
+        records = backend.anchor_batch([_sample_data(i) for i in range(6)])
+
+        root = records[0].merkle_root
+        self.assertEqual(backend.contract.functions.consultarLote(bytes.fromhex(root)).call(), 6)
+        self.assertTrue(all(backend.verify(r) for r in records))
+
+        single = backend.anchor({**_sample_data(99), "expediente_id": "EXP-1"})
+        self.assertTrue(backend.contract.functions.verificar("EXP-1", bytes.fromhex(single.document_hash)).call())
+
+
+class TestConfirmationTracker(unittest.TestCase):
+    """Seguimiento de confirmaciones guiado por bloques"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = ReceiptStore(Path(tmp.name) / "receipts.db")
+        self.addCleanup(self.store.close)
+        self.backend = SimulationBackend(AnchorConfig())
+
+    def test_future_resolves_after_n_confirmations(self):
+        tracker = ConfirmationTracker(self.backend, store=self.store, confirmations=3)
+        record = self.backend.anchor(_sample_data(0))
+        calls = []
+        future = tracker.track(record.transaction_hash, record.document_hash,
+                               callback=lambda tx, status: calls.append((tx, status)))
+
+        tracker.poll_once()
+        self.assertFalse(future.done())
+        self.assertEqual(self.store.get(record.transaction_hash)["confirmations"], 1)
+
+        self.backend.anchor(_sample_data(1))
+        self.backend.anchor(_sample_data(2))
+        tracker.poll_once()
+
+        self.assertEqual(future.result(timeout=0), TransactionStatus.CONFIRMED)
+        self.assertEqual(calls, [(record.transaction_hash, TransactionStatus.CONFIRMED)])
+        stored = self.store.get(record.transaction_hash)
+        self.assertEqual(stored["status"], "confirmed")
+        self.assertEqual(stored["block_number"], record.block_number)
+        self.assertEqual(tracker.pending_count, 0)
+
+    def test_one_pass_per_block_for_many_transactions(self):
+        tracker = ConfirmationTracker(self.backend, confirmations=1)
+        tracker.poll_once()  # sin TX vigiladas no consulta la red
+        tracker.track("0xsim_none")
+        tracker.poll_once()
+
+        scanned = []
+        original = self.backend.get_block_receipts
+
+        def counting(number, tx_hashes):
+            scanned.append(number)
+            return original(number, tx_hashes)
+
+        self.backend.get_block_receipts = counting
+        futures = []
+        for i in range(50):
+            record = self.backend.anchor(_sample_data(i))
+            futures.append(tracker.track(record.transaction_hash))
+        tracker.poll_once()
+
+        self.assertTrue(all(f.done() for f in futures))
+        self.assertEqual(len(scanned), len(set(scanned)))
+
+    def test_background_thread(self):
+        anchor = BlockchainAnchor(AnchorConfig(poll_interval=0.01))
+        anchor.start_tracker(store=self.store)
+        self.addCleanup(anchor.tracker.stop)
+
+        record = anchor.backend.anchor(_sample_data(0))
+        future = anchor.track_confirmations(record.transaction_hash)
+
+        self.assertEqual(future.result(timeout=5), TransactionStatus.CONFIRMED)
+        self.assertEqual(self.store.pending(), [])
+
+
+class _ListLogSource(EventLogSource):
+    """Cadena en memoria: bloque -> (hash, eventos)"""
+
+    def __init__(self, n_blocks: int):
+        self.blocks = {n: ("0xb%d" % n, []) for n in range(n_blocks)}
+        self.ranges = []
+
+    def add_event(self, block: int, record: BlockchainRecord, fork: str = "") -> None:
+        block_hash = "0xb%d%s" % (block, fork)
+        events = self.blocks[block][1] if not fork else []
+        events.append({
+            "block_number": block, "block_hash": block_hash, "tx_hash": record.transaction_hash,
+            "log_index": len(events), "kind": "expediente", "expediente_id": "EXP",
+            "document_hash": record.document_hash, "cantidad": 1, "timestamp": 0
+        })
+        self.blocks[block] = (block_hash, events)
+
+    def head(self):
+        return max(self.blocks)
+
+    def block_hash(self, block_number):
+        return self.blocks[block_number][0]
+
+    def get_events(self, from_block, to_block):
+        self.ranges.append((from_block, to_block))
+        return [e for n in range(from_block, to_block + 1) for e in self.blocks.get(n, ("", []))[1]]
+
+
+class TestEventIndexer(unittest.TestCase):
+    """Índice local de eventos con checkpoints y rebobinado"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_path = Path(tmp.name) / "events.db"
+        self.index = EventIndex(self.db_path)
+        self.addCleanup(self.index.close)
+        self.source = _ListLogSource(30)
+        self.records = []
+        for i in range(10):
+            record = _record(i, "0x%064x" % i)
+            record.block_number = 2 * i + 1
+            self.source.add_event(record.block_number, record)
+            self.records.append(record)
+
+    def test_incremental_sync_in_ranges(self):
+        indexer = ExpedienteEventIndexer(self.source, self.index, batch_blocks=10)
+
+        self.assertEqual(indexer.sync(to_block=14), 7)
+        self.assertEqual(indexer.sync(), 3)
+        self.assertEqual(indexer.sync(), 0)
+        self.assertEqual(self.source.ranges, [(0, 9), (10, 14), (15, 24), (25, 29)])
+        self.assertEqual(self.index.count(), 10)
+
+    def test_checkpoint_survives_restart(self):
+        ExpedienteEventIndexer(self.source, self.index).sync(to_block=9)
+        self.index.close()
+
+        reopened = EventIndex(self.db_path)
+        self.addCleanup(reopened.close)
+        indexer = ExpedienteEventIndexer(self.source, reopened)
+        self.assertEqual(indexer.last_synced_block, 9)
+        indexer.sync()
+        self.assertEqual(self.source.ranges[-1], (10, 29))
+        self.assertEqual(reopened.count(), 10)
+
+    def test_reorg_rewinds_and_reindexes(self):
+        for n in range(20, 30):
+            del self.source.blocks[n]
+        indexer = ExpedienteEventIndexer(self.source, self.index, reorg_depth=5)
+        indexer.sync()
+
+        # Los bloques 15-19 cambian: desaparecen los eventos de 15, 17 y 19
+        # y aparece otro distinto en el bloque 18
+        replacement = _record(42, "0x%064x" % 42)
+        replacement.block_number = 18
+        for n in range(15, 20):
+            self.source.blocks[n] = ("0xb%dfork" % n, [])
+        self.source.add_event(18, replacement, fork="fork")
+        indexer.sync()
+
+        self.assertEqual(self.index.find(self.records[8].document_hash), [])
+        self.assertTrue(indexer.verify(self.records[6]))
+        self.assertIsNone(indexer.verify(self.records[8]))
+        self.assertTrue(indexer.verify(replacement))
+        self.assertEqual(self.index.count(), 8)
+
+    def test_reorg_deeper_than_depth_rewinds_until_hashes_agree(self):
+        indexer = ExpedienteEventIndexer(self.source, self.index, reorg_depth=5)
+        indexer.sync()
+
+        # La red abandona los bloques 6-29: tres pasos de reorg_depth
+        for n in range(6, 30):
+            self.source.blocks[n] = ("0xb%dfork" % n, [])
+        indexer.sync()
+
+        self.assertEqual([e["block_number"] for r in self.records for e in self.index.find(r.document_hash)], [1, 3, 5])
+        self.assertEqual(self.index.checkpoint()["last_block_hash"], "0xb29fork")
+
+    def test_verify_record_answers_from_index(self):
+        anchor = BlockchainAnchor(AnchorConfig())
+        indexer = ExpedienteEventIndexer(self.source, self.index)
+        indexer.sync(to_block=10)
+        anchor.attach_index(indexer)
+
+        def no_chain(record):
+            raise AssertionError("no debe consultar la cadena")
+
+        anchor.backend.verify = no_chain
+        self.assertTrue(anchor.verify_record(self.records[0]))
+
+        # Sin evento de esa transacción (p. ej. auto-transferencia sin
+        # contrato) el índice no decide y se consulta la cadena
+        forged = _record(0, "0x" + "ee" * 32)
+        forged.block_number = 3
+        anchor.backend.verify = mock.Mock(return_value=False)
+        self.assertFalse(anchor.verify_record(forged))
+        anchor.backend.verify.assert_called_once_with(forged)
+
+        # Bloque posterior a la última sincronización: se consulta la cadena
+        anchor.backend.verify = lambda record: True
+        self.assertTrue(anchor.verify_record(self.records[9]))
+
+
+class TestAnchorQueue(unittest.TestCase):
+    """Cola persistente de anclaje con leases e idempotencia"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.db_path = Path(tmp.name) / "queue.db"
+        self.queue = AnchorQueue(self.db_path)
+        self.addCleanup(self.queue.close)
+        self.anchor = BlockchainAnchor(AnchorConfig(retry_delay=0))
+        self.dir = Path(tmp.name)
+        patcher = mock.patch("anchor_v2.BLOCKCHAIN_DIR", self.dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_enqueue_is_idempotent_on_document_hash(self):
+        first = self.queue.enqueue(_sample_data(1))
+        again = self.queue.enqueue(dict(reversed(list(_sample_data(1).items()))))
+        other = self.queue.enqueue(_sample_data(2))
+
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+        self.assertEqual(self.queue.stats()["queued"], 2)
+
+        AnchorWorkerPool(self.anchor, self.queue).drain()
+        self.assertEqual(self.queue.enqueue(_sample_data(1)), first)
+        AnchorWorkerPool(self.anchor, self.queue).drain()
+        self.assertEqual(len(self.anchor.backend.chain), 2)
+
+    def test_invalid_data_rejected_at_enqueue(self):
+        from anchor_v2 import ValidationError
+
+        with self.assertRaises(ValidationError):
+            self.queue.enqueue({"text": "sin etiqueta"})
+
+    def test_expired_lease_is_replayed_once(self):
+        queue = AnchorQueue(self.db_path, lease_seconds=0)
+        self.addCleanup(queue.close)
+        job_id = queue.enqueue(_sample_data(1))
+        # Un worker reserva el trabajo y "cae" sin completarlo
+        self.assertEqual([j.id for j in queue.lease("caido", 10)], [job_id])
+
+        pool = AnchorWorkerPool(self.anchor, queue)
+        self.assertEqual(pool.drain(), 1)
+        self.assertEqual(pool.drain(), 0)
+
+        job = queue.get(job_id)
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.result["document_hash"], job.document_hash)
+        self.assertEqual(len(self.anchor.backend.chain), 1)
+
+    def test_stale_lease_holder_cannot_anchor_or_complete(self):
+        queue = AnchorQueue(self.db_path, lease_seconds=0)
+        self.addCleanup(queue.close)
+        job_id = queue.enqueue(_sample_data(1))
+        stale = queue.lease("lento", 10)
+        # El lease vence mientras "lento" espera el backend y otro lo retoma
+        fresh = queue.lease("rapido", 10)
+
+        pool = AnchorWorkerPool(self.anchor, queue)
+        pool.process(stale)
+        self.assertEqual(len(self.anchor.backend.chain), 0)
+        self.assertFalse(queue.complete(job_id, {}, owner="lento"))
+
+        pool.process(fresh)
+        self.assertEqual(queue.get(job_id).status, "done")
+        self.assertEqual(len(self.anchor.backend.chain), 1)
+
+    def test_renew_keeps_only_own_leases(self):
+        first, second = self.queue.enqueue(_sample_data(1)), self.queue.enqueue(_sample_data(2))
+        self.queue.lease("w1", 1)
+        self.queue.lease("w2", 1)
+
+        self.assertEqual(self.queue.renew("w1", [first, second]), [first])
+        self.assertFalse(self.queue.release(second, owner="w1"))
+        self.assertTrue(self.queue.release(second, owner="w2"))
+
+    def test_failed_attempts_are_retried_then_marked_failed(self):
+        queue = AnchorQueue(self.db_path, max_attempts=2)
+        self.addCleanup(queue.close)
+        job_id = queue.enqueue(_sample_data(1))
+
+        def broken(data):
+            raise ConnectionError("RPC caído")
+
+        self.anchor.backend.anchor = broken
+        # Con retry_delay=0 el reintento vence en el acto: drain agota los intentos
+        AnchorWorkerPool(self.anchor, queue).drain()
+        job = queue.get(job_id)
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.attempts, 2)
+        self.assertIn("RPC caído", job.error)
+
+    def test_failed_job_can_be_enqueued_again(self):
+        queue = AnchorQueue(self.db_path, max_attempts=1)
+        self.addCleanup(queue.close)
+        job_id = queue.enqueue(_sample_data(1))
+        queue.lease("w", 1)
+        queue.fail(job_id, "RPC caído")
+        self.assertEqual(queue.get(job_id).status, "failed")
+
+        self.assertEqual(queue.enqueue(_sample_data(1)), job_id)
+        job = queue.get(job_id)
+        self.assertEqual((job.status, job.attempts, job.error), ("queued", 0, None))
+        AnchorWorkerPool(self.anchor, queue).drain()
+        self.assertEqual(queue.get(job_id).status, "done")
+
+    def test_jobs_go_through_anchor_hooks(self):
+        store = ReceiptStore(self.db_path.with_name("receipts.db"))
+        self.addCleanup(store.close)
+        self.anchor.attach_filter(AnchoredHashFilter(capacity=1000), store=store)
+        anchored = self.anchor.anchor_classification(_sample_data(1))
+
+        first, second = self.queue.enqueue(_sample_data(1)), self.queue.enqueue(_sample_data(2))
+        AnchorWorkerPool(self.anchor, self.queue).drain()
+
+        # El documento ya anclado no se repite; el nuevo queda en recibos y filtro
+        self.assertEqual(self.queue.get(first).result["transaction_hash"], anchored.transaction_hash)
+        self.assertTrue(self.queue.get(first).result["duplicate"])
+        self.assertEqual(len(self.anchor.backend.chain), 2)
+        tx_hash = self.queue.get(second).result["transaction_hash"]
+        self.assertEqual(store.get(tx_hash)["status"], "confirmed")
+        self.assertIn(compute_document_hash(_sample_data(2)), self.anchor.anchored_filter)
+        self.assertEqual(len(list(self.dir.glob("anchor_record_*.json"))), 2)
+
+    def test_reverted_receipt_is_retried_with_new_transaction(self):
+        backend = _PipelineBackend(revert_first=True)
+        self.anchor.backend = backend
+        job_id = self.queue.enqueue(_sample_data(1))
+
+        pool = AnchorWorkerPool(self.anchor, self.queue)
+        pool.process(self.queue.lease("w", 1))
+        job = self.queue.get(job_id)
+        self.assertEqual((job.status, job.tx_hash), ("queued", None))
+        self.assertIn("revertida", job.error)
+
+        pool.drain()
+        self.assertEqual(self.queue.get(job_id).status, "done")
+        self.assertEqual(backend.submitted, 2)
+
+    def test_receipts_collected_by_submit_finish_their_jobs(self):
+        # El último envío falla tras recoger los recibos: nada queda en vuelo
+        backend = _PipelineBackend(max_in_flight=2, fail_at=3)
+        self.anchor.backend = backend
+        ids = [self.queue.enqueue(_sample_data(i)) for i in range(3)]
+
+        pool = AnchorWorkerPool(self.anchor, self.queue, batch_size=10)
+        pool.process(self.queue.lease("w", 10))
+
+        # Los recibos guardados por submit cierran sus trabajos sin reanudar
+        self.assertEqual([self.queue.get(i).status for i in ids], ["done", "done", "queued"])
+        self.assertIn("RPC no disponible", self.queue.get(ids[2]).error)
+
+    def test_failed_attempt_waits_for_backoff(self):
+        job_id = self.queue.enqueue(_sample_data(1))
+        self.queue.lease("w1", 1)
+        self.queue.fail(job_id, "timeout", retry_delay=60)
+
+        self.assertEqual(self.queue.get(job_id).status, "queued")
+        self.assertEqual(self.queue.lease("w2", 10), [])
+
+    def test_worker_pool_drains_in_background(self):
+        ids = {self.queue.enqueue(_sample_data(i)) for i in range(30)}
+        pool = AnchorWorkerPool(self.anchor, self.queue, workers=3, batch_size=8,
+                                batch_interval=0.05, poll_interval=0.01)
+        pool.start()
+        self.addCleanup(pool.stop)
+
+        deadline = time.monotonic() + 10
+        while self.queue.stats()["done"] < 30 and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+        self.assertEqual(self.queue.stats()["done"], 30)
+        self.assertEqual(len(ids), 30)
+        hashes = [r.document_hash for r in self.anchor.backend.chain]
+        self.assertEqual(len(hashes), len(set(hashes)))
+
+
+class _PipelineBackend(SimulationBackend):
+    """
+    Simulación con la interfaz de envío en pipeline; puede revertir el
+    primer envío, hacer fallar el envío ``fail_at`` y, como EthereumBackend,
+    guarda los recibos que recoge al llegar a ``max_in_flight``
+    """
+
+    def __init__(self, revert_first: bool = False, max_in_flight: int = 0, fail_at: int = 0):
+        super().__init__(AnchorConfig())
+        self.revert_first = revert_first
+        self.max_in_flight = max_in_flight
+        self.fail_at = fail_at
+        self.submitted = 0
+        self._in_flight = {}
+        self._completed = []
+
+    def submit(self, data):
+        if self.max_in_flight and len(self._in_flight) >= self.max_in_flight:
+            self._completed.extend(self._in_flight.values())
+            self._in_flight = {}
+        self.submitted += 1
+        if self.submitted == self.fail_at:
+            raise ConnectionError("RPC no disponible")
+        record = self.anchor(data)
+        if self.revert_first and self.submitted == 1:
+            record.metadata["status"] = 0
+        pending = PendingTransaction(record.transaction_hash, self.submitted, record.document_hash, data, 1)
+        self._in_flight[record.transaction_hash] = record
+        return pending
+
+    def pending_transactions(self):
+        return list(self._in_flight)
+
+    def collect_receipts(self, wait=False, timeout=None):
+        records = self._completed + list(self._in_flight.values())
+        self._completed, self._in_flight = [], {}
+        return records
+
+    def forget(self, tx_hash):
+        return self._in_flight.pop(tx_hash, None)
+
+
+class _FlakyBackend:
+    """Envoltorio que hace fallar las primeras ``failures`` llamadas a anchor"""
+
+    def __init__(self, backend, failures: int):
+        self.backend = backend
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self, data):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("RPC no disponible")
+        return self.backend.anchor(data)
+
+
+class TestResilience(unittest.TestCase):
+    """Reintentos con jitter, plazo por llamada y circuit breaker"""
+
+    def _anchor(self, failures: int, **overrides) -> BlockchainAnchor:
+        config = AnchorConfig(retry_delay=0, **overrides)
+        anchor = BlockchainAnchor(config)
+        anchor.backend.anchor = _FlakyBackend(SimulationBackend(config), failures)
+        return anchor
+
+    def test_decorrelated_jitter_bounds(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+        previous = None
+        for _ in range(200):
+            delay = policy.next_delay(previous)
+            upper = min(10.0, max(1.0, (previous or 1.0) * 3))
+            self.assertGreaterEqual(delay, 1.0)
+            self.assertLessEqual(delay, upper)
+            previous = delay
+
+    def test_retries_until_success_and_counts(self):
+        anchor = self._anchor(failures=2)
+        record = anchor.anchor_classification(_sample_data(1))
+
+        self.assertTrue(record.transaction_hash)
+        metrics = anchor.get_metrics()
+        self.assertEqual(metrics["retry"]["attempts"], 3)
+        self.assertEqual(metrics["retry"]["retries"], 2)
+        self.assertEqual(metrics["breaker"]["state"], CircuitBreaker.CLOSED)
+
+    def test_deadline_cuts_retry_ladder(self):
+        anchor = self._anchor(failures=10, max_retries=5, retry_deadline=0.2)
+        anchor.caller.policy.base_delay = 1.0
+
+        started = time.monotonic()
+        with self.assertRaises(BlockchainError):
+            anchor.anchor_classification(_sample_data(1))
+
+        self.assertLess(time.monotonic() - started, 0.2)
+        self.assertEqual(anchor.get_metrics()["retry"]["deadline_exceeded"], 1)
+
+    def test_open_breaker_fails_fast(self):
+        anchor = self._anchor(failures=100, max_retries=1, breaker_failure_threshold=2)
+        flaky = anchor.backend.anchor
+        for i in range(2):
+            with self.assertRaises(BlockchainError):
+                anchor.anchor_classification(_sample_data(i))
+
+        with self.assertRaises(CircuitOpenError) as ctx:
+            anchor.anchor_classification(_sample_data(3))
+        self.assertIsNone(ctx.exception.job_id)
+        self.assertEqual(flaky.calls, 2)
+
+        metrics = anchor.get_metrics()
+        self.assertEqual(metrics["breaker"]["state"], CircuitBreaker.OPEN)
+        self.assertEqual(metrics["retry"]["short_circuited"], 1)
+
+    def test_half_open_probe_closes_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # una sola prueba a la vez
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_unreported_probe_does_not_wedge_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05, probe_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        # La prueba nunca informa resultado: vence y se concede otra
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.release_probe()
+        self.assertTrue(breaker.allow())
+
+    def test_worker_batch_without_backend_calls_releases_probe(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        queue = AnchorQueue(Path(tmp.name) / "queue.db", lease_seconds=0)
+        self.addCleanup(queue.close)
+        anchor = self._anchor(failures=0)
+        breaker = anchor.caller.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+
+        queue.enqueue(_sample_data(1))
+        stale = queue.lease("lento", 10)
+        queue.lease("rapido", 10)
+        # El lote se descarta entero (leases perdidos) sin tocar el backend
+        AnchorWorkerPool(anchor, queue).process(stale)
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+    def test_open_breaker_spills_to_queue(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        queue = AnchorQueue(Path(tmp.name) / "queue.db")
+        self.addCleanup(queue.close)
+
+        anchor = self._anchor(failures=100, max_retries=1, breaker_failure_threshold=1)
+        anchor.attach_queue(queue)
+        with self.assertRaises(BlockchainError):
+            anchor.anchor_classification(_sample_data(1))
+
+        with self.assertRaises(CircuitOpenError) as ctx:
+            anchor.anchor_classification(_sample_data(2))
+        self.assertEqual(queue.get(ctx.exception.job_id).status, "queued")
+
+        # Los workers tampoco gastan intentos mientras el circuito esté abierto
+        AnchorWorkerPool(anchor, queue).process(queue.lease("w", 10))
+        self.assertEqual(queue.get(ctx.exception.job_id).attempts, 0)
+        self.assertEqual(queue.stats()["queued"], 1)
+
+    def test_async_anchor_does_not_block_loop(self):
+        anchor = self._anchor(failures=1)
+        anchor.caller.policy.base_delay = 0.05
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.005)
+
+        async def scenario():
+            task = asyncio.create_task(ticker())
+            record = await anchor.anchor_classification_async(_sample_data(1))
+            task.cancel()
+            return record
+
+        record = asyncio.run(scenario())
+        self.assertTrue(record.transaction_hash)
+        self.assertGreater(len(ticks), 3)
+
+
+@unittest.skipUnless(HAS_ETH_TESTER, "eth-tester/py-evm no instalados")
+class TestEthereumPipeline(unittest.TestCase):
+    """Envío en pipeline con nonces locales"""
+
+    def test_anchor_many_assigns_contiguous_nonces(self):
+        backend = _tester_backend(max_in_flight=4)
+        items = [_sample_data(i) for i in range(10)]
+
+        records = backend.anchor_many(items)
+
+        self.assertEqual(len(records), 10)
+        nonces = [backend.web3.eth.get_transaction(r.transaction_hash)["nonce"] for r in records]
+        self.assertEqual(nonces, list(range(10)))
+        self.assertEqual(backend.pending_transactions(), [])
+        # chain_id y gasPrice se consultan una vez para todo el lote
+        self.assertEqual(backend.rpc.calls["chain_id"], 1)
+        self.assertEqual(backend.rpc.calls["get_transaction_count"], 1)
+        for record, data in zip(records, items):
+            self.assertTrue(backend.verify(record))
+            self.assertEqual(record.classification_data, data)
+
+    def test_in_flight_limit_and_separate_collection(self):
+        backend = _tester_backend(max_in_flight=3)
+        tester = backend.web3.provider.ethereum_tester
+        tester.disable_auto_mine_transactions()
+
+        for i in range(3):
+            backend.submit(_sample_data(i))
+        self.assertEqual(len(backend.pending_transactions()), 3)
+        self.assertEqual(backend.collect_receipts(), [])
+
+        tester.mine_blocks()
+        records = backend.collect_receipts()
+        self.assertEqual(len(records), 3)
+        self.assertEqual(backend.pending_transactions(), [])
+
+    def test_receipts_collected_while_waiting_for_slot_are_returned(self):
+        backend = _tester_backend(max_in_flight=2)
+        tester = backend.web3.provider.ethereum_tester
+        tester.disable_auto_mine_transactions()
+        # Sin minado automático: submit se bloquea en el límite hasta que se mine
+        stop = threading.Event()
+
+        def miner():
+            while not stop.wait(0.02):
+                tester.mine_blocks()
+
+        thread = threading.Thread(target=miner, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(stop.set)
+
+        items = [_sample_data(i) for i in range(7)]
+        records = backend.anchor_many(items)
+
+        self.assertEqual([r.classification_data for r in records], items)
+        self.assertEqual(backend.pending_transactions(), [])
+        self.assertEqual(backend.collect_receipts(), [])
+
+    def test_resync_after_external_nonce_use(self):
+        backend = _tester_backend()
+        backend.anchor_many([_sample_data(0)])
+
+        # Otra herramienta usa el nonce que el backend cree libre
+        backend.rpc._next_nonce -= 1
+        records = backend.anchor_many([_sample_data(1)])
+
+        self.assertEqual(len(records), 1)
+        self.assertTrue(backend.verify(records[0]))
+
+    def test_dropped_transaction_is_evicted_and_nonce_released(self):
+        from web3.exceptions import TransactionNotFound
+
+        backend = _tester_backend(timeout=0.2)
+        backend.web3.provider.ethereum_tester.disable_auto_mine_transactions()
+        pending = backend.submit(_sample_data(0))
+        pending.submitted_at -= 1  # más viejo que config.timeout
+
+        # El nodo olvida la transacción (expulsada del mempool)
+        with mock.patch.object(backend.rpc, "get_transaction", side_effect=TransactionNotFound("x")), \
+                mock.patch.object(backend, "_release_nonce") as release:
+            self.assertEqual(backend.collect_receipts(), [])
+        self.assertEqual(backend.pending_transactions(), [])
+        release.assert_called_once_with(pending.nonce)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
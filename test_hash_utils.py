@@ -0,0 +1,108 @@
+"""
+Tests del Módulo de Hash Compartido (hash_utils)
+================================================
+
+Hash de archivos (mmap y por bloques), hash incremental, hash en paralelo
+y caché por (ruta, tamaño, mtime).
+
+Autor: Consultoría de Sistemas Legales Automatizados
+Fecha: 2025-11-05
+Versión: 1.0.0
+"""
+
+import os
+import sys
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+
+# Agregar el directorio raíz al path para imports
+sys.path.insert(0, str(Path(__file__).parent))
+
+import hash_utils
+from hash_utils import HashCache, StreamingHasher, hash_files, sha256_bytes, sha256_file
+
+
+class TestFileHashing(unittest.TestCase):
+    """sha256_file y StreamingHasher frente a hashlib"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def _file(self, name: str, data: bytes) -> Path:
+        path = self.dir / name
+        path.write_bytes(data)
+        return path
+
+    def test_small_empty_and_mmapped_files(self):
+        payloads = {"vacio.pdf": b"", "corto.pdf": b"%PDF-1.4 corto", "grande.pdf": os.urandom(300_000)}
+        original = hash_utils.MMAP_THRESHOLD
+        self.addCleanup(setattr, hash_utils, "MMAP_THRESHOLD", original)
+
+        for threshold in (original, 1024):
+            hash_utils.MMAP_THRESHOLD = threshold
+            for name, data in payloads.items():
+                self.assertEqual(sha256_file(self._file(name, data)), hashlib.sha256(data).hexdigest())
+
+    def test_streaming_hasher_matches_one_shot(self):
+        data = os.urandom(100_000)
+        hasher = StreamingHasher()
+        for start in range(0, len(data), 4096):
+            hasher.update(data[start:start + 4096])
+
+        self.assertEqual(hasher.hexdigest(), sha256_bytes(data))
+        self.assertEqual(hasher.size, len(data))
+
+    def test_parallel_hashing(self):
+        files = [self._file(f"doc{i}.pdf", os.urandom(5000 + i)) for i in range(12)]
+        expected = {str(p): hashlib.sha256(p.read_bytes()).hexdigest() for p in files}
+
+        self.assertEqual(hash_files(files, max_workers=4), expected)
+        self.assertEqual(hash_files(files, max_workers=1), expected)
+
+
+class TestHashCache(unittest.TestCase):
+    """Caché por (ruta, tamaño, mtime)"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.path = self.dir / "expediente.pdf"
+        self.path.write_bytes(b"version 1")
+
+    def test_unchanged_files_are_not_rehashed(self):
+        cache = HashCache()
+        first = cache.hash_file(self.path)
+        second = cache.hash_file(self.path)
+
+        self.assertEqual(first, second)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_modified_file_is_rehashed(self):
+        cache = HashCache()
+        cache.hash_file(self.path)
+        self.path.write_bytes(b"version 2 distinta")
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        self.assertEqual(cache.hash_file(self.path), sha256_bytes(b"version 2 distinta"))
+        self.assertEqual(cache.misses, 2)
+
+    def test_persistent_cache_survives_restart(self):
+        db_path = self.dir / "cache.db"
+        cache = HashCache(db_path)
+        hash_files([self.path], cache=cache)
+        cache.close()
+
+        reopened = HashCache(db_path)
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.get(self.path), sha256_bytes(b"version 1"))
+        self.assertEqual(reopened.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
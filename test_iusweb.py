@@ -0,0 +1,613 @@
+"""
+Tests de la API Web (iusweb)
+============================
+
+Endpoints de clasificación de archivos y auditoría de iusweb/app.py.
+Requieren FastAPI y httpx (TestClient); se omiten si no están instalados.
+
+Autor: Consultoría de Sistemas Legales Automatizados
+Fecha: 2025-11-05
+Versión: 1.0.0
+"""
+
+import io
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import tempfile
+import threading
+import zipfile
+import unittest
+import importlib.util
+from pathlib import Path
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+# Agregar el directorio raíz al path para imports
+sys.path.insert(0, str(Path(__file__).parent))
+
+from anchor_filter import AnchoredHashFilter
+from iusweb.upload_index import UploadIndex, write_json_atomic
+from iusweb import field_engine
+from bench_field_engine import make_text, reference_fields
+
+FIELD_CORPUS = Path(__file__).parent / "data" / "fixtures" / "field_corpus.json"
+
+HAS_FASTAPI = all(
+    importlib.util.find_spec(mod) is not None
+    for mod in ("fastapi", "httpx", "multipart")
+)
+
+if HAS_FASTAPI:
+    from fastapi.testclient import TestClient
+    from iusweb import app as iusweb_app
+
+
+class _WebTestCase(unittest.TestCase):
+    """Uploads en un directorio temporal y etapa de CPU en hilos"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.uploads = Path(tmp.name)
+        index = UploadIndex(self.uploads / "index.db")
+        self.addCleanup(index.close)
+        replacements = (
+            ("UPLOADS", self.uploads),
+            ("CPU_WORKERS", 0),
+            ("EXTRACTION_CACHE", iusweb_app.ExtractionCache(64 * 1024 * 1024)),
+            ("UPLOAD_INDEX", index),
+            ("ANCHORED", AnchoredHashFilter(capacity=10_000)),
+        )
+        for target, value in replacements:
+            patcher = mock.patch.object(iusweb_app, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+@unittest.skipUnless(HAS_FASTAPI, "fastapi/httpx no instalados")
+class TestEventLoopOffload(_WebTestCase):
+    """El OCR de un PDF escaneado no bloquea las demás peticiones"""
+
+    def test_recent_stays_responsive_during_ocr(self):
+        ocr_started = threading.Event()
+        ocr_done = threading.Event()
+
+        def slow_ocr(path, first, last):
+            ocr_started.set()
+            time.sleep(1.5)
+            ocr_done.set()
+            return [(1, "Contrato de obra pública. Contratista: ACME S.A.S.", 1.5)], None
+
+        patches = (
+            mock.patch.object(iusweb_app, "extract_pdf_pages_file", return_value=([""], 1, "")),
+            mock.patch.object(iusweb_app, "_ocr_missing", return_value=[]),
+            mock.patch.object(iusweb_app, "ocr_page_range", side_effect=slow_ocr),
+        )
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        responses = []
+        with TestClient(iusweb_app.app) as client:
+            upload = threading.Thread(target=lambda: responses.append(client.post(
+                "/api/classify-file",
+                files={"file": ("escaneo.pdf", b"%PDF-1.4 escaneado", "application/pdf")},
+            )))
+            upload.start()
+            self.assertTrue(ocr_started.wait(5))
+
+            started = time.monotonic()
+            recent = client.get("/api/recent")
+            elapsed = time.monotonic() - started
+
+            self.assertEqual(recent.status_code, 200)
+            self.assertLess(elapsed, 0.5)
+            self.assertFalse(ocr_done.is_set())
+            upload.join(10)
+
+        body = responses[0].json()
+        self.assertIn("OCR aplicado", body["notes"])
+        self.assertEqual(body["contractor"], "ACME S.A.S.")
+        self.assertTrue((self.uploads / Path(body["upload_path"]).name).exists())
+
+
+@unittest.skipUnless(HAS_FASTAPI, "fastapi/httpx no instalados")
+class TestPageParallelOcr(_WebTestCase):
+    """OCR por rangos de páginas: orden, concurrencia acotada y notas"""
+
+    def test_whole_document_ocr_renders_with_pdf2image(self):
+        pdf2image = mock.Mock()
+        pdf2image.convert_from_bytes.return_value = ["pág 1", "pág 2"]
+        pytesseract = mock.Mock()
+        pytesseract.image_to_string.side_effect = lambda im, lang: f"texto {im}"
+        with mock.patch.object(iusweb_app, "_try_import_pdf2image", return_value=pdf2image), \
+                mock.patch.object(iusweb_app, "_try_import_pytesseract", return_value=pytesseract):
+            text, pages, note = iusweb_app.extract_text_with_ocr_pdf_bytes(b"%PDF-1.4")
+
+        pdf2image.convert_from_bytes.assert_called_once_with(b"%PDF-1.4", fmt="png")
+        self.assertEqual((text, pages, note), ("texto pág 1\ntexto pág 2", 2, "OCR aplicado"))
+
+    def test_pages_reassembled_in_order_with_bounded_concurrency(self):
+        lock = threading.Lock()
+        state = {"running": 0, "max": 0, "calls": []}
+
+        def fake_range(path, first, last):
+            with lock:
+                state["running"] += 1
+                state["max"] = max(state["max"], state["running"])
+                state["calls"].append((first, last))
+            time.sleep(0.05 * (10 - first) / 10)  # los primeros rangos terminan últimos
+            with lock:
+                state["running"] -= 1
+            return [(p, f"pagina {p}", 0.01 * p) for p in range(first, last + 1)], 123.0
+
+        patches = (
+            mock.patch.object(iusweb_app, "extract_pdf_pages_file", return_value=([""] * 7, 7, "")),
+            mock.patch.object(iusweb_app, "_ocr_missing", return_value=[]),
+            mock.patch.object(iusweb_app, "ocr_page_range", side_effect=fake_range),
+            mock.patch.object(iusweb_app, "OCR_PAGES_PER_TASK", 2),
+            mock.patch.dict(iusweb_app.STAGE_LIMITS, {"ocr": 2}),
+        )
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        with TestClient(iusweb_app.app) as client:
+            body = client.post(
+                "/api/classify-file",
+                files={"file": ("escaneo.pdf", b"%PDF-1.4 escaneado", "application/pdf")},
+            ).json()
+
+        self.assertEqual(sorted(state["calls"]), [(1, 2), (3, 4), (5, 6), (7, 7)])
+        self.assertLessEqual(state["max"], 2)
+        self.assertEqual(body["n_pages"], 7)
+        self.assertTrue(body["text_excerpt"].startswith("\n".join(f"pagina {p}" for p in range(1, 8))))
+        self.assertIn("7:0.07", body["notes"])
+        self.assertIn("pico de memoria por proceso: 123 MB", body["notes"])
+
+    def test_only_pages_without_text_layer_are_ocred(self):
+        digital = "Cláusula primera. El contratista se obliga a ejecutar la obra. "
+        page_texts = [digital + "1", "", digital + "3", "  firma \n", digital + "5", digital + "6"]
+        calls = []
+
+        def fake_range(path, first, last):
+            calls.append((first, last))
+            return [(p, f"escaneada {p}", 0.1) for p in range(first, last + 1)], None
+
+        patches = (
+            mock.patch.object(iusweb_app, "extract_pdf_pages_file", return_value=(page_texts, 6, "")),
+            mock.patch.object(iusweb_app, "_ocr_missing", return_value=[]),
+            mock.patch.object(iusweb_app, "ocr_page_range", side_effect=fake_range),
+        )
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        with TestClient(iusweb_app.app) as client:
+            body = client.post(
+                "/api/classify-file",
+                files={"file": ("mixto.pdf", b"%PDF-1.4 mixto", "application/pdf")},
+            ).json()
+
+        self.assertEqual(calls, [(2, 2), (4, 4)])
+        expected = "\n".join([digital + "1", "escaneada 2", digital + "3", "escaneada 4", digital + "5", digital + "6"])
+        self.assertEqual(body["text_excerpt"], expected[:1000])
+        self.assertIn("2 de 6 págs", body["notes"])
+
+    def test_digital_pdf_skips_ocr(self):
+        with mock.patch.object(iusweb_app, "extract_pdf_pages_file",
+                               return_value=(["Objeto: suministro de equipos de cómputo."] * 3, 3, "")), \
+             mock.patch.object(iusweb_app, "ocr_page_range") as ocr, \
+             TestClient(iusweb_app.app) as client:
+            body = client.post(
+                "/api/classify-file",
+                files={"file": ("digital.pdf", b"%PDF-1.4 digital", "application/pdf")},
+            ).json()
+
+        ocr.assert_not_called()
+        self.assertEqual(body["objeto"], "suministro de equipos de cómputo.")
+
+
+@unittest.skipUnless(HAS_FASTAPI, "fastapi/httpx no instalados")
+class TestStreamingUpload(_WebTestCase):
+    """Subida por bloques: hash incremental, límite de tamaño y rename atómico"""
+
+    def _post(self, client, name: str, data: bytes):
+        return client.post("/api/classify-file", files={"file": (name, data, "text/plain")})
+
+    def test_multi_chunk_upload_is_hashed_and_saved(self):
+        data = b"Contrato de obra. Plazo de 12 meses.\n" * 80_000  # ~3 MB, varios bloques
+        with mock.patch.object(iusweb_app, "UPLOAD_CHUNK", 64 * 1024), TestClient(iusweb_app.app) as client:
+            response = self._post(client, "expediente.txt", data)
+
+        body = response.json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body["hash"], hashlib.sha256(data).hexdigest())
+        saved = self.uploads / Path(body["upload_path"]).name
+        self.assertEqual(saved.read_bytes(), data)
+        self.assertEqual(list(self.uploads.glob("*.part")), [])
+
+    def test_concurrent_same_name_uploads_do_not_collide(self):
+        class _SlowUpload:
+            def __init__(self, data: bytes):
+                self.filename, self.size, self._buf = "igual.txt", None, io.BytesIO(data)
+
+            async def read(self, n: int) -> bytes:
+                await asyncio.sleep(0)  # intercala las dos subidas bloque a bloque
+                return self._buf.read(n)
+
+        first, second = b"Contrato A.\n" * 5000, b"Contrato B distinto.\n" * 5000
+
+        async def both():
+            return await asyncio.gather(iusweb_app.api_classify_file(_SlowUpload(first)),
+                                        iusweb_app.api_classify_file(_SlowUpload(second)))
+
+        with mock.patch.object(iusweb_app, "UPLOAD_CHUNK", 1024):
+            results = asyncio.run(both())
+
+        self.assertNotEqual(results[0].upload_path, results[1].upload_path)
+        for result, data in zip(results, (first, second)):
+            self.assertEqual(result.hash, hashlib.sha256(data).hexdigest())
+            self.assertEqual(Path(result.upload_path).read_bytes(), data)
+        self.assertEqual(list(self.uploads.glob("*.part")), [])
+
+    def test_oversized_and_empty_uploads_are_rejected(self):
+        with mock.patch.object(iusweb_app, "MAX_UPLOAD_BYTES", 1024), TestClient(iusweb_app.app) as client:
+            too_big = self._post(client, "grande.txt", b"x" * 200_000)
+            empty = self._post(client, "vacio.txt", b"")
+
+        self.assertEqual(too_big.status_code, 413)
+        self.assertEqual(empty.status_code, 400)
+        self.assertEqual(sorted(p.name for p in self.uploads.iterdir() if not p.name.startswith("index.db")), [])
+
+
+@unittest.skipUnless(HAS_FASTAPI, "fastapi/httpx no instalados")
+class TestBatchEndpoint(_WebTestCase):
+    """/api/classify-batch: varios archivos o ZIP, NDJSON por documento y límites"""
+
+    @staticmethod
+    def _lines(response):
+        return [json.loads(line) for line in response.text.splitlines() if line]
+
+    @staticmethod
+    def _zip(members: dict) -> bytes:
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as zf:
+            zf.writestr("expediente/", "")
+            for name, data in members.items():
+                zf.writestr(name, data)
+        return buf.getvalue()
+
+    def test_multipart_batch_yields_one_line_per_document(self):
+        docs = [("a.txt", b"Contratista: ACME LTDA"), ("b.txt", b"Valor $ 1.000"), ("vacio.txt", b"")]
+        with TestClient(iusweb_app.app) as client:
+            response = client.post("/api/classify-batch",
+                                   files=[("files", (name, data, "text/plain")) for name, data in docs])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("application/x-ndjson"))
+        *lines, summary = self._lines(response)
+        self.assertEqual(summary, {"done": True, "documents": 3, "errors": 1})
+        by_index = {line["index"]: line for line in lines}
+        self.assertEqual(sorted(by_index), [0, 1, 2])
+        self.assertEqual(by_index[0]["result"]["contractor"], "ACME LTDA")
+        self.assertEqual(by_index[1]["result"]["hash"], hashlib.sha256(docs[1][1]).hexdigest())
+        self.assertEqual(by_index[2]["error"], "Archivo vacío")
+
+    def test_results_stream_as_each_document_finishes(self):
+        real_extract = iusweb_app.extract_upload
+
+        async def _extract(path, kind):
+            if "lento" in path.name:
+                await asyncio.sleep(0.3)
+            return await real_extract(path, kind)
+
+        files = [("files", ("lento.txt", b"Objeto: lento", "text/plain")),
+                 ("files", ("rapido.txt", b"Objeto: rapido", "text/plain"))]
+        with mock.patch.object(iusweb_app, "extract_upload", _extract), TestClient(iusweb_app.app) as client:
+            with client.stream("POST", "/api/classify-batch", files=files) as response:
+                order = [json.loads(line).get("source_file") for line in response.iter_lines() if line]
+
+        self.assertEqual(order, ["rapido.txt", "lento.txt", None])
+
+    def test_zip_is_expanded_within_limits(self):
+        archive = self._zip({"expediente/a.txt": b"Plazo de 6 meses", "expediente/b.txt": b"Objeto: obra"})
+        files = [("files", ("expediente.zip", archive, "application/zip"))]
+        with TestClient(iusweb_app.app) as client:
+            ok = client.post("/api/classify-batch", files=files)
+            with mock.patch.object(iusweb_app, "MAX_BATCH_DOCS", 1):
+                too_many = client.post("/api/classify-batch", files=files)
+            with mock.patch.object(iusweb_app, "MAX_BATCH_BYTES", len(archive) + 10):
+                too_big = client.post("/api/classify-batch", files=files)
+            bad_zip = client.post("/api/classify-batch", files=[("files", ("roto.zip", b"no es zip", "application/zip"))])
+
+        self.assertEqual(sorted(line.get("source_file") for line in self._lines(ok)[:-1]), ["a.txt", "b.txt"])
+        self.assertEqual(too_many.status_code, 413)
+        self.assertEqual(too_big.status_code, 413)
+        self.assertEqual(bad_zip.status_code, 400)
+        # Sólo quedan los documentos del lote aceptado y sus JSON
+        saved = sorted(p.name.split("_", 2)[-1] for p in self.uploads.iterdir() if not p.name.startswith(("index.db", "anchored")))
+        self.assertEqual(saved, ["a.txt", "a.txt.json", "b.txt", "b.txt.json"])
+
+
+@unittest.skipUnless(HAS_FASTAPI, "fastapi/httpx no instalados")
+class TestExtractionCache(_WebTestCase):
+    """Caché por SHA-256 de la subida y coalescencia de extracciones en curso"""
+
+    TEXT = "Contrato de suministro. Contratista: Papelería Central Ltda. Valor $ 12.500.000"
+
+    def _counting_extractor(self, delay: float = 0.0):
+        calls = []
+        original = iusweb_app.extract_text_from_txt_file
+
+        def extractor(path):
+            calls.append(path)
+            time.sleep(delay)
+            return original(path)
+
+        patcher = mock.patch.object(iusweb_app, "extract_text_from_txt_file", side_effect=extractor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return calls
+
+    def _post(self, client, name: str):
+        return client.post("/api/classify-file", files={"file": (name, self.TEXT.encode(), "text/plain")}).json()
+
+    def test_resubmitted_file_is_served_from_cache(self):
+        calls = self._counting_extractor()
+        with TestClient(iusweb_app.app) as client:
+            first = self._post(client, "original.txt")
+            second = self._post(client, "reenvio.txt")
+
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(first["cached"])
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["contractor"], first["contractor"])
+        self.assertEqual(second["amount"], first["amount"])
+        self.assertNotEqual(second["upload_path"], first["upload_path"])
+
+    def test_concurrent_uploads_share_one_extraction(self):
+        calls = self._counting_extractor(delay=0.5)
+        with TestClient(iusweb_app.app) as client:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                bodies = list(pool.map(lambda i: self._post(client, f"copia{i}.txt"), range(4)))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(b["cached"] for b in bodies), [False, True, True, True])
+        self.assertEqual(iusweb_app.EXTRACTION_CACHE.stats()["coalesced"], 3)
+
+    def test_size_based_eviction(self):
+        entry = {"text": "x" * 10_000, "pages": 1, "note": "", "fields": {}}
+        cache = iusweb_app.ExtractionCache(max_bytes=40_000)
+        for key in ("a", "b", "c"):
+            cache.put(key, entry)
+        cache.get("a")  # "a" pasa a ser la más reciente
+        cache.put("d", entry)
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertLessEqual(cache.size, cache.max_bytes)
+
+
+class TestUploadIndex(unittest.TestCase):
+    """Índice hash -> JSON de resultado y su reconstrucción"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.uploads = Path(tmp.name)
+        self.index = UploadIndex(self.uploads / "index.db")
+        self.addCleanup(self.index.close)
+
+    def _sidecar(self, name: str, doc_hash: str, **extra) -> Path:
+        path = self.uploads / f"{name}.json"
+        write_json_atomic(path, {"source_file": name, "hash": doc_hash, **extra})
+        return path
+
+    def test_rebuild_backfills_existing_sidecars(self):
+        self._sidecar("a.pdf", "h1")
+        self._sidecar("b.pdf", "h2", anchor={"txid": "sim-1"})
+        (self.uploads / "roto.pdf.json").write_text("{no es json", encoding="utf-8")
+
+        self.assertEqual(self.index.rebuild(self.uploads), 2)
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual([d["source_file"] for _, d in self.index.find("h1")], ["a.pdf"])
+        self.assertEqual(list(self.index.anchored_hashes()), ["h2"])
+
+    def test_update_by_hash_writes_sidecar_and_index(self):
+        first = self._sidecar("a.pdf", "h1")
+        self.index.rebuild(self.uploads)
+        self.assertTrue(self.index.update_by_hash("h1", lambda d: {**d, "anchor": {"txid": "sim-9"}}))
+        self.assertFalse(self.index.update_by_hash("desconocido", lambda d: d))
+
+        on_disk = json.loads(first.read_text(encoding="utf-8"))
+        self.assertEqual(on_disk["anchor"], {"txid": "sim-9"})
+        self.assertEqual(self.index.find("h1")[0][1]["anchor"], {"txid": "sim-9"})
+
+    def test_recent_pages_by_cursor(self):
+        for i in range(5):
+            self.index.upsert(self.uploads / f"doc{i}.pdf.json", {"hash": f"h{i}"}, updated_at=100.0 + i)
+        self.index.upsert(self.uploads / "nota.txt.json", {"hash": "txt"}, updated_at=200.0)
+
+        first, cursor = self.index.recent(2, suffix=".pdf.json")
+        second, cursor2 = self.index.recent(2, after=cursor, suffix=".pdf.json")
+        last, cursor3 = self.index.recent(2, after=cursor2, suffix=".pdf.json")
+
+        self.assertEqual([d["hash"] for d in first + second + last], ["h4", "h3", "h2", "h1", "h0"])
+        self.assertIsNone(cursor3)
+
+    def test_generation_tracks_own_and_foreign_writes(self):
+        before = self.index.generation()
+        self.assertEqual(self.index.generation(), before)
+        self.index.upsert(self.uploads / "a.pdf.json", {"hash": "h1"})
+        after_own = self.index.generation()
+        self.assertNotEqual(after_own, before)
+
+        other = UploadIndex(self.uploads / "index.db")
+        self.addCleanup(other.close)
+        other.upsert(self.uploads / "b.pdf.json", {"hash": "h2"})
+        self.assertNotEqual(self.index.generation(), after_own)
+
+    def test_generation_differs_after_restart(self):
+        # Reinicio: contadores a cero en un proceso nuevo, mismos datos o no
+        before = self.index.generation()
+        self.index.close()
+        restarted = UploadIndex(self.uploads / "index.db")
+        self.addCleanup(restarted.close)
+        self.assertNotEqual(restarted.generation(), before)
+
+    def test_lookups_do_not_scan_uploads(self):
+        self._sidecar("a.pdf", "h1")
+        self.index.rebuild(self.uploads)
+        with mock.patch("pathlib.Path.glob") as scan, mock.patch("glob.glob") as glob_scan:
+            self.assertEqual(len(self.index.find("h1")), 1)
+            scan.assert_not_called()
+            glob_scan.assert_not_called()
+
+
+class TestFieldEngine(unittest.TestCase):
+    """Extracción de campos: mismos resultados que la versión campo a campo"""
+
+    @classmethod
+    def setUpClass(cls):
+        with open(FIELD_CORPUS, "r", encoding="utf-8") as fh:
+            cls.corpus = json.load(fh)
+        root = Path(__file__).parent
+        for case in cls.corpus:
+            if "file" in case:
+                case["text"] = (root / case["file"]).read_text(encoding="utf-8")
+
+    def test_fixture_corpus_unchanged(self):
+        for case in self.corpus:
+            with self.subTest(case["name"]):
+                self.assertEqual(field_engine.extract_all(case["text"]), case["expected"])
+
+    def test_fallback_search_gives_same_results(self):
+        # Forzar el search normal tras el primer candidato fallido y bloques mínimos
+        with mock.patch.multiple(field_engine, MAX_MISSES=0, FIRST_BLOCK_CHARS=3, MAX_BLOCK_CHARS=8):
+            for case in self.corpus:
+                with self.subTest(case["name"]):
+                    self.assertEqual(field_engine.extract_all(case["text"]), case["expected"])
+
+    def test_multi_mb_texts_match_reference(self):
+        for sparse in (False, True):
+            text = make_text(2 * 1024 * 1024, sparse=sparse, seed=7)
+            with self.subTest(sparse=sparse):
+                self.assertEqual(field_engine.extract_all(text), reference_fields(text))
+
+    def test_single_field_helpers_agree_with_extract_all(self):
+        case = next(c for c in self.corpus if c["name"] == "obra_publica")
+        expected = case["expected"]
+        self.assertEqual(field_engine.label_text_heuristic(case["text"]), expected["labels"])
+        self.assertEqual(field_engine.extract_objeto(case["text"]), expected["objeto"])
+        self.assertEqual(field_engine.extract_amount(case["text"]), expected["amount"])
+        self.assertEqual(field_engine.extract_dates(case["text"]), expected["dates"])
+        self.assertEqual(field_engine.extract_contractor(case["text"]), expected["contractor"])
+
+    def test_budget_keeps_results_on_ordinary_documents(self):
+        for case in self.corpus:
+            with self.subTest(case["name"]):
+                fields, note = field_engine.extract_within_budget(case["text"], field_engine.ExtractionBudget())
+                self.assertEqual(fields, case["expected"])
+                self.assertEqual(note, "")
+
+    def test_windows_bound_work_on_pathological_dump(self):
+        # Volcado de OCR: miles de "contratista" sin dos puntos antes del dato real
+        text = "ACTA\n" + "contratista " + " " * 20_000 + "\n" + "contratista sin datos\n" * 50_000
+        text += "Contratista: Tardío S.A.S."
+        budget = field_engine.ExtractionBudget(head_chars=1024, window_chars=256, max_windows=8)
+        fields, note = field_engine.extract_within_budget(text, budget)
+        self.assertIsNone(fields["contractor"])
+        self.assertIn("ventanas por patrón: contractor", note)
+        self.assertEqual(field_engine.extract_all(text)["contractor"], "Tardío S.A.S.")
+
+    def test_wall_clock_cap_returns_partial_fields(self):
+        case = next(c for c in self.corpus if c["name"] == "contrato_servicios")
+        slow_dates = field_engine._dates
+
+        def _slow(*args):
+            time.sleep(0.1)
+            return slow_dates(*args)
+
+        budget = field_engine.ExtractionBudget(seconds=0.05)
+        with mock.patch.object(field_engine, "_dates", _slow):
+            fields, note = field_engine.extract_within_budget(case["text"], budget)
+        self.assertEqual(fields["amount"], case["expected"]["amount"])
+        self.assertEqual(fields["labels"], case["expected"]["labels"])
+        self.assertIsNone(fields["dates"])
+        self.assertIsNone(fields["contractor"])
+        self.assertIn("sin resolver: dates, contractor", note)
+
+    @unittest.skipUnless(HAS_FASTAPI, "fastapi/httpx no instalados")
+    def test_app_wraps_fields_in_models(self):
+        case = next(c for c in self.corpus if c["name"] == "contrato_servicios")
+        fields = iusweb_app.extract_fields(case["text"])
+        self.assertIsInstance(fields["amount"], iusweb_app.Amount)
+        self.assertEqual(fields["amount"].model_dump(), case["expected"]["amount"])
+        self.assertEqual(fields["dates"].model_dump(), case["expected"]["dates"])
+        self.assertEqual(fields["labels"], case["expected"]["labels"])
+        self.assertEqual(fields["note"], "")
+
+
+@unittest.skipUnless(HAS_FASTAPI, "fastapi/httpx no instalados")
+class TestAnchorEndpoint(_WebTestCase):
+    """/api/anchor actualiza el resultado vía índice y rechaza duplicados"""
+
+    def test_anchor_updates_indexed_result_and_rejects_duplicate(self):
+        with TestClient(iusweb_app.app) as client:
+            upload = client.post("/api/classify-file",
+                                 files={"file": ("acta.txt", b"Acta de inicio del contrato", "text/plain")}).json()
+            first = client.post("/api/anchor", json={"hash": upload["hash"]})
+            second = client.post("/api/anchor", json={"hash": upload["hash"]})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 409)
+        self.assertEqual(second.json()["txid"], first.json()["txid"])
+        sidecar = self.uploads / (Path(upload["upload_path"]).name + ".json")
+        self.assertEqual(json.loads(sidecar.read_text(encoding="utf-8"))["anchor"]["txid"], first.json()["txid"])
+
+
+@unittest.skipUnless(HAS_FASTAPI, "fastapi/httpx no instalados")
+class TestRecentEndpoint(_WebTestCase):
+    """/api/recent paginado desde el índice, con proyección y ETag"""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            iusweb_app.UPLOAD_INDEX.upsert(
+                self.uploads / f"doc{i}.pdf.json",
+                {"hash": f"h{i}", "source_file": f"doc{i}.pdf", "text_excerpt": "x" * 500},
+                updated_at=100.0 + i,
+            )
+
+    def test_cursor_pagination_and_projection(self):
+        with TestClient(iusweb_app.app) as client:
+            first = client.get("/api/recent", params={"limit": 3, "fields": "hash,source_file"})
+            second = client.get("/api/recent", params={
+                "limit": 3, "fields": "hash", "cursor": first.headers["X-Next-Cursor"]})
+            bad = client.get("/api/recent", params={"cursor": "no-es-un-cursor"})
+
+        self.assertEqual(first.json(), [{"hash": f"h{i}", "source_file": f"doc{i}.pdf"} for i in (4, 3, 2)])
+        self.assertEqual(second.json(), [{"hash": "h1"}, {"hash": "h0"}])
+        self.assertNotIn("X-Next-Cursor", second.headers)
+        self.assertEqual(bad.status_code, 400)
+
+    def test_unchanged_poll_gets_304_without_reading_results(self):
+        with TestClient(iusweb_app.app) as client:
+            first = client.get("/api/recent")
+            with mock.patch.object(iusweb_app.UPLOAD_INDEX, "recent") as recent:
+                again = client.get("/api/recent", headers={"If-None-Match": first.headers["ETag"]})
+                recent.assert_not_called()
+            iusweb_app.UPLOAD_INDEX.upsert(self.uploads / "nuevo.pdf.json", {"hash": "h9"})
+            changed = client.get("/api/recent", headers={"If-None-Match": first.headers["ETag"]})
+
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()[0]["hash"], "h9")
+
+
+if __name__ == "__main__":
+    unittest.main()